@@ -2,7 +2,7 @@
 # ==========================================
 # analyze_all_firmware_docker.sh
 # Author: @natelgrw
-# Last Edited: 11/30/2025
+# Last Edited: 10/18/2026
 #
 # A script that analyzes all firmware files in the 
 # demo_firmware directory and saves the results 
@@ -27,24 +27,22 @@ echo -e "\n${GREEN}Starting firmware analysis in Docker...${NC}\n"
 # create results directory
 mkdir -p results
 
-# run analysis for each firmware file
-for firmware in demo_firmware/*; do
-    if [ -f "$firmware" ] && [[ ! "$firmware" =~ [Tt][Pp][Ll][Ii][Nn][Kk] ]]; then
-        firmware_name=$(basename "$firmware")
-        echo "=========================================="
-        echo "Analyzing: $firmware_name"
-        echo "=========================================="
-        
-        firmware_basename=$(basename "$firmware" .${firmware##*.})
-        docker run --rm \
-            -v "$(pwd):/workspace" \
-            -w /workspace \
-            firmaforge:latest \
-            python3 -c "from firmaforge import summarize_results; summarize_results.analyze_firmware('/workspace/$firmware', results_dir='/workspace/results')"
-        
-        echo ""
-    fi
-done
+# run analysis for each firmware file; progress is journaled in
+# results/.journal.db so an interrupted run resumes where it stopped
+status=0
+docker run --rm \
+    -v "$(pwd):/workspace" \
+    -w /workspace \
+    firmaforge:latest \
+    python3 -m firmaforge.journal run /workspace/demo_firmware \
+        --results-dir /workspace/results \
+        --exclude '[Tt][Pp][Ll][Ii][Nn][Kk]' || status=$?
+
+if [ $status -ne 0 ]; then
+    echo -e "\n${YELLOW}Some images failed or were marked poisoned:${NC}"
+    docker run --rm -v "$(pwd):/workspace" -w /workspace firmaforge:latest \
+        python3 -m firmaforge.journal status --results-dir /workspace/results
+fi
 
 echo -e "\n${GREEN}Analysis complete${NC}"
 echo "Results saved in: $(pwd)/results/"
@@ -0,0 +1,485 @@
+"""
+benchmark.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A benchmark module that builds reproducible synthetic OpenWrt-like
+firmware images offline and times detection, extraction and each
+static analysis pass across size tiers.
+"""
+
+import argparse
+import json
+import lzma
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import struct
+import subprocess
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+# size tiers: target image bytes and number of rootfs files
+TIERS = {
+    'tiny': {'image_bytes': 4 * 1024 * 1024, 'files': 100},
+    'small': {'image_bytes': 16 * 1024 * 1024, 'files': 1000},
+    'medium': {'image_bytes': 64 * 1024 * 1024, 'files': 5000},
+    'large': {'image_bytes': 128 * 1024 * 1024, 'files': 20000},
+    'xlarge': {'image_bytes': 256 * 1024 * 1024, 'files': 50000},
+}
+
+DEFAULT_SEED = 1337
+DEFAULT_HISTORY = 'benchmarks/history.jsonl'
+
+BUSYBOX_APPLETS = ['ash', 'sh', 'cat', 'cp', 'ls', 'mv', 'rm', 'grep', 'sed', 'vi', 'ping', 'ps']
+LIBRARIES = ['libc.so', 'libgcc_s.so.1', 'libubox.so.20240329', 'libubus.so.20250102', 'libuci.so.20250120']
+LIBC_SYMBOLS = ['strcpy', 'sprintf', 'system', 'popen', 'memcpy', 'strncpy', 'snprintf', 'malloc', 'free']
+
+
+def _elf_header(machine: int = 0x08, big_endian: bool = True) -> bytes:
+    """Builds a minimal 32-bit ELF header (MIPS big-endian by default)."""
+    order = '>' if big_endian else '<'
+    ident = b'\x7fELF' + bytes([1, 2 if big_endian else 1, 1, 0]) + b'\x00' * 8
+    return ident + struct.pack(order + 'HHIIIIIHHHHHH', 2, machine, 1, 0x400000, 52, 0, 0, 52, 32, 1, 40, 0, 0)
+
+
+def _elf_payload(rng: random.Random, size: int) -> bytes:
+    """Builds an ELF-looking file with library and symbol strings."""
+    strings = '\x00'.join(['/lib/ld-musl-mips-sf.so.1'] + rng.sample(LIBRARIES, 2) + rng.sample(LIBC_SYMBOLS, 4))
+    body = _elf_header() + strings.encode() + b'\x00'
+    if len(body) < size:
+        body += rng.randbytes(size - len(body))
+    return body
+
+
+def _script_payload(rng: random.Random, kind: str, index: int) -> str:
+    """Builds a shell, Lua or ucode script with a few analyzer hits."""
+    if kind == 'lua':
+        return (
+            f'module("luci.controller.synthetic{index}", package.seeall)\n'
+            'local http = require "luci.http"\n'
+            'function index()\n'
+            f'  entry({{"admin", "synthetic{index}"}}, call("action_run"), nil)\n'
+            'end\n'
+            'function action_run()\n'
+            '  local host = http.formvalue("host")\n'
+            '  local out = io.popen("ping -c 1 " .. host)\n'
+            '  os.execute("logger synthetic")\n'
+            'end\n'
+        )
+    if kind == 'uc':
+        return (
+            "'use strict';\n"
+            "import { popen } from 'fs';\n"
+            f"function handler{index}(ctx) {{\n"
+            "  let name = ctx.params['name'];\n"
+            "  system(`echo ${name}`);\n"
+            "  return popen('uptime');\n"
+            "}\n"
+        )
+    return (
+        '#!/bin/sh\n'
+        f'# synthetic script {index}\n'
+        'VALUE="$QUERY_STRING"\n'
+        'RESULT=$(echo $VALUE | cut -d= -f2)\n'
+        f'echo "token=\'{rng.randbytes(6).hex()}\'" > /dev/null\n'
+    )
+
+
+def generate_rootfs(dest: Path, n_files: int, target_bytes: int, seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """
+    Generates a deterministic OpenWrt-like root filesystem.
+
+    Args:
+        dest: Directory to create the rootfs in
+        n_files: Number of regular files to create
+        target_bytes: Approximate total size of regular files
+        seed: Random seed for reproducible output
+
+    Returns:
+        Dictionary with file and byte counts per category
+    """
+    rng = random.Random(seed)
+    dest = Path(dest)
+    if dest.exists():
+        shutil.rmtree(dest)
+    for d in ['bin', 'sbin', 'usr/bin', 'usr/sbin', 'lib', 'usr/lib', 'etc/config', 'etc/init.d', 'etc/rc.d',
+              'www/cgi-bin', 'usr/lib/lua/luci/controller', 'usr/share/ucode/luci', 'usr/lib/opkg/info', 'tmp', 'var']:
+        (dest / d).mkdir(parents=True, exist_ok=True)
+
+    # fixed system files every image has
+    (dest / 'etc' / 'passwd').write_text(
+        'root:x:0:0:root:/root:/bin/ash\n'
+        'daemon:*:1:1:daemon:/var:/bin/false\n'
+        'nobody:*:65534:65534:nobody:/var:/bin/false\n'
+    )
+    (dest / 'etc' / 'shadow').write_text(
+        'root:$1$synthetic$abcdefghijklmnopqrstu.:19000:0:99999:7:::\n'
+        'daemon:*:0:0:99999:7:::\n'
+        'nobody:*:0:0:99999:7:::\n'
+    )
+    (dest / 'etc' / 'config' / 'firewall').write_text(
+        "config defaults\n\toption input 'REJECT'\n\toption forward 'REJECT'\n\n"
+        "config zone\n\toption name 'lan'\n\tlist network 'lan'\n\toption input 'ACCEPT'\n\n"
+        "config zone\n\toption name 'wan'\n\tlist network 'wan'\n\toption input 'REJECT'\n\n"
+        "config rule\n\toption name 'Allow-SSH-WAN'\n\toption src 'wan'\n\toption proto 'tcp'\n"
+        "\toption dest_port '22'\n\toption target 'ACCEPT'\n\n"
+        "config redirect\n\toption name 'web'\n\toption src_dport '8080'\n\toption dest_ip '192.168.1.2'\n"
+        "\toption dest_port '80'\n"
+    )
+    (dest / 'etc' / 'config' / 'uhttpd').write_text(
+        "config uhttpd 'main'\n\tlist listen_http '0.0.0.0:80'\n\tlist listen_https '0.0.0.0:443'\n"
+        "\toption home '/www'\n\toption username 'admin'\n"
+    )
+    (dest / 'etc' / 'config' / 'dropbear').write_text(
+        "config dropbear\n\toption PasswordAuth 'on'\n\toption Port '22'\n"
+    )
+
+    counts = {'elf': 0, 'script': 0, 'config': 0, 'data': 0, 'symlink': 0}
+    sizes = {'elf': 0, 'script': 0, 'config': 0, 'data': 0}
+
+    # busybox plus applet links, as on OpenWrt
+    busybox = _elf_payload(rng, 256 * 1024)
+    (dest / 'bin' / 'busybox').write_bytes(busybox)
+    counts['elf'] += 1
+    sizes['elf'] += len(busybox)
+    for applet in BUSYBOX_APPLETS:
+        os.symlink('busybox', dest / 'bin' / applet)
+        counts['symlink'] += 1
+
+    remaining = max(n_files - 1, 0)
+    n_elf = max(remaining * 3 // 10, 1)
+    n_script = remaining * 3 // 10
+    n_config = remaining // 10
+    n_data = max(remaining - n_elf - n_script - n_config, 0)
+
+    # most of the byte budget goes to ELF binaries
+    elf_budget = max(target_bytes * 7 // 10 - len(busybox), n_elf * 1024)
+    data_budget = max(target_bytes * 2 // 10, n_data * 256)
+
+    for i in range(n_elf):
+        size = max(1024, int(elf_budget / n_elf * rng.uniform(0.5, 1.5)))
+        parent = rng.choice(['usr/bin', 'usr/sbin', 'sbin', 'usr/lib'])
+        name = f'lib{i}.so.1' if parent == 'usr/lib' else f'tool{i}'
+        payload = _elf_payload(rng, size)
+        (dest / parent / name).write_bytes(payload)
+        counts['elf'] += 1
+        sizes['elf'] += len(payload)
+
+    for i in range(n_script):
+        kind = ['sh', 'lua', 'uc'][i % 3]
+        if kind == 'lua':
+            path = dest / 'usr/lib/lua/luci/controller' / f'synthetic{i}.lua'
+        elif kind == 'uc':
+            path = dest / 'usr/share/ucode/luci' / f'synthetic{i}.uc'
+        elif i % 2:
+            path = dest / 'www/cgi-bin' / f'synthetic{i}'
+        else:
+            path = dest / 'etc/init.d' / f'service{i}'
+        text = _script_payload(rng, kind, i)
+        if path.parent.name == 'init.d':
+            text = f'#!/bin/sh /etc/rc.common\nSTART={rng.randint(10, 99)}\nSTOP={rng.randint(10, 99)}\n' + text
+        path.write_text(text)
+        path.chmod(0o755)
+        counts['script'] += 1
+        sizes['script'] += len(text)
+
+    for i in range(n_config):
+        text = f"config synthetic 'section{i}'\n\toption enabled '1'\n\toption value '{rng.randint(0, 1 << 16)}'\n"
+        path = dest / 'etc/config' / f'synthetic{i}'
+        path.write_text(text)
+        counts['config'] += 1
+        sizes['config'] += len(text)
+
+    for i in range(n_data):
+        size = max(256, int(data_budget / max(n_data, 1) * rng.uniform(0.5, 1.5)))
+        # half-compressible data so squashfs sizes stay realistic
+        payload = (rng.randbytes(size // 2) + bytes(size - size // 2))
+        path = dest / 'usr/lib/opkg/info' / f'package{i}.list' if i % 4 == 0 else dest / 'var' / f'data{i}.bin'
+        path.write_bytes(payload)
+        counts['data'] += 1
+        sizes['data'] += len(payload)
+
+    return {'counts': counts, 'bytes': sizes}
+
+
+def _uimage_header(data: bytes, name: str = 'Linux-6.6.110') -> bytes:
+    """Builds a legacy U-Boot uImage header for an LZMA MIPS kernel."""
+    data_crc = zlib.crc32(data) & 0xffffffff
+    fields = [0x27051956, 0, 0, len(data), 0x80000000, 0x80000000, data_crc]
+    header = struct.pack('>IIIIIII', *fields) + bytes([5, 5, 2, 3]) + name.encode()[:32].ljust(32, b'\x00')
+    header_crc = zlib.crc32(header) & 0xffffffff
+    return header[:4] + struct.pack('>I', header_crc) + header[8:]
+
+
+def _build_kernel(work_dir: Path, rng: random.Random, size: int) -> bytes:
+    """Builds an LZMA-compressed fake kernel wrapped in a uImage header."""
+    banner = b'Linux version 6.6.110 (builder@buildhost) (mips-openwrt-linux-musl-gcc (OpenWrt GCC 13.3.0) 13.3.0) #0 SMP\x00'
+    raw = banner + bytes(rng.randrange(4) for _ in range(size))
+    compressed = lzma.compress(raw, format=lzma.FORMAT_ALONE)
+
+    if shutil.which('mkimage'):
+        payload = work_dir / 'kernel.lzma'
+        uimage = work_dir / 'kernel.uImage'
+        payload.write_bytes(compressed)
+        subprocess.run(
+            ['mkimage', '-A', 'mips', '-O', 'linux', '-T', 'kernel', '-C', 'lzma', '-a', '0x80000000',
+             '-e', '0x80000000', '-n', 'Linux-6.6.110', '-d', str(payload), str(uimage)],
+            capture_output=True, check=True, timeout=60
+        )
+        return uimage.read_bytes()
+    return _uimage_header(compressed) + compressed
+
+
+def build_image(tier: str, work_dir: str, seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """
+    Builds a synthetic TRX image (uImage kernel + SquashFS rootfs) for a tier.
+
+    Args:
+        tier: Name of a size tier in TIERS
+        work_dir: Directory for generated artifacts
+        seed: Random seed for reproducible output
+
+    Returns:
+        Dictionary with the image path, size and rootfs statistics
+    """
+    if not shutil.which('mksquashfs'):
+        raise RuntimeError("mksquashfs (squashfs-tools) is required to build benchmark images")
+
+    spec = TIERS[tier]
+    work_dir = Path(work_dir) / tier
+    work_dir.mkdir(parents=True, exist_ok=True)
+    image_path = work_dir / f'openwrt-synthetic-{tier}-squashfs-sysupgrade.bin'
+    meta_path = work_dir / 'image.json'
+
+    # reuse an existing build for the same tier and seed
+    if image_path.exists() and meta_path.exists():
+        meta = json.loads(meta_path.read_text())
+        if meta.get('seed') == seed:
+            return meta
+
+    rng = random.Random(seed)
+    rootfs_dir = work_dir / 'rootfs'
+    rootfs_stats = generate_rootfs(rootfs_dir, spec['files'], spec['image_bytes'], seed)
+
+    sqfs_path = work_dir / 'root.squashfs'
+    if sqfs_path.exists():
+        sqfs_path.unlink()
+    subprocess.run(
+        ['mksquashfs', str(rootfs_dir), str(sqfs_path), '-comp', 'xz', '-noappend', '-all-root', '-no-progress'],
+        capture_output=True, check=True, timeout=1800
+    )
+    rootfs = sqfs_path.read_bytes()
+    kernel = _build_kernel(work_dir, rng, 1024 * 1024)
+
+    # TRX v1: header, kernel, rootfs aligned to 64 KB
+    header_len = 28
+    kernel_offset = header_len
+    rootfs_offset = (kernel_offset + len(kernel) + 0xffff) & ~0xffff
+    body = kernel.ljust(rootfs_offset - header_len, b'\xff') + rootfs
+    total_len = header_len + len(body)
+    flags_version = (1 << 16)
+    crc = zlib.crc32(struct.pack('<I', flags_version) + struct.pack('<III', kernel_offset, rootfs_offset, 0) + body) & 0xffffffff
+    header = b'HDR0' + struct.pack('<III', total_len, crc, flags_version) + struct.pack('<III', kernel_offset, rootfs_offset, 0)
+    image_path.write_bytes(header + body)
+
+    meta = {
+        'tier': tier,
+        'seed': seed,
+        'image': str(image_path),
+        'image_bytes': image_path.stat().st_size,
+        'rootfs': rootfs_stats,
+    }
+    meta_path.write_text(json.dumps(meta, indent=2))
+    return meta
+
+
+def _git_commit() -> Optional[str]:
+    """Returns the current git commit hash, if available."""
+    try:
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=5)
+        return result.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _profile_once(image_path: str, results_dir: str) -> Dict[str, Any]:
+    """
+    Runs the pipeline once and returns total wall time and span metrics.
+    """
+    from .summarize_results import analyze_firmware
+
+    results_dir = Path(results_dir)
+    if results_dir.exists():
+        shutil.rmtree(results_dir)
+
+    start = time.perf_counter()
+    summary = analyze_firmware(str(image_path), results_dir=str(results_dir), profile=True)
+    elapsed = time.perf_counter() - start
+
+    # spans repeat (one per unsquashfs call, one per delta side), so time,
+    # RSS growth and subprocess counts add up per name and the call count is kept for the gate
+    stages = {}
+    for span in summary.get('performance', {}).get('spans', []):
+        stage = stages.setdefault(span['name'], {'wall_s': 0.0, 'cpu_s': 0.0, 'peak_rss_kb': 0,
+                                                 'peak_rss_delta_kb': 0, 'subprocesses': 0, 'calls': 0})
+        stage['wall_s'] = round(stage['wall_s'] + span['wall_s'], 6)
+        stage['cpu_s'] = round(stage['cpu_s'] + span['cpu_s'], 6)
+        stage['peak_rss_kb'] = max(stage['peak_rss_kb'], span['peak_rss_kb'])
+        stage['peak_rss_delta_kb'] += span['peak_rss_delta_kb']
+        stage['subprocesses'] += span['subprocesses']
+        stage['calls'] += 1
+    return {'total_wall_s': round(elapsed, 6), 'stages': stages}
+
+
+def profile_image(image_path: str, results_dir: str, repeat: int = 1, isolated: bool = True) -> Dict[str, Any]:
+    """
+    Runs the full pipeline on an image and collects per-stage metrics.
+
+    Args:
+        image_path: Path to the firmware image
+        results_dir: Results directory for the run (cleared before each run)
+        repeat: Number of runs; the best value of each metric is kept
+        isolated: If True, each run uses a fresh interpreter so peak RSS
+            is not inflated by earlier runs
+
+    Returns:
+        Dictionary with total wall time and per-stage metrics
+    """
+    runs = []
+    for _ in range(max(repeat, 1)):
+        if isolated:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                runs.append(pool.submit(_profile_once, str(image_path), str(results_dir)).result())
+        else:
+            runs.append(_profile_once(str(image_path), str(results_dir)))
+
+    stages: Dict[str, Dict[str, Any]] = {}
+    for run in runs:
+        for name, metrics in run['stages'].items():
+            best = stages.setdefault(name, dict(metrics))
+            for key, value in metrics.items():
+                best[key] = min(best[key], value)
+
+    return {'total_wall_s': min(run['total_wall_s'] for run in runs), 'stages': stages}
+
+
+def run_tier(tier: str, work_dir: str, seed: int = DEFAULT_SEED, repeat: int = 1) -> Dict[str, Any]:
+    """
+    Runs the full pipeline on a tier's image and collects per-stage metrics.
+
+    Args:
+        tier: Name of a size tier in TIERS
+        work_dir: Directory for generated artifacts and results
+        seed: Random seed for the synthetic image
+        repeat: Number of runs; the fastest wall time per stage is kept
+
+    Returns:
+        Benchmark record for the tier
+    """
+    meta = build_image(tier, work_dir, seed)
+    profile = profile_image(meta['image'], str(Path(work_dir) / tier / 'results'), repeat)
+
+    return {
+        'tier': tier,
+        'seed': seed,
+        'image_bytes': meta['image_bytes'],
+        'files': sum(meta['rootfs']['counts'].values()),
+        'total_wall_s': profile['total_wall_s'],
+        'stages': profile['stages'],
+    }
+
+
+def append_history(history_path: str, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Appends a benchmark run to the JSONL history file.
+
+    Returns:
+        The history entry that was written
+    """
+    entry = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': records,
+    }
+    path = Path(history_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(entry, sort_keys=True) + '\n')
+    return entry
+
+
+def load_history(history_path: str) -> List[Dict[str, Any]]:
+    """Loads all entries from a JSONL history file."""
+    path = Path(history_path)
+    if not path.exists():
+        return []
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare_runs(previous: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Compares per-stage wall times of two history entries.
+
+    Returns:
+        List of per tier and stage differences
+    """
+    rows = []
+    previous_by_tier = {r['tier']: r for r in previous.get('results', [])}
+    for record in current.get('results', []):
+        old = previous_by_tier.get(record['tier'])
+        if not old:
+            continue
+        for stage, metrics in sorted(record['stages'].items()):
+            old_metrics = old['stages'].get(stage)
+            if not old_metrics or not old_metrics['wall_s']:
+                continue
+            rows.append({
+                'tier': record['tier'],
+                'stage': stage,
+                'previous_s': old_metrics['wall_s'],
+                'current_s': metrics['wall_s'],
+                'change_pct': round((metrics['wall_s'] - old_metrics['wall_s']) / old_metrics['wall_s'] * 100, 1),
+            })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m firmaforge.benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark FirmaForge on synthetic firmware images")
+    parser.add_argument('--tiers', nargs='+', default=['tiny', 'small'], choices=sorted(TIERS))
+    parser.add_argument('--work-dir', default='benchmarks/work')
+    parser.add_argument('--history', default=DEFAULT_HISTORY)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    records = [run_tier(tier, args.work_dir, args.seed, args.repeat) for tier in args.tiers]
+    history = load_history(args.history)
+    entry = append_history(args.history, records)
+
+    for record in records:
+        print(f"{record['tier']}: {record['image_bytes']} bytes, {record['files']} files, {record['total_wall_s']:.2f}s")
+        for stage, metrics in sorted(record['stages'].items()):
+            print(f"  {stage:32s} {metrics['wall_s']:9.3f}s  rss {metrics['peak_rss_kb']} KB  procs {metrics['subprocesses']}")
+
+    if history:
+        for row in compare_runs(history[-1], entry):
+            if abs(row['change_pct']) >= 10:
+                print(f"{row['tier']} {row['stage']}: {row['previous_s']:.3f}s -> {row['current_s']:.3f}s ({row['change_pct']:+.1f}%)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,285 @@
+"""
+blob_store.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A content-addressed blob store module that keeps each extracted file
+once across all analyzed images, compressed with zstd, and lets
+image trees be re-materialized from small per-image manifests.
+"""
+
+import json
+import os
+import shutil
+import zlib
+from pathlib import Path
+from typing import Dict, Any, Iterable, Optional
+
+from .report import write_atomic
+from .rootfs_index import RootfsIndex, hash_file
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+MANIFEST_VERSION = 1
+
+
+class BlobStore:
+    """
+    Module containing functions for storing and restoring extracted
+    firmware trees through a deduplicated blob store.
+    """
+
+    def __init__(self, store_dir: str, level: int = 10):
+        """
+        Initializes the blob store.
+
+        Args:
+            store_dir: Path to the blob store directory
+            level: Compression level
+        """
+        self.store_dir = Path(store_dir)
+        self.objects_dir = self.store_dir / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.level = level
+        self.codec = 'zstd' if zstandard is not None else 'zlib'
+
+    def _blob_path(self, digest: str, codec: Optional[str] = None) -> Path:
+        """
+        Returns the on-disk path of a blob.
+        """
+        suffix = '.zst' if (codec or self.codec) == 'zstd' else '.zz'
+        return self.objects_dir / digest[:2] / f"{digest[2:]}{suffix}"
+
+    def _find_blob(self, digest: str) -> Optional[Path]:
+        """
+        Locates a blob regardless of which codec stored it.
+        """
+        for codec in ('zstd', 'zlib'):
+            path = self._blob_path(digest, codec)
+            if path.exists():
+                return path
+        return None
+
+    def _compress(self, data: bytes) -> bytes:
+        """
+        Compresses data with the store codec.
+        """
+        if self.codec == 'zstd':
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return zlib.compress(data, min(self.level, 9))
+
+    def _decompress(self, blob_path: Path, data: bytes) -> bytes:
+        """
+        Decompresses a blob based on its suffix.
+        """
+        if blob_path.suffix == '.zst':
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read .zst blobs")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return zlib.decompress(data)
+
+    def has(self, digest: str) -> bool:
+        """
+        Checks whether a blob is already stored.
+        """
+        return self._find_blob(digest) is not None
+
+    def put_file(self, file_path: Path, digest: Optional[str] = None) -> str:
+        """
+        Stores a file's content if not already present.
+
+        Args:
+            file_path: Path to the file to store
+            digest: Optional precomputed SHA-256 of the file
+
+        Returns:
+            SHA-256 digest of the stored content
+        """
+        if digest is None:
+            digest = hash_file(file_path)
+        if self.has(digest):
+            return digest
+
+        with open(file_path, 'rb') as f:
+            compressed = self._compress(f.read())
+
+        # write then rename so concurrent workers never see partial blobs
+        write_atomic(str(self._blob_path(digest)), compressed, sync=False)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """
+        Returns the uncompressed content of a blob.
+
+        Raises:
+            KeyError: If the blob is not stored
+        """
+        blob_path = self._find_blob(digest)
+        if blob_path is None:
+            raise KeyError(digest)
+        with open(blob_path, 'rb') as f:
+            return self._decompress(blob_path, f.read())
+
+    def archive_tree(self, tree_dir: str, manifest_path: str, index: Optional[RootfsIndex] = None) -> Dict[str, Any]:
+        """
+        Stores every file of a tree and writes its manifest.
+
+        Args:
+            tree_dir: Path to the tree to archive
+            manifest_path: Path to write the manifest JSON
+            index: Optional pre-built index of tree_dir with file hashes
+
+        Returns:
+            Dictionary with archive statistics
+        """
+        tree_dir = Path(tree_dir)
+        if index is None:
+            index = RootfsIndex.build(tree_dir)
+
+        new_blobs = 0
+        stored_bytes = 0
+        for entry in index.files():
+            digest = entry.get('sha256')
+            existed = digest is not None and self.has(digest)
+            entry['sha256'] = self.put_file(tree_dir / entry['path'], digest)
+            if not existed:
+                new_blobs += 1
+                blob_path = self._find_blob(entry['sha256'])
+                stored_bytes += blob_path.stat().st_size if blob_path else 0
+
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'store': str(self.store_dir),
+            'entries': index.to_list(),
+        }
+
+        manifest_path = Path(manifest_path)
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, separators=(',', ':'))
+
+        return {
+            'manifest': str(manifest_path),
+            'files': sum(1 for _ in index.files()),
+            'original_bytes': index.total_size(),
+            'new_blobs': new_blobs,
+            'new_stored_bytes': stored_bytes,
+        }
+
+    def materialize(self, manifest_path: str, dest_dir: str, paths: Optional[Iterable[str]] = None) -> int:
+        """
+        Rebuilds a tree (or a subset of it) from a manifest.
+
+        Args:
+            manifest_path: Path to the manifest JSON
+            dest_dir: Directory to rebuild the tree into
+            paths: Optional relative paths to restore; all entries if None
+
+        Returns:
+            Number of entries restored
+        """
+        manifest = load_manifest(manifest_path)
+        dest_dir = Path(dest_dir)
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        wanted = set(paths) if paths is not None else None
+
+        restored = 0
+        # directories first so files and links have a parent
+        entries = sorted(manifest['entries'], key=lambda e: (e['type'] != 'dir', e['path']))
+        for entry in entries:
+            if wanted is not None and entry['path'] not in wanted:
+                continue
+            target = dest_dir / entry['path']
+            target.parent.mkdir(parents=True, exist_ok=True)
+
+            if entry['type'] == 'dir':
+                target.mkdir(exist_ok=True)
+            elif entry['type'] == 'symlink':
+                if target.is_symlink() or target.exists():
+                    target.unlink()
+                os.symlink(entry['target'], target)
+            elif entry['type'] == 'file':
+                with open(target, 'wb') as f:
+                    f.write(self.get(entry['sha256']))
+                os.chmod(target, entry.get('mode', 0o644))
+            else:
+                continue
+            restored += 1
+
+        # restore directory modes after their contents are written
+        for entry in entries:
+            if entry['type'] == 'dir' and (wanted is None or entry['path'] in wanted):
+                os.chmod(dest_dir / entry['path'], entry.get('mode', 0o755))
+
+        return restored
+
+    def read_file(self, manifest_path: str, rel_path: str) -> bytes:
+        """
+        Reads a single file from an archived tree without restoring it.
+
+        Raises:
+            KeyError: If the path is not a regular file in the manifest
+        """
+        for entry in load_manifest(manifest_path)['entries']:
+            if entry['path'] == rel_path and entry['type'] == 'file':
+                return self.get(entry['sha256'])
+        raise KeyError(rel_path)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns blob count and total compressed size of the store.
+        """
+        count = 0
+        total = 0
+        for blob in self.objects_dir.rglob('*'):
+            if blob.is_file() and not blob.name.startswith('.tmp_'):
+                count += 1
+                total += blob.stat().st_size
+        return {'blobs': count, 'stored_bytes': total}
+
+
+def load_manifest(manifest_path: str) -> Dict[str, Any]:
+    """Loads a tree manifest written by BlobStore.archive_tree."""
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+
+def archive_extracts(firmware_result_dir: str, store_dir: str, remove: bool = True,
+                     index: Optional[RootfsIndex] = None) -> Optional[Dict[str, Any]]:
+    """
+    Archives an image's raw_extracts into the blob store and optionally
+    removes the extracted tree. A hashed index of raw_extracts built
+    earlier in the run is reused instead of hashing every file again.
+    """
+    firmware_dir = Path(firmware_result_dir)
+    raw_dir = firmware_dir / "raw_extracts"
+    if not raw_dir.exists():
+        return None
+
+    store = BlobStore(store_dir)
+    stats = store.archive_tree(str(raw_dir), str(firmware_dir / "raw_extracts.manifest.json"), index)
+    if remove:
+        shutil.rmtree(raw_dir, ignore_errors=True)
+    return stats
+
+
+def restore_extracts(firmware_result_dir: str, store_dir: Optional[str] = None) -> bool:
+    """
+    Re-materializes an image's raw_extracts from its manifest if the
+    tree is missing.
+    """
+    firmware_dir = Path(firmware_result_dir)
+    raw_dir = firmware_dir / "raw_extracts"
+    manifest_path = firmware_dir / "raw_extracts.manifest.json"
+    if raw_dir.exists() or not manifest_path.exists():
+        return False
+
+    if store_dir is None:
+        store_dir = load_manifest(str(manifest_path)).get('store')
+    BlobStore(store_dir).materialize(str(manifest_path), str(raw_dir))
+    return True
@@ -0,0 +1,229 @@
+"""
+delta.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A firmware-to-firmware delta module that compares two extracted rootfs
+trees by path and content hash, re-runs the per-file analyzers only on
+added, changed and removed files, and reports what the update introduced
+or resolved.
+"""
+
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from .instrumentation import get_profiler
+from .rootfs_index import RootfsIndex
+from .similarity import FileResultCache
+from . import static_analyzer
+
+# per-file analyzers whose findings are diffed
+FILE_ANALYZERS = ("elf_analysis", "secrets_analysis", "web_security")
+
+# finding fields that change when unrelated lines are added above a finding
+FINDING_POSITION_FIELDS = ("line",)
+
+
+class DeltaFileFilter(FileResultCache):
+    """
+    Module containing functions for skipping files whose content is
+    identical in the other image.
+    """
+
+    # every added or changed file must be analyzed, however many there are
+    selects_files = True
+
+    def __init__(self, index: RootfsIndex, other: RootfsIndex):
+        """
+        Initializes the filter for one side of a delta.
+
+        Args:
+            index: RootfsIndex of the image being analyzed
+            other: RootfsIndex of the image it is compared with
+        """
+        super().__init__(index)
+        self.other = FileResultCache(other)
+
+    def lookup(self, analyzer: str, rel_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns an empty result for unchanged files so analyzers skip
+        them, and None for files that must be analyzed.
+        """
+        digest = self._digest(rel_path)
+        if digest is not None and digest == self.other._digest(rel_path):
+            self.hit_paths.add(rel_path)
+            return {'records': [], 'counts': {}}
+        self.miss_paths.add(rel_path)
+        return None
+
+    def store(self, analyzer: str, rel_path: str, records: List[Dict[str, Any]],
+              counts: Optional[Dict[str, int]] = None) -> None:
+        """
+        Delta runs do not keep per-file results.
+        """
+        return None
+
+
+def compare_indexes(base: RootfsIndex, target: RootfsIndex) -> Dict[str, List[str]]:
+    """
+    Compares two rootfs indexes by path, type, content hash and symlink target.
+
+    Returns:
+        Dictionary of sorted 'added', 'removed' and 'changed' paths
+    """
+    def signature(entry: Dict[str, Any]) -> tuple:
+        return (entry['type'], entry.get('sha256'), entry.get('target'), entry['mode'])
+
+    base_paths = set(base.entries)
+    target_paths = set(target.entries)
+    changed = [p for p in base_paths & target_paths if signature(base.entries[p]) != signature(target.entries[p])]
+    return {
+        'added': sorted(target_paths - base_paths),
+        'removed': sorted(base_paths - target_paths),
+        'changed': sorted(changed),
+    }
+
+
+def _record_key(record: Any, ignore: Tuple[str, ...] = ()) -> str:
+    """Returns a stable comparison key for a report record, leaving out the ignored fields."""
+    if ignore and isinstance(record, dict):
+        record = {k: v for k, v in record.items() if k not in ignore}
+    return json.dumps(record, sort_keys=True, default=str)
+
+
+def diff_records(base: List[Any], target: List[Any], ignore: Tuple[str, ...] = ()) -> Dict[str, List[Any]]:
+    """
+    Returns records only present in the target ('added') or base ('removed').
+
+    Records are compared without the ignored fields, and as multisets so
+    a second copy of an existing record still counts as added.
+    """
+    def unmatched(records: List[Any], other: List[Any]) -> List[Any]:
+        remaining = Counter(_record_key(r, ignore) for r in other)
+        result = []
+        for r in records:
+            key = _record_key(r, ignore)
+            if remaining[key]:
+                remaining[key] -= 1
+            else:
+                result.append(r)
+        return result
+
+    return {
+        'added': unmatched(target, base),
+        'removed': unmatched(base, target),
+    }
+
+
+def _diff_by_name(base: List[Dict[str, Any]], target: List[Dict[str, Any]], key: str) -> Dict[str, List[Any]]:
+    """
+    Diffs named records, reporting added, removed and changed entries.
+    """
+    base_map = {r.get(key): r for r in base}
+    target_map = {r.get(key): r for r in target}
+    return {
+        'added': [target_map[k] for k in target_map if k not in base_map],
+        'removed': [base_map[k] for k in base_map if k not in target_map],
+        'changed': [{'before': base_map[k], 'after': target_map[k]}
+                    for k in target_map if k in base_map and _record_key(base_map[k]) != _record_key(target_map[k])],
+    }
+
+
+def _file_findings(rootfs_dir: Path, file_filter: DeltaFileFilter) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Runs the per-file analyzers on the files the filter lets through.
+    """
+    findings = {name: [] for name in FILE_ANALYZERS}
+    static_analyzer._run_pass("elf_analysis", static_analyzer.analyze_elves, rootfs_dir,
+                              findings["elf_analysis"].append, file_filter)
+    static_analyzer._run_pass("secrets_analysis", static_analyzer.extract_secrets, rootfs_dir,
+                              findings["secrets_analysis"].append, file_filter)
+    static_analyzer._run_pass("web_security", static_analyzer.analyze_web_security, rootfs_dir,
+                              findings["web_security"].append, file_filter)
+    return findings
+
+
+def _image_facts(firmware_dir: Path, rootfs_dir: Path) -> Dict[str, Any]:
+    """
+    Runs the cheap whole-image passes.
+    """
+    users = static_analyzer._run_pass("users", static_analyzer._analyze_users_internal, firmware_dir, rootfs_dir)
+    return {
+        'users': users['users_list'],
+        'login_capable_users': users['login_capable_users'],
+        'default_credentials': static_analyzer._run_pass("default_credentials", static_analyzer.extract_default_credentials, rootfs_dir),
+        'startup_services': static_analyzer._run_pass("startup_services", static_analyzer.extract_startup_services, rootfs_dir),
+        'firewall': static_analyzer._run_pass("firewall", static_analyzer.extract_firewall_rules, rootfs_dir),
+    }
+
+
+def analyze_delta(base_result_dir: str, target_result_dir: str) -> Dict[str, Any]:
+    """
+    Compares two extracted firmware images and reports what changed.
+
+    Per-file analyzers only run on added and changed files of the target
+    and on changed and removed files of the base, so findings in unchanged
+    files cancel out without being computed.
+
+    Args:
+        base_result_dir: Result directory of the baseline image (with raw_extracts)
+        target_result_dir: Result directory of the updated image (with raw_extracts)
+
+    Returns:
+        Dictionary forming the report's 'delta' section
+    """
+    base_dir = Path(base_result_dir)
+    target_dir = Path(target_result_dir)
+    base_rootfs = base_dir / "raw_extracts" / "rootfs"
+    target_rootfs = target_dir / "raw_extracts" / "rootfs"
+    profiler = get_profiler()
+
+    with profiler.span('delta.index'):
+        base_index = RootfsIndex.build(base_rootfs)
+        target_index = RootfsIndex.build(target_rootfs)
+        files = compare_indexes(base_index, target_index)
+
+    with profiler.span('delta.base'):
+        base_filter = DeltaFileFilter(base_index, target_index)
+        base_findings = _file_findings(base_rootfs, base_filter) if base_rootfs.exists() else {n: [] for n in FILE_ANALYZERS}
+        base_facts = _image_facts(base_dir, base_rootfs)
+
+    with profiler.span('delta.target'):
+        target_filter = DeltaFileFilter(target_index, base_index)
+        target_findings = _file_findings(target_rootfs, target_filter) if target_rootfs.exists() else {n: [] for n in FILE_ANALYZERS}
+        target_facts = _image_facts(target_dir, target_rootfs)
+
+    findings = {}
+    for name in FILE_ANALYZERS:
+        # a finding that only moved within its file is neither new nor resolved
+        diff = diff_records(base_findings[name], target_findings[name], ignore=FINDING_POSITION_FIELDS)
+        findings[name] = {'new': diff['added'], 'resolved': diff['removed']}
+
+    base_firewall = base_facts['firewall']
+    target_firewall = target_facts['firewall']
+
+    return {
+        'base': base_dir.name,
+        'target': target_dir.name,
+        'files': {
+            'added': files['added'],
+            'removed': files['removed'],
+            'changed': files['changed'],
+            'unchanged_count': len(set(base_index.entries) & set(target_index.entries)) - len(files['changed']),
+            'analyzed_base_files': len(base_filter.miss_paths),
+            'analyzed_target_files': len(target_filter.miss_paths),
+        },
+        'findings': findings,
+        'users': _diff_by_name(base_facts['users'], target_facts['users'], 'username'),
+        'login_capable_users': diff_records(base_facts['login_capable_users'], target_facts['login_capable_users']),
+        'default_credentials': diff_records(base_facts['default_credentials'], target_facts['default_credentials']),
+        'startup_services': _diff_by_name(base_facts['startup_services'], target_facts['startup_services'], 'name'),
+        'firewall': {
+            'zones': diff_records(base_firewall.get('zones', []), target_firewall.get('zones', [])),
+            'rules': diff_records(base_firewall.get('rules', []), target_firewall.get('rules', [])),
+            'redirects': diff_records(base_firewall.get('redirects', []), target_firewall.get('redirects', [])),
+        },
+    }
@@ -2,7 +2,7 @@
 detector.py
 
 Author: @natelgrw
-Last Edited: 11/30/2025
+Last Edited: 10/18/2026
 
 A firmware detection module that automatically identifies 
 architecture, endianness, container formats, filesystem types, 
@@ -17,6 +17,16 @@ import re
 from typing import Dict, List, Optional, Tuple, Any
 from pathlib import Path
 import magic
+from .instrumentation import get_profiler
+from .rootfs_resolver import RootfsResolver
+from .triage import (Triage, ELF_MACHINES, UIMAGE_MAGIC, TRIAGE_MAX_BYTES, TRIAGE_TIME_BUDGET_S,
+                     TRIAGE_SAMPLE_BLOCKS, fuse_evidence, parse_uimage)
+
+# fused score at which architecture probing stops early
+ARCH_CONFIDENCE_THRESHOLD = 0.9
+
+# where BusyBox usually lives, checked before its other names
+BUSYBOX_PATHS = ('bin/busybox', 'sbin/busybox', 'usr/bin/busybox')
 
 
 class FirmwareDetector:
@@ -101,6 +111,7 @@ class FirmwareDetector:
         
         self.extracted_dir = Path(extracted_dir) if extracted_dir else None
         self.results = {}
+        self._resolver: Optional[RootfsResolver] = None
         
     def detect_all(self) -> Dict[str, Any]:
         """
@@ -109,22 +120,44 @@ class FirmwareDetector:
         Returns:
             Dictionary containing all detection results
         """
-        encryption_check = self._check_encryption()
+        profiler = get_profiler()
+        stages = [
+            ('file_info', self._get_file_info),
+            ('encryption_check', self._check_encryption),
+            ('architecture', self._detect_architecture),
+            ('endianness', self._detect_endianness),
+            ('container_formats', self._detect_container_formats),
+            ('filesystem_types', self._detect_filesystems),
+            ('bootloader_segments', self._detect_bootloader_segments),
+            ('compression', self._detect_compression),
+            ('binwalk_analysis', self._binwalk_analysis),
+        ]
         
-        self.results = {
-            'file_info': self._get_file_info(),
-            'encryption_check': encryption_check,
-            'architecture': self._detect_architecture(),
-            'endianness': self._detect_endianness(),
-            'container_formats': self._detect_container_formats(),
-            'filesystem_types': self._detect_filesystems(),
-            'bootloader_segments': self._detect_bootloader_segments(),
-            'compression': self._detect_compression(),
-            'binwalk_analysis': self._binwalk_analysis(),
-        }
+        self.results = {}
+        for key, detect in stages:
+            with profiler.span(f'detect.{key}'):
+                self.results[key] = detect()
         
         return self.results
     
+    def triage(self, max_bytes: int = TRIAGE_MAX_BYTES, time_budget_s: float = TRIAGE_TIME_BUDGET_S,
+               sample_blocks: int = TRIAGE_SAMPLE_BLOCKS) -> Dict[str, Any]:
+        """
+        Classifies the firmware from parsed TRX/CHK/uImage/FIT/tar headers
+        and sampled entropy blocks only, without running binwalk or strings.
+        
+        Args:
+            max_bytes: Bytes that may be read in total
+            time_budget_s: Seconds after which no further reads are made
+            sample_blocks: Number of evenly spaced blocks sampled
+        
+        Returns:
+            Dictionary with container, architecture, endianness, rootfs and
+            encryption verdicts, each with a numeric confidence
+        """
+        with get_profiler().span('detect.triage'):
+            return Triage(str(self.firmware_path), max_bytes, time_budget_s, sample_blocks).run()
+    
     def _check_encryption(self) -> Dict[str, Any]:
         """
         Checks if firmware might be encrypted.
@@ -219,86 +252,81 @@ class FirmwareDetector:
     
     def _detect_architecture(self) -> Dict[str, Any]:
         """
-        Detect CPU architectures using priority-based approach:
-        1. Kernel image magic headers (highest priority)
-        2. Device Tree Blob (DTB) parsing
-        3. U-Boot header inspection
-        4. ELF binary inspection (BusyBox)
-        5. Byte-pattern detection (lowest priority, fallback)
-        """
-        detected_arch = None
-        detection_method = None
-        confidence = 'low'
-        
-        # 1: kernel image magic headers
-        kernel_arch = self._detect_kernel_architecture()
-        if kernel_arch:
-            detected_arch = kernel_arch['arch']
-            detection_method = kernel_arch['method']
-            confidence = 'high'
-            return {
-                'detected': [detected_arch],
-                'confidence': confidence,
-                'method': detection_method,
-            }
+        Detects the CPU architecture with cost-ordered evidence probes.
         
-        # 2: device tree blob parsing
-        dtb_arch = self._detect_dtb_architecture()
-        if dtb_arch:
-            detected_arch = dtb_arch['arch']
-            detection_method = dtb_arch['method']
-            confidence = 'high'
-            return {
-                'detected': [detected_arch],
-                'confidence': confidence,
-                'method': detection_method,
-            }
-        
-        # 3: U-Boot header inspection
-        uboot_arch = self._detect_uboot_architecture()
-        if uboot_arch:
-            detected_arch = uboot_arch['arch']
-            detection_method = uboot_arch['method']
-            confidence = 'high'
-            return {
-                'detected': [detected_arch],
-                'confidence': confidence,
-                'method': detection_method,
-            }
+        Probes run cheapest first and each observation is fused with the
+        earlier ones into a score (see triage.fuse_evidence); probing stops
+        once the score reaches ARCH_CONFIDENCE_THRESHOLD, so decisive cheap
+        evidence such as the extracted BusyBox ELF header skips the
+        multi-megabyte image scans and binwalk.
+        """
+        probes = [
+            # (method family, weight, probe) in increasing cost order
+            ('extracted_busybox', 0.95, self._detect_busybox_architecture),
+            ('extracted_kernel', 0.95, self._detect_extracted_kernel_architecture),
+            ('extracted_dtb', 0.85, self._detect_extracted_dtb_architecture),
+            ('header_triage', 0.95, self._detect_header_architecture),
+            ('kernel_scan', 0.9, self._detect_kernel_architecture),
+            ('uboot_scan', 0.95, self._detect_uboot_architecture),
+            ('dtb_scan', 0.85, self._detect_dtb_architecture),
+            ('elf_scan', 0.6, self._detect_elf_architecture),
+            ('binwalk_elf', 0.8, self._detect_binwalk_elf_architecture),
+        ]
         
-        # 4: ELF binary inspection
-        busybox_arch = self._detect_busybox_architecture()
-        if busybox_arch:
-            detected_arch = busybox_arch['arch']
-            detection_method = busybox_arch['method']
-            confidence = 'high'
-            return {
-                'detected': [detected_arch],
-                'confidence': confidence,
-                'method': detection_method,
-            }
+        evidence = []
+        observations = []
+        detected_arch, score = None, 0.0
+        probes_run = 0
         
-        # 5: fallback - ELF header detection
-        elf_arch = self._detect_elf_architecture()
-        if elf_arch:
-            detected_arch = elf_arch['arch']
-            detection_method = elf_arch['method']
-            confidence = 'medium'
+        for family, weight, probe in probes:
+            if score >= ARCH_CONFIDENCE_THRESHOLD:
+                break
+            probes_run += 1
+            try:
+                found = probe()
+            except Exception:
+                found = None
+            if found:
+                found_weight = found.get('weight', weight)
+                evidence.append((found['arch'], found_weight))
+                observations.append({'arch': found['arch'], 'method': found['method'], 'weight': found_weight})
+                detected_arch, score = fuse_evidence(evidence)
+        
+        if not detected_arch:
             return {
-                'detected': [detected_arch],
-                'confidence': confidence,
-                'method': detection_method,
+                'detected': ['unknown'],
+                'confidence': 'low',
+                'score': 0.0,
+                'method': 'none',
+                'evidence': [],
+                'probes_run': probes_run,
             }
         
+        supporting = [o for o in observations if o['arch'] == detected_arch]
         return {
-            'detected': ['unknown'],
-            'confidence': 'low',
-            'method': 'none',
+            'detected': [detected_arch],
+            'confidence': 'high' if score >= ARCH_CONFIDENCE_THRESHOLD else ('medium' if score >= 0.5 else 'low'),
+            'score': score,
+            'method': max(supporting, key=lambda o: o['weight'])['method'],
+            'evidence': observations,
+            'probes_run': probes_run,
         }
     
-    def _detect_kernel_architecture(self) -> Optional[Dict[str, str]]:
+    def _detect_header_architecture(self) -> Optional[Dict[str, Any]]:
         """
-        Detect architecture from Linux kernel image magic headers.
+        Detects architecture from parsed container headers (uImage, FIT,
+        DTB, sysupgrade tar members) within the triage budget.
+        """
+        triage = Triage(str(self.firmware_path), sample_blocks=0)
+        triage.run()
+        arch, score = fuse_evidence(triage.evidence['architecture'])
+        if arch:
+            return {'arch': arch, 'method': 'header_triage', 'weight': score}
+        return None
+    
+    def _detect_extracted_kernel_architecture(self) -> Optional[Dict[str, str]]:
+        """
+        Detects architecture from extracted kernel image headers.
         """
         if self.extracted_dir:
             kernel_dir = self.extracted_dir / "raw_extracts" / "kernel"
@@ -312,7 +340,12 @@ class FirmwareDetector:
                         arch = self._analyze_kernel_file(kernel_file)
                         if arch:
                             return arch
-        
+        return None
+    
+    def _detect_kernel_architecture(self) -> Optional[Dict[str, str]]:
+        """
+        Detect architecture from Linux kernel image magic headers.
+        """
         chunk_size = 4096
         scanned_bytes = 0
         max_scan = min(self.file_size, 5 * 1024 * 1024)
@@ -331,25 +364,12 @@ class FirmwareDetector:
                 if b'\xd0\x0d\xfe\xed' in chunk:
                     return {'arch': 'AArch64', 'method': 'kernel_header_Image'}
             
-            # MIPS uImage: 0x27051956
-            if b'\x27\x05\x19\x56' in chunk or b'\x56\x19\x05\x27' in chunk:
-                offset = chunk.find(b'\x27\x05\x19\x56')
-                if offset == -1:
-                    offset = chunk.find(b'\x56\x19\x05\x27')
-                if offset != -1:
-                    try:
-                        uimg_offset = scanned_bytes + offset
-                        uimg_header = self._read_bytes(uimg_offset, 64)
-                        if len(uimg_header) >= 64:
-                            arch_byte = uimg_header[7]
-                            if arch_byte == 4:
-                                return {'arch': 'MIPS', 'method': 'kernel_header_uImage'}
-                            elif arch_byte == 2:
-                                return {'arch': 'ARM', 'method': 'kernel_header_uImage'}
-                            elif arch_byte == 5:
-                                return {'arch': 'PowerPC', 'method': 'kernel_header_uImage'}
-                    except Exception:
-                        pass
+            # legacy uImage: 0x27051956
+            offset = chunk.find(UIMAGE_MAGIC)
+            if offset != -1:
+                uimage = parse_uimage(self._read_bytes(scanned_bytes + offset, 64))
+                if uimage and uimage['arch'] and uimage['image_type'] in ('kernel', 'multi'):
+                    return {'arch': uimage['arch'], 'method': 'kernel_header_uImage'}
             
             # x86 bzImage header
             if chunk[:2] == b'MZ' or b'Linux version' in chunk[:512]:
@@ -372,13 +392,10 @@ class FirmwareDetector:
             if b'\x18\x28\x6f\x01' in header or b'\x01\x6f\x28\x18' in header:
                 return {'arch': 'ARM', 'method': 'kernel_file_zImage'}
             
-            # MIPS uImage
-            if b'\x27\x05\x19\x56' in header[:64] or b'\x56\x19\x05\x27' in header[:64]:
-                if len(header) >= 64:
-                    arch_byte = header[7]
-                    arch_map = {4: 'MIPS', 2: 'ARM', 5: 'PowerPC'}
-                    if arch_byte in arch_map:
-                        return {'arch': arch_map[arch_byte], 'method': 'kernel_file_uImage'}
+            # legacy uImage
+            uimage = parse_uimage(header[:64])
+            if uimage and uimage['arch']:
+                return {'arch': uimage['arch'], 'method': 'kernel_file_uImage'}
             
             # x86 bzImage
             if header[:2] == b'MZ':
@@ -387,9 +404,9 @@ class FirmwareDetector:
             pass
         return None
     
-    def _detect_dtb_architecture(self) -> Optional[Dict[str, str]]:
+    def _detect_extracted_dtb_architecture(self) -> Optional[Dict[str, str]]:
         """
-        Detects architecture from Device Tree Blob (DTB).
+        Detects architecture from extracted Device Tree Blobs.
         """
         if self.extracted_dir:
             dtb_dir = self.extracted_dir / "raw_extracts" / "dtb"
@@ -403,7 +420,12 @@ class FirmwareDetector:
                         arch = self._analyze_dtb_file(dtb_file)
                         if arch:
                             return arch
-        
+        return None
+    
+    def _detect_dtb_architecture(self) -> Optional[Dict[str, str]]:
+        """
+        Detects architecture from Device Tree Blob (DTB).
+        """
         chunk_size = 4096
         scanned_bytes = 0
         max_scan = min(self.file_size, 10 * 1024 * 1024)
@@ -478,28 +500,12 @@ class FirmwareDetector:
             if not chunk:
                 break
             
-            # look for uImage magic
-            if b'\x27\x05\x19\x56' in chunk or b'\x56\x19\x05\x27' in chunk:
-                offset = chunk.find(b'\x27\x05\x19\x56')
-                if offset == -1:
-                    offset = chunk.find(b'\x56\x19\x05\x27')
-                
-                if offset != -1:
-                    try:
-                        uimg_offset = scanned_bytes + offset
-                        uimg_header = self._read_bytes(uimg_offset, 64)
-                        if len(uimg_header) >= 64:
-                            arch_byte = uimg_header[7]
-                            arch_map = {
-                                2: 'ARM',
-                                4: 'MIPS',
-                                5: 'PowerPC',
-                                3: 'x86',
-                            }
-                            if arch_byte in arch_map:
-                                return {'arch': arch_map[arch_byte], 'method': 'U-Boot_uImage_header'}
-                    except Exception:
-                        pass
+            # look for uImage magic; the arch code is the IH_ARCH byte at offset 29
+            offset = chunk.find(UIMAGE_MAGIC)
+            if offset != -1:
+                uimage = parse_uimage(self._read_bytes(scanned_bytes + offset, 64))
+                if uimage and uimage['arch']:
+                    return {'arch': uimage['arch'], 'method': 'U-Boot_uImage_header'}
             
             scanned_bytes += chunk_size
         
@@ -507,7 +513,7 @@ class FirmwareDetector:
     
     def _detect_busybox_architecture(self) -> Optional[Dict[str, str]]:
         """
-        Detects architecture by inspecting BusyBox ELF binary.
+        Detects architecture by inspecting the extracted BusyBox ELF binary.
         """
         if self.extracted_dir:
             binaries_dir = self.extracted_dir / "binaries"
@@ -518,26 +524,41 @@ class FirmwareDetector:
                         if arch:
                             return arch
             
-            # check rootfs recursively for busybox
-            rootfs_dir = self.extracted_dir / "raw_extracts" / "rootfs"
-            if not rootfs_dir.exists():
-                rootfs_dir = self.extracted_dir / "rootfs"
-            if rootfs_dir.exists():
-                for busybox_path in rootfs_dir.rglob('busybox'):
-                    if busybox_path.is_file():
-                        arch = self._analyze_elf_binary(busybox_path)
-                        if arch:
-                            return arch
-                
-                # check common binary locations
-                for bin_path in [rootfs_dir / "bin" / "busybox", 
-                                rootfs_dir / "sbin" / "busybox",
-                                rootfs_dir / "usr" / "bin" / "busybox"]:
-                    if bin_path.exists():
+            resolver = self._rootfs_resolver()
+            if resolver is not None:
+                # check common binary locations, then any other file named busybox
+                for rel_path in list(BUSYBOX_PATHS) + list(resolver.entries('busybox')):
+                    bin_path = resolver.host_path(rel_path)
+                    if bin_path is not None:
                         arch = self._analyze_elf_binary(bin_path)
                         if arch:
                             return arch
+                
+                # a renamed multi-call binary is still the file most applet links lead to
+                aliases = resolver.aliases()
+                for real_path in sorted(aliases, key=lambda path: (-len(aliases[path]), path))[:3]:
+                    arch = self._analyze_elf_binary(resolver.root / real_path)
+                    if arch:
+                        return arch
         
+        return None
+    
+    def _rootfs_resolver(self) -> Optional[RootfsResolver]:
+        """
+        Returns the link table of the extracted rootfs, built on first use.
+        """
+        if self._resolver is None and self.extracted_dir:
+            rootfs_dir = self.extracted_dir / "raw_extracts" / "rootfs"
+            if not rootfs_dir.exists():
+                rootfs_dir = self.extracted_dir / "rootfs"
+            if rootfs_dir.exists():
+                self._resolver = RootfsResolver.build(rootfs_dir)
+        return self._resolver
+    
+    def _detect_binwalk_elf_architecture(self) -> Optional[Dict[str, str]]:
+        """
+        Detects architecture from ELF executables binwalk finds in the image.
+        """
         try:
             result = subprocess.run(
                 ['binwalk', str(self.firmware_path)],
@@ -556,20 +577,8 @@ class FirmwareDetector:
                             ei_data = elf_chunk[5]
                             ei_machine = struct.unpack('<H', elf_chunk[18:20])[0] if ei_data == 1 else struct.unpack('>H', elf_chunk[18:20])[0]
                             
-                            machine_map = {
-                                0x03: 'x86',
-                                0x3E: 'x86_64',
-                                0x28: 'ARM',
-                                0xB7: 'AArch64',
-                                0x08: 'MIPS',
-                                0x14: 'PowerPC',
-                                0x15: 'PowerPC64',
-                                0xF3: 'RISC-V',
-                            }
-                            
-                            if ei_machine in machine_map:
-                                arch = machine_map[ei_machine]
-                                return {'arch': arch, 'method': 'BusyBox_ELF_header'}
+                            if ei_machine in ELF_MACHINES:
+                                return {'arch': ELF_MACHINES[ei_machine], 'method': 'BusyBox_ELF_header'}
         except Exception:
             pass
         
@@ -587,20 +596,8 @@ class FirmwareDetector:
                 ei_data = elf_header[5]
                 ei_machine = struct.unpack('<H', elf_header[18:20])[0] if ei_data == 1 else struct.unpack('>H', elf_header[18:20])[0]
                 
-                machine_map = {
-                    0x03: 'x86',
-                    0x3E: 'x86_64',
-                    0x28: 'ARM',
-                    0xB7: 'AArch64',
-                    0x08: 'MIPS',
-                    0x14: 'PowerPC',
-                    0x15: 'PowerPC64',
-                    0xF3: 'RISC-V',
-                }
-                
-                if ei_machine in machine_map:
-                    arch = machine_map[ei_machine]
-                    return {'arch': arch, 'method': f'ELF_binary_{binary_file.name}'}
+                if ei_machine in ELF_MACHINES:
+                    return {'arch': ELF_MACHINES[ei_machine], 'method': f'ELF_binary_{binary_file.name}'}
         except Exception:
             pass
         return None
@@ -626,20 +623,8 @@ class FirmwareDetector:
                     ei_data = elf_header[5]
                     ei_machine = struct.unpack('<H', elf_header[18:20])[0] if ei_data == 1 else struct.unpack('>H', elf_header[18:20])[0]
                     
-                    machine_map = {
-                        0x03: 'x86',
-                        0x3E: 'x86_64',
-                        0x28: 'ARM',
-                        0xB7: 'AArch64',
-                        0x08: 'MIPS',
-                        0x14: 'PowerPC',
-                        0x15: 'PowerPC64',
-                        0xF3: 'RISC-V',
-                    }
-                    
-                    if ei_machine in machine_map:
-                        arch = machine_map[ei_machine]
-                        return {'arch': arch, 'method': 'ELF_header_fallback'}
+                    if ei_machine in ELF_MACHINES:
+                        return {'arch': ELF_MACHINES[ei_machine], 'method': 'ELF_header_fallback'}
             
             scanned_bytes += chunk_size
         
@@ -653,31 +638,30 @@ class FirmwareDetector:
         methods = []
         
         # check extracted binaries for ELF files
-        if self.extracted_dir:
-            rootfs_dir = self.extracted_dir / "raw_extracts" / "rootfs"
-            if not rootfs_dir.exists():
-                rootfs_dir = self.extracted_dir / "rootfs"
-            if rootfs_dir.exists():
-                for bin_name in ['busybox', 'ash', 'sh', 'init']:
-                    for bin_path in rootfs_dir.rglob(bin_name):
-                        if bin_path.is_file():
-                            try:
-                                with open(bin_path, 'rb') as f:
-                                    elf_header = f.read(20)
-                                if len(elf_header) >= 20 and elf_header[:4] == b'\x7fELF':
-                                    ei_data = elf_header[5]
-                                    if ei_data == 1 and 'little' not in endianness:
-                                        endianness.append('little')
-                                        methods.append(f'extracted_binary_{bin_name}')
-                                    elif ei_data == 2 and 'big' not in endianness:
-                                        endianness.append('big')
-                                        methods.append(f'extracted_binary_{bin_name}')
-                                    if endianness:
-                                        break
-                            except Exception:
-                                pass
-                    if endianness:
-                        break
+        resolver = self._rootfs_resolver()
+        if resolver is not None:
+            # applet links such as bin/sh are followed inside the rootfs, never on the host
+            for bin_name in ['busybox', 'ash', 'sh', 'init']:
+                for rel_path in resolver.entries(bin_name):
+                    bin_path = resolver.host_path(rel_path)
+                    if bin_path is not None:
+                        try:
+                            with open(bin_path, 'rb') as f:
+                                elf_header = f.read(20)
+                            if len(elf_header) >= 20 and elf_header[:4] == b'\x7fELF':
+                                ei_data = elf_header[5]
+                                if ei_data == 1 and 'little' not in endianness:
+                                    endianness.append('little')
+                                    methods.append(f'extracted_binary_{bin_name}')
+                                elif ei_data == 2 and 'big' not in endianness:
+                                    endianness.append('big')
+                                    methods.append(f'extracted_binary_{bin_name}')
+                                if endianness:
+                                    break
+                        except Exception:
+                            pass
+                if endianness:
+                    break
         
         # scan for ELF files throughout the firmware
         chunk_size = 4096
@@ -773,7 +757,8 @@ class FirmwareDetector:
             pass
         
         if not endianness:
-            arch_results = self._detect_architecture()
+            # reuse the architecture result of detect_all instead of probing again
+            arch_results = self.results.get('architecture') or self._detect_architecture()
             detected_archs = arch_results.get('detected', [])
             
             arch_endianness = {
@@ -0,0 +1,581 @@
+"""
+distributed.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A multi-node work distribution module that lets FirmaForge workers on
+different machines pull analysis jobs from a shared queue, either a
+lease-file directory on a shared filesystem or a Redis broker, with
+leases, heartbeats and reclamation of jobs held by dead workers.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+from .governor import CpuBudgetExceeded, ResourceGovernor
+from .workspace import ExtractionWorkspace
+from .report import report_filename, write_atomic
+
+DEFAULT_LEASE_S = 120.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_POLL_S = 5.0
+# a lease lock older than this was left behind by a worker that died holding it
+LOCK_STALE_S = 30.0
+
+
+def default_worker_id() -> str:
+    """Returns a worker id unique across hosts and processes."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def _new_job(firmware_path: str, options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Builds a job record; ids sort in submission order."""
+    return {
+        'id': f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}",
+        'firmware_path': str(firmware_path),
+        'options': options or {},
+        'attempts': 0,
+        'submitted_at': time.time(),
+        'last_error': None,
+    }
+
+
+class DirectoryQueue:
+    """
+    Module containing functions for a job queue kept as files in a
+    shared directory.
+
+    Jobs live in jobs/<id>.json. A worker claims a job by exclusively
+    creating leases/<id>.lease and keeps it alive by rewriting the
+    lease's expiry. Checking a lease and changing it happen under
+    leases/<id>.lock, so a lease cannot be reclaimed between the two.
+    Finished jobs move to done/ or failed/.
+    """
+
+    def __init__(self, queue_dir: str, lease_s: float = DEFAULT_LEASE_S, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        """
+        Opens (and if needed creates) the queue directory.
+
+        Args:
+            queue_dir: Shared queue directory
+            lease_s: Seconds a lease stays valid without a heartbeat
+            max_attempts: Claims after which a job is moved to failed/
+        """
+        self.root = Path(queue_dir)
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        for sub in ('jobs', 'leases', 'done', 'failed'):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+
+    def _path(self, sub: str, job_id: str, suffix: str = '.json') -> Path:
+        """Returns the path of a job or lease file."""
+        return self.root / sub / f"{job_id}{suffix}"
+
+    def _read(self, path: Path) -> Optional[Dict[str, Any]]:
+        """Reads a JSON file, returning None if it is missing or partial."""
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path: Path, data: Dict[str, Any]) -> None:
+        """Atomically writes a JSON file."""
+        write_atomic(str(path), json.dumps(data, default=str).encode('utf-8'))
+
+    def submit(self, firmware_path: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Adds a job to the queue.
+
+        Returns:
+            Job id
+        """
+        job = _new_job(firmware_path, options)
+        self._write(self._path('jobs', job['id']), job)
+        return job['id']
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Claims the oldest unleased job.
+
+        Returns:
+            Job record, or None if no job is available
+        """
+        for job_path in sorted((self.root / 'jobs').glob('*.json')):
+            job_id = job_path.stem
+            lease_path = self._path('leases', job_id, '.lease')
+            lease = {'worker': worker_id, 'expires_at': time.time() + self.lease_s}
+            try:
+                fd = os.open(str(lease_path), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                continue
+            with os.fdopen(fd, 'w') as f:
+                json.dump(lease, f)
+
+            job = self._read(job_path)
+            if job is None:
+                # finished or reclaimed by another worker in the meantime
+                self._release(job_id, worker_id)
+                continue
+            job['attempts'] += 1
+            job['worker'] = worker_id
+            self._write(job_path, job)
+            return job
+        return None
+
+    @contextlib.contextmanager
+    def _locked(self, job_id: str) -> Iterator[None]:
+        """Holds a job's lease lock for the duration of the block."""
+        lock_path = self._path('leases', job_id, '.lock')
+        while True:
+            try:
+                os.close(os.open(str(lock_path), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                break
+            except FileExistsError:
+                pass
+            try:
+                if time.time() - lock_path.stat().st_mtime > LOCK_STALE_S:
+                    os.unlink(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(0.05)
+        try:
+            yield
+        finally:
+            try:
+                os.unlink(lock_path)
+            except FileNotFoundError:
+                pass
+
+    def _owns(self, job_id: str, worker_id: str) -> bool:
+        """Returns True if the worker holds the job's lease; call under _locked."""
+        lease = self._read(self._path('leases', job_id, '.lease'))
+        return lease is not None and lease.get('worker') == worker_id
+
+    def _unlink_lease(self, job_id: str) -> None:
+        """Deletes a job's lease file; call under _locked."""
+        try:
+            os.unlink(self._path('leases', job_id, '.lease'))
+        except FileNotFoundError:
+            pass
+
+    def _release(self, job_id: str, worker_id: str) -> None:
+        """Deletes the worker's lease on a job."""
+        with self._locked(job_id):
+            if self._owns(job_id, worker_id):
+                self._unlink_lease(job_id)
+
+    def heartbeat(self, job: Dict[str, Any], worker_id: str) -> bool:
+        """
+        Extends a lease.
+
+        Returns:
+            False if the lease was lost to reclamation
+        """
+        with self._locked(job['id']):
+            if not self._owns(job['id'], worker_id):
+                return False
+            self._write(self._path('leases', job['id'], '.lease'),
+                        {'worker': worker_id, 'expires_at': time.time() + self.lease_s})
+        return True
+
+    def complete(self, job: Dict[str, Any], worker_id: str, result: Dict[str, Any]) -> bool:
+        """
+        Marks a job done.
+
+        Returns:
+            False if the lease was lost and the job left to its new owner
+        """
+        with self._locked(job['id']):
+            if not self._owns(job['id'], worker_id):
+                return False
+            job.update({'finished_at': time.time(), 'result': result})
+            self._write(self._path('done', job['id']), job)
+            self._remove_job(job['id'])
+            self._unlink_lease(job['id'])
+        return True
+
+    def fail(self, job: Dict[str, Any], worker_id: str, error: str) -> str:
+        """
+        Records a failed attempt; the job is retried until max_attempts.
+
+        Returns:
+            'failed' if the job was retired, else 'queued'
+        """
+        with self._locked(job['id']):
+            if not self._owns(job['id'], worker_id):
+                return 'lost'
+            job['last_error'] = error
+            if job['attempts'] >= self.max_attempts:
+                job['finished_at'] = time.time()
+                self._write(self._path('failed', job['id']), job)
+                self._remove_job(job['id'])
+                state = 'failed'
+            else:
+                self._write(self._path('jobs', job['id']), job)
+                state = 'queued'
+            self._unlink_lease(job['id'])
+        return state
+
+    def _remove_job(self, job_id: str) -> None:
+        """Deletes a job file from jobs/."""
+        try:
+            os.unlink(self._path('jobs', job_id))
+        except FileNotFoundError:
+            pass
+
+    def reclaim_expired(self) -> int:
+        """
+        Releases leases whose holders stopped heartbeating.
+
+        Returns:
+            Number of jobs reclaimed
+        """
+        reclaimed = 0
+        now = time.time()
+        for lease_path in (self.root / 'leases').glob('*.lease'):
+            job_id = lease_path.name[:-len('.lease')]
+            # the holder cannot renew the lease while it is checked and removed
+            with self._locked(job_id):
+                lease = self._read(lease_path)
+                if lease is not None and lease.get('expires_at', 0) > now:
+                    continue
+                try:
+                    if lease is None and now - lease_path.stat().st_mtime < self.lease_s:
+                        # being written right now
+                        continue
+                    os.unlink(lease_path)
+                except FileNotFoundError:
+                    continue
+
+            job = self._read(self._path('jobs', job_id))
+            if job is not None and job['attempts'] >= self.max_attempts:
+                job['last_error'] = f"lease expired on {lease.get('worker') if lease else 'unknown worker'}"
+                job['finished_at'] = time.time()
+                self._write(self._path('failed', job_id), job)
+                self._remove_job(job_id)
+            reclaimed += 1
+        return reclaimed
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of jobs in each state.
+        """
+        leased = sum(1 for _ in (self.root / 'leases').glob('*.lease'))
+        queued = sum(1 for _ in (self.root / 'jobs').glob('*.json'))
+        return {
+            'queued': queued - leased,
+            'leased': leased,
+            'done': sum(1 for _ in (self.root / 'done').glob('*.json')),
+            'failed': sum(1 for _ in (self.root / 'failed').glob('*.json')),
+        }
+
+
+class RedisQueue:
+    """
+    Module containing functions for a job queue kept in a Redis
+    (or Redis-compatible) broker.
+
+    Pending ids are in <prefix>:pending, claimed ids in <prefix>:leased
+    with a per-job lease key that expires without heartbeats.
+    """
+
+    def __init__(self, url: str, prefix: str = 'firmaforge', lease_s: float = DEFAULT_LEASE_S,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        """
+        Connects to the broker.
+
+        Args:
+            url: Broker URL, e.g. redis://host:6379/0
+            prefix: Key prefix
+            lease_s: Seconds a lease stays valid without a heartbeat
+            max_attempts: Claims after which a job is moved to the failed set
+        """
+        if redis is None:
+            raise RuntimeError("The redis package is required for broker queues")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        # moves the id and sets its lease in one step so a reclaimer never sees it unleased
+        self._claim_script = self.client.register_script(
+            "local id = redis.call('LMOVE', KEYS[1], KEYS[2], 'RIGHT', 'LEFT') "
+            "if id then redis.call('SET', ARGV[1] .. id, ARGV[2], 'PX', ARGV[3]) end "
+            "return id"
+        )
+        # lease checks and the changes they guard run as one step so a reclaimed lease is never touched
+        self._renew_script = self.client.register_script(
+            "if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end "
+            "return redis.call('PEXPIRE', KEYS[1], ARGV[2])"
+        )
+        self._settle_script = self.client.register_script(
+            "if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end "
+            "redis.call('SET', KEYS[2], ARGV[2]) "
+            "redis.call('LREM', KEYS[3], 0, ARGV[3]) "
+            "redis.call(ARGV[4], KEYS[4], ARGV[3]) "
+            "redis.call('DEL', KEYS[1]) "
+            "return 1"
+        )
+
+    def _key(self, *parts: str) -> str:
+        """Returns a prefixed broker key."""
+        return ':'.join((self.prefix,) + parts)
+
+    def submit(self, firmware_path: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """Adds a job to the queue and returns its id."""
+        job = _new_job(firmware_path, options)
+        self.client.set(self._key('job', job['id']), json.dumps(job, default=str))
+        self.client.lpush(self._key('pending'), job['id'])
+        return job['id']
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Claims the oldest pending job, or returns None."""
+        while True:
+            job_id = self._claim_script(keys=[self._key('pending'), self._key('leased')],
+                                        args=[self._key('lease', ''), worker_id, int(self.lease_s * 1000)])
+            if job_id is None:
+                return None
+            payload = self.client.get(self._key('job', job_id))
+            if payload is not None:
+                break
+            # the job record was purged; drop the dead id
+            self.client.lrem(self._key('leased'), 0, job_id)
+            self.client.delete(self._key('lease', job_id))
+        job = json.loads(payload)
+        job['attempts'] += 1
+        job['worker'] = worker_id
+        self.client.set(self._key('job', job_id), json.dumps(job, default=str))
+        return job
+
+    def heartbeat(self, job: Dict[str, Any], worker_id: str) -> bool:
+        """Extends a lease; returns False if it was lost."""
+        return bool(self._renew_script(keys=[self._key('lease', job['id'])],
+                                       args=[worker_id, int(self.lease_s * 1000)]))
+
+    def _settle(self, job: Dict[str, Any], worker_id: str, command: str, target: str) -> bool:
+        """
+        Saves a job and moves its id from leased to target if the worker
+        still holds the lease.
+
+        Args:
+            command: 'SADD' for the done and failed sets, 'RPUSH' for pending
+            target: Key suffix of the destination
+
+        Returns:
+            False if the lease was lost
+        """
+        keys = [self._key('lease', job['id']), self._key('job', job['id']), self._key('leased'), self._key(target)]
+        return bool(self._settle_script(keys=keys, args=[worker_id, json.dumps(job, default=str), job['id'], command]))
+
+    def complete(self, job: Dict[str, Any], worker_id: str, result: Dict[str, Any]) -> bool:
+        """Marks a job done; returns False if the lease was lost."""
+        job.update({'finished_at': time.time(), 'result': result})
+        return self._settle(job, worker_id, 'SADD', 'done')
+
+    def fail(self, job: Dict[str, Any], worker_id: str, error: str) -> str:
+        """Requeues a failed job or retires it after max_attempts."""
+        job['last_error'] = error
+        if job['attempts'] >= self.max_attempts:
+            job['finished_at'] = time.time()
+            return 'failed' if self._settle(job, worker_id, 'SADD', 'failed') else 'lost'
+        return 'queued' if self._settle(job, worker_id, 'RPUSH', 'pending') else 'lost'
+
+    def reclaim_expired(self) -> int:
+        """Requeues jobs whose lease keys expired; returns how many."""
+        reclaimed = 0
+        for job_id in self.client.lrange(self._key('leased'), 0, -1):
+            if self.client.exists(self._key('lease', job_id)):
+                continue
+            # only the reclaimer that removes the id requeues it
+            if not self.client.lrem(self._key('leased'), 1, job_id):
+                continue
+            payload = self.client.get(self._key('job', job_id))
+            if payload is None:
+                # the job record was purged; the id is already out of leased
+                continue
+            job = json.loads(payload)
+            if job['attempts'] >= self.max_attempts:
+                job['last_error'] = f"lease expired on {job.get('worker')}"
+                job['finished_at'] = time.time()
+                self.client.set(self._key('job', job_id), json.dumps(job, default=str))
+                self.client.sadd(self._key('failed'), job_id)
+            else:
+                self.client.rpush(self._key('pending'), job_id)
+            reclaimed += 1
+        return reclaimed
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of jobs in each state."""
+        return {
+            'queued': self.client.llen(self._key('pending')),
+            'leased': self.client.llen(self._key('leased')),
+            'done': self.client.scard(self._key('done')),
+            'failed': self.client.scard(self._key('failed')),
+        }
+
+
+def open_queue(location: str, lease_s: float = DEFAULT_LEASE_S, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+    """
+    Opens a Redis queue for redis:// URLs and a directory queue otherwise.
+    """
+    if location.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisQueue(location, lease_s=lease_s, max_attempts=max_attempts)
+    return DirectoryQueue(location, lease_s=lease_s, max_attempts=max_attempts)
+
+
+def _heartbeat_loop(queue: Any, job: Dict[str, Any], worker_id: str, stop: threading.Event) -> None:
+    """Extends a lease every third of its lifetime until stopped."""
+    while not stop.wait(queue.lease_s / 3):
+        if not queue.heartbeat(job, worker_id):
+            print(f"[worker {worker_id}] lost lease on {job['id']}")
+            return
+
+
+def run_worker(queue: Any, results_dir: str, worker_id: Optional[str] = None, poll_s: float = DEFAULT_POLL_S,
+               max_jobs: Optional[int] = None, exit_when_empty: bool = False,
+               results_db: Optional[str] = None, governor: Optional[ResourceGovernor] = None,
+               vuln_feed: Optional[str] = None, workspace: Optional[ExtractionWorkspace] = None) -> int:
+    """
+    Pulls and analyzes jobs until stopped.
+
+    Args:
+        queue: DirectoryQueue or RedisQueue
+        results_dir: Shared results directory reports are written to
+        worker_id: Optional worker id (defaults to host-pid-random)
+        poll_s: Seconds to wait when the queue is empty
+        max_jobs: Optional number of jobs after which the worker exits
+        exit_when_empty: If True, exit once no job is queued or leased
+        results_db: Optional corpus SQLite database reports are stored in
+        governor: Optional resource governor applied to each job
+        vuln_feed: Optional vulnerability feed index on shared storage
+        workspace: Optional extraction workspace whose scratch location and budgets apply to each job
+
+    Returns:
+        Number of jobs processed
+    """
+    from .summarize_results import analyze_firmware
+
+    worker_id = worker_id or default_worker_id()
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        queue.reclaim_expired()
+        job = queue.claim(worker_id)
+        if job is None:
+            stats = queue.stats()
+            if exit_when_empty and stats['queued'] == 0 and stats['leased'] == 0:
+                break
+            time.sleep(poll_s)
+            continue
+
+        print(f"[worker {worker_id}] {job['firmware_path']} (attempt {job['attempts']})")
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat_loop, args=(queue, job, worker_id, stop), daemon=True)
+        beat.start()
+        try:
+            options = dict(job['options'])
+            if results_db:
+                options.setdefault('results_db', results_db)
+            if governor is not None:
+                options['governor'] = governor
+            if workspace is not None:
+                options['workspace'] = workspace
+            if vuln_feed:
+                options.setdefault('vuln_feed', vuln_feed)
+            report = analyze_firmware(job['firmware_path'], results_dir=results_dir, **options)
+            name = Path(job['firmware_path']).stem
+            result = {
+                'output_path': str(Path(results_dir) / name / report_filename(name, options.get('encoder', 'json'))) if report else None,
+                'skipped': not report,
+            }
+            error = None
+        except (Exception, CpuBudgetExceeded) as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            stop.set()
+            beat.join()
+
+        if error is None:
+            if not queue.complete(job, worker_id, result):
+                print(f"[worker {worker_id}] {job['id']} was reclaimed before completion")
+        else:
+            print(f"[worker {worker_id}] {job['id']} failed: {error} ({queue.fail(job, worker_id, error)})")
+        processed += 1
+    return processed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m firmaforge.distributed."""
+    parser = argparse.ArgumentParser(description="Distributed FirmaForge job queue")
+    parser.add_argument('queue', help="shared queue directory or redis:// URL")
+    parser.add_argument('--lease', type=float, default=DEFAULT_LEASE_S)
+    parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_submit = sub.add_parser('submit', help="queue firmware files or every file in a directory")
+    p_submit.add_argument('paths', nargs='+')
+    p_submit.add_argument('--sbom', action='store_true', help="write a CycloneDX SBOM next to each report")
+
+    p_worker = sub.add_parser('worker', help="pull and analyze jobs")
+    p_worker.add_argument('--results-dir', default='results')
+    p_worker.add_argument('--results-db', default=None)
+    p_worker.add_argument('--worker-id', default=None)
+    p_worker.add_argument('--poll', type=float, default=DEFAULT_POLL_S)
+    p_worker.add_argument('--max-jobs', type=int, default=None)
+    p_worker.add_argument('--exit-when-empty', action='store_true')
+    p_worker.add_argument('--max-memory-mb', type=int, default=None, help="per-job memory limit")
+    p_worker.add_argument('--max-cpu', type=int, default=None, help="per-job CPU time limit in seconds")
+    p_worker.add_argument('--max-open-files', type=int, default=None, help="per-job open file limit")
+    p_worker.add_argument('--max-cpu-cores', type=float, default=None, help="per-job CPU bandwidth in cores (cgroup v2)")
+    p_worker.add_argument('--max-processes', type=int, default=None, help="per-job process limit (cgroup v2)")
+    p_worker.add_argument('--vuln-feed', default=None, help="vulnerability feed index to match packages against")
+    p_worker.add_argument('--scratch-dir', default=None, help="directory for temporary extraction output")
+    p_worker.add_argument('--max-extract-mb', type=int, default=None, help="per-job extraction size limit")
+    p_worker.add_argument('--max-extract-inodes', type=int, default=None, help="per-job extracted file limit")
+    p_worker.add_argument('--tmpfs', action='store_true', help="extract in RAM (/dev/shm); needs --max-extract-mb")
+
+    sub.add_parser('stats', help="show queue counters")
+    args = parser.parse_args(argv)
+
+    queue = open_queue(args.queue, args.lease, args.max_attempts)
+    if args.command == 'submit':
+        count = 0
+        for path in args.paths:
+            files = sorted(p for p in Path(path).iterdir() if p.is_file()) if Path(path).is_dir() else [Path(path)]
+            for f in files:
+                queue.submit(str(f.resolve()), {'sbom': True} if args.sbom else None)
+                count += 1
+        print(f"Queued {count} jobs")
+    elif args.command == 'worker':
+        governor = None
+        if args.max_memory_mb or args.max_cpu or args.max_open_files or args.max_cpu_cores or args.max_processes:
+            governor = ResourceGovernor(max_memory_bytes=args.max_memory_mb * 1024 * 1024 if args.max_memory_mb else None,
+                                        max_cpu_s=args.max_cpu, max_open_files=args.max_open_files,
+                                        max_cpu_cores=args.max_cpu_cores, max_processes=args.max_processes)
+        workspace = None
+        if args.scratch_dir or args.max_extract_mb or args.max_extract_inodes or args.tmpfs:
+            workspace = ExtractionWorkspace(args.scratch_dir, args.max_extract_mb * 1024 * 1024 if args.max_extract_mb else None,
+                                            args.max_extract_inodes, use_tmpfs=args.tmpfs)
+        run_worker(queue, args.results_dir, args.worker_id, args.poll, args.max_jobs,
+                   args.exit_when_empty, args.results_db, governor, args.vuln_feed, workspace)
+    else:
+        print(json.dumps(queue.stats()))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
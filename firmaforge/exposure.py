@@ -0,0 +1,262 @@
+"""
+exposure.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A network exposure module that joins UCI listen options, firewall
+zones and rules, init.d start order and binary presence into one
+table of which service listens on which port and interface, and
+whether it can be reached from the WAN.
+"""
+
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from .uci import UciConfig, UciSection, load_uci
+
+ALL_INTERFACES = '*'
+WILDCARD_ADDRESSES = {'', '0.0.0.0', '::', '*'}
+
+
+def _split_listen(value: str) -> Tuple[str, Optional[int]]:
+    """Splits a uhttpd-style listen value ('addr:port', '[v6]:port' or 'port')."""
+    value = value.strip()
+    if value.startswith('['):
+        address, _, port = value[1:].partition(']:')
+    elif value.count(':') == 1:
+        address, port = value.split(':')
+    elif value.isdigit():
+        address, port = '', value
+    else:
+        address, port = value, ''
+    return address, int(port) if port.isdigit() else None
+
+
+def _listener(service: str, proto: str, port: int, interface: str, **details: Any) -> Dict[str, Any]:
+    """Builds one listener record."""
+    record = {'service': service, 'proto': proto, 'port': port, 'interface': interface}
+    record.update({k: v for k, v in details.items() if v is not None})
+    return record
+
+
+def _uhttpd_listeners(config: UciConfig, addresses: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Returns uhttpd's HTTP and HTTPS listeners."""
+    listeners = []
+    for section in config.sections('uhttpd', 'uhttpd'):
+        for option, scheme in (('listen_http', 'http'), ('listen_https', 'https')):
+            for value in section.get_list(option):
+                address, port = _split_listen(value)
+                if port is not None:
+                    listeners.append(_listener('uhttpd', 'tcp', port, _address_interface(address, addresses),
+                                               address=address or None, scheme=scheme, instance=section.ref))
+    return listeners
+
+
+def _dropbear_listeners(config: UciConfig, addresses: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Returns dropbear's SSH listeners."""
+    listeners = []
+    for section in config.sections('dropbear', 'dropbear'):
+        if not section.get_bool('enable', True):
+            continue
+        port = section.get('Port', '22')
+        listeners.append(_listener('dropbear', 'tcp', int(port) if port.isdigit() else 22,
+                                   section.get('Interface') or ALL_INTERFACES, instance=section.ref,
+                                   password_auth=section.get_bool('PasswordAuth', True),
+                                   root_password_auth=section.get_bool('RootPasswordAuth', True)))
+    return listeners
+
+
+def _dnsmasq_listeners(config: UciConfig, addresses: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Returns dnsmasq's DNS listeners and the DHCP servers it runs per interface."""
+    listeners = []
+    for section in config.sections('dhcp', 'dnsmasq'):
+        port = section.get('port', '53')
+        if port != '0':
+            interfaces = section.get_list('interface') or [ALL_INTERFACES]
+            excluded = set(section.get_list('notinterface'))
+            for interface in interfaces:
+                if interface in excluded:
+                    continue
+                for proto in ('udp', 'tcp'):
+                    listeners.append(_listener('dnsmasq', proto, int(port) if port.isdigit() else 53, interface,
+                                               instance=section.ref,
+                                               local_service_only=section.get_bool('localservice', False)))
+    for section in config.sections('dhcp', 'dhcp'):
+        interface = section.get('interface') or section.name
+        if interface and not section.get_bool('ignore', False) and section.get('dhcpv4', 'server') != 'disabled':
+            listeners.append(_listener('dnsmasq', 'udp', 67, interface, instance=section.ref, role='dhcp'))
+    return listeners
+
+
+def _odhcpd_listeners(config: UciConfig, addresses: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Returns odhcpd's DHCPv6 servers."""
+    listeners = []
+    for section in config.sections('dhcp', 'dhcp'):
+        interface = section.get('interface') or section.name
+        if interface and not section.get_bool('ignore', False) and section.get('dhcpv6') == 'server':
+            listeners.append(_listener('odhcpd', 'udp', 547, interface, instance=section.ref))
+    return listeners
+
+
+def _sysntpd_listeners(config: UciConfig, addresses: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Returns the NTP server when sysntpd serves time."""
+    listeners = []
+    for section in config.sections('system', 'timeserver'):
+        if section.get_bool('enabled', True) and section.get_bool('enable_server', False):
+            interface = section.get('interface') or ALL_INTERFACES
+            listeners.append(_listener('sysntpd', 'udp', 123, interface, instance=section.ref))
+    return listeners
+
+
+def _miniupnpd_listeners(config: UciConfig, addresses: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Returns miniupnpd's SSDP and HTTP listeners."""
+    listeners = []
+    for section in config.sections('upnpd', 'upnpd'):
+        if not section.get_bool('enabled', False):
+            continue
+        interface = section.get('internal_iface') or 'lan'
+        port = section.get('port', '5000')
+        listeners.append(_listener('miniupnpd', 'udp', 1900, interface, instance=section.ref))
+        listeners.append(_listener('miniupnpd', 'tcp', int(port) if port.isdigit() else 5000, interface,
+                                   instance=section.ref))
+    return listeners
+
+
+# init script name, binary paths and listener extractor of each known service
+SERVICE_SPECS: List[Tuple[str, Tuple[str, ...], Callable[[UciConfig, Dict[str, str]], List[Dict[str, Any]]]]] = [
+    ('uhttpd', ('usr/sbin/uhttpd',), _uhttpd_listeners),
+    ('dropbear', ('usr/sbin/dropbear',), _dropbear_listeners),
+    ('dnsmasq', ('usr/sbin/dnsmasq',), _dnsmasq_listeners),
+    ('odhcpd', ('usr/sbin/odhcpd',), _odhcpd_listeners),
+    ('sysntpd', ('usr/sbin/ntpd', 'sbin/ntpd'), _sysntpd_listeners),
+    ('miniupnpd', ('usr/sbin/miniupnpd',), _miniupnpd_listeners),
+]
+
+
+def _interface_addresses(config: UciConfig) -> Dict[str, str]:
+    """Returns the static IPv4 address of each network interface."""
+    addresses = {}
+    for section in config.sections('network', 'interface'):
+        for value in section.get_list('ipaddr'):
+            addresses[value.split('/')[0]] = section.ref
+    return addresses
+
+
+def _address_interface(address: str, addresses: Dict[str, str]) -> str:
+    """Maps a bind address to its network interface ('*' for wildcard, '?' if unknown)."""
+    if address in WILDCARD_ADDRESSES:
+        return ALL_INTERFACES
+    if address in ('127.0.0.1', '::1', 'localhost'):
+        return 'loopback'
+    return addresses.get(address, '?')
+
+
+def _zones(config: UciConfig) -> List[Dict[str, Any]]:
+    """Returns each firewall zone's name, networks, input policy and whether it faces the WAN."""
+    zones = []
+    for section in config.sections('firewall', 'zone'):
+        name = section.get('name') or section.ref
+        networks = section.get_list('network') or [name]
+        zones.append({'name': name, 'networks': networks, 'input': (section.get('input') or 'REJECT').upper(),
+                      'wan': name == 'wan' or section.get_bool('masq', False)})
+    return zones
+
+
+def _port_matches(port: int, spec: Optional[str]) -> bool:
+    """Checks a port against a firewall port list ('22', '80 443', '1000-2000' or '1000:2000')."""
+    if not spec:
+        return True
+    for item in spec.replace(',', ' ').split():
+        low, sep, high = item.replace(':', '-').partition('-')
+        if sep and low.isdigit() and high.isdigit():
+            if int(low) <= port <= int(high):
+                return True
+        elif item.isdigit() and int(item) == port:
+            return True
+    return False
+
+
+def _proto_matches(proto: str, section: UciSection) -> bool:
+    """Checks a protocol against a rule's proto option (default 'tcp udp')."""
+    protos = [p.lower() for p in section.get_list('proto')] or ['tcp', 'udp']
+    return 'all' in protos or proto in protos or ('tcpudp' in protos and proto in ('tcp', 'udp'))
+
+
+def _wan_access(config: UciConfig, zones: List[Dict[str, Any]], listener: Dict[str, Any]) -> Tuple[bool, str]:
+    """Decides whether the firewall lets WAN traffic reach a listener."""
+    if config.package('firewall') is None:
+        return listener['interface'] == ALL_INTERFACES, 'no firewall config'
+    wan_zones = [z for z in zones if z['wan']]
+    wan_networks = {n for z in wan_zones for n in z['networks']}
+    interface = listener['interface']
+    if interface != ALL_INTERFACES and interface not in wan_networks:
+        return False, f"bound to {interface}"
+    if listener.get('local_service_only'):
+        return False, 'answers local subnets only'
+
+    for zone in wan_zones:
+        if zone['input'] == 'ACCEPT':
+            return True, f"zone {zone['name']} input ACCEPT"
+    # a rule from '*' applies to every zone, the WAN zones included
+    wan_names = {z['name'] for z in wan_zones} | ({'*'} if wan_zones else set())
+    for rule in config.sections('firewall', 'rule'):
+        if (rule.get('src') in wan_names and not rule.get('dest') and rule.get_bool('enabled', True)
+                and (rule.get('target') or '').upper() == 'ACCEPT'
+                and _proto_matches(listener['proto'], rule) and _port_matches(listener['port'], rule.get('dest_port'))):
+            return True, f"rule {rule.get('name') or rule.ref}"
+    return False, 'blocked by WAN input policy'
+
+
+def analyze_exposure(rootfs_dir: Path, startup_services: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Builds the exposure table of a rootfs from its parsed UCI config, the
+    startup services found by extract_startup_services and the service
+    binaries present.
+
+    Returns:
+        Dictionary with 'listeners', 'port_forwards' and 'wan_exposed'
+    """
+    rootfs_dir = Path(rootfs_dir)
+    config = load_uci(rootfs_dir)
+    services = {s['name']: s for s in startup_services or []}
+    addresses = _interface_addresses(config)
+    zones = _zones(config)
+
+    listeners = []
+    for name, binaries, extract in SERVICE_SPECS:
+        found = extract(config, addresses)
+        if not found:
+            continue
+        binary = next((b for b in binaries if (rootfs_dir / b).is_file() or (rootfs_dir / b).is_symlink()), None)
+        service = services.get(name)
+        for listener in found:
+            listener['binary_present'] = binary is not None
+            listener['start'] = service.get('start') if service else None
+            listener['enabled'] = service is not None and service.get('enabled', True) and service.get('start') is not None
+            reachable, reason = _wan_access(config, zones, listener)
+            listener['wan_reachable'] = reachable and listener['enabled'] and listener['binary_present']
+            listener['reason'] = reason if listener['enabled'] and listener['binary_present'] else \
+                'service not started' if listener['binary_present'] else 'binary missing'
+            listeners.append(listener)
+
+    wan_names = {z['name'] for z in zones if z['wan']}
+    forwards = []
+    for redirect in config.sections('firewall', 'redirect'):
+        if redirect.get('src') in wan_names and redirect.get_bool('enabled', True) \
+                and (redirect.get('target') or 'DNAT').upper() == 'DNAT':
+            forwards.append({
+                'name': redirect.get('name') or redirect.ref,
+                'proto': redirect.get('proto', 'tcp udp'),
+                'src_dport': redirect.get('src_dport'),
+                'dest_ip': redirect.get('dest_ip'),
+                'dest_port': redirect.get('dest_port') or redirect.get('src_dport'),
+            })
+
+    listeners.sort(key=lambda l: (l['start'] if l['start'] is not None else 999, l['service'], l['port'], l['proto'],
+                                  l.get('address', '')))
+    return {
+        'listeners': listeners,
+        'port_forwards': forwards,
+        'wan_exposed': sorted({f"{l['service']} {l['proto']}/{l['port']}" for l in listeners if l['wan_reachable']}),
+    }
@@ -2,7 +2,7 @@
 extractor.py
 
 Author: @natelgrw
-Last Edited: 11/30/2025
+Last Edited: 10/18/2026
 
 A firmware extractor module that automatically 
 extracts kernel and rootfs from firmware files.
@@ -12,9 +12,10 @@ import os
 import subprocess
 import shutil
 from pathlib import Path
-from typing import Dict, Any, List
-import tempfile
+from typing import Dict, Any, List, Optional
 import re
+from .workspace import ExtractionWorkspace, WorkspaceQuotaExceeded
+from .instrumentation import get_profiler
 
 
 class FirmwareExtractor:
@@ -22,7 +23,7 @@ class FirmwareExtractor:
     Fast and efficient module containing functions for firmware extraction.
     """
     
-    def __init__(self, firmware_path: str, output_dir: str = None):
+    def __init__(self, firmware_path: str, output_dir: str = None, workspace: Optional[ExtractionWorkspace] = None):
         """
         Initializes the extractor with the firmware file path and 
         optional output directory.
@@ -30,6 +31,7 @@ class FirmwareExtractor:
         Args:
             firmware_path: Path to firmware file
             output_dir: Optional path to output directory
+            workspace: Optional scratch workspace with usage budgets
         """
         self.firmware_path = Path(firmware_path)
         if not self.firmware_path.exists():
@@ -50,6 +52,7 @@ class FirmwareExtractor:
         self.rootfs_dir = self.raw_dir / "rootfs"
         self.extraction_log: List[str] = []
         self.temp_dir = None
+        self.workspace = workspace if workspace is not None else ExtractionWorkspace()
 
         # create directories
         self.kernel_dir.mkdir(parents=True, exist_ok=True)
@@ -68,26 +71,37 @@ class FirmwareExtractor:
             'extraction_log': []
         }
         
+        profiler = get_profiler()
+        
         try:
-            self.temp_dir = Path(tempfile.mkdtemp(prefix="firmaforge_"))
+            self.temp_dir = self.workspace.create()
+            self.extraction_log.append(f"Scratch workspace: {self.temp_dir} ({self.workspace.backend})")
+            # carved components and the unpacked rootfs count against the same budgets
+            self.workspace.watch(self.kernel_dir)
+            self.workspace.watch(self.rootfs_dir)
             
             # 1: run binwalk to extract everything
             self.extraction_log.append("Running binwalk extraction...")
-            self._run_binwalk()
+            with profiler.span('extract.binwalk'):
+                self._run_binwalk()
             
             # 2: find and extract kernel
             self.extraction_log.append("Searching for kernel...")
-            self._extract_kernel()
+            with profiler.span('extract.kernel'):
+                self._extract_kernel()
             
             # 3: find and extract rootfs
             self.extraction_log.append("Searching for rootfs...")
-            self._extract_rootfs()
+            with profiler.span('extract.rootfs'):
+                self._extract_rootfs()
             
+        except WorkspaceQuotaExceeded as e:
+            self.extraction_log.append(f"Extraction aborted: {str(e)}")
         finally:
-            if self.temp_dir and self.temp_dir.exists():
-                shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.workspace.cleanup()
         
         results['extraction_log'] = self.extraction_log
+        results['workspace'] = self.workspace.report()
         return results
 
     def _run_binwalk(self) -> None:
@@ -95,16 +109,16 @@ class FirmwareExtractor:
         Runs binwalk to extract all embedded files.
         """
         try:
-            result = subprocess.run(
+            result = self.workspace.run(
                 ['binwalk', '-e', '--run-as=root', '-C', str(self.temp_dir), str(self.firmware_path)],
-                capture_output=True,
-                text=True,
                 timeout=300
             )
             if result.returncode == 0:
                 self.extraction_log.append("Binwalk extraction completed")
             else:
                 self.extraction_log.append("Binwalk completed with warnings")
+        except WorkspaceQuotaExceeded as e:
+            self.extraction_log.append(f"Binwalk aborted: {str(e)}")
         except Exception as e:
             self.extraction_log.append(f"Binwalk error: {str(e)}")
 
@@ -153,8 +167,11 @@ class FirmwareExtractor:
             if kernel_name == 'kernel' and kernel_path.parent.name:
                 kernel_name = f"{kernel_path.parent.name}_{kernel_name}"
             dest = self.kernel_dir / kernel_name
+            self.workspace.check(kernel_path.stat().st_size)
             shutil.copy2(kernel_path, dest)
             self.extraction_log.append(f"Extracted kernel: {kernel_name} ({dest.stat().st_size} bytes)")
+        except WorkspaceQuotaExceeded:
+            raise
         except Exception as e:
             self.extraction_log.append(f"Error copying kernel: {str(e)}")
 
@@ -192,6 +209,8 @@ class FirmwareExtractor:
                                 self.extraction_log.append(f"Found {kernel_type} kernel at offset {offset}")
                                 self._extract_component_at_offset(offset, self.kernel_dir, f"kernel_{offset}_{kernel_type}", extract_size)
                                 return
+        except WorkspaceQuotaExceeded:
+            raise
         except Exception as e:
             self.extraction_log.append(f"Error extracting kernel: {str(e)[:100]}")
 
@@ -260,6 +279,7 @@ class FirmwareExtractor:
                     continue
                     
                 test_file = self.temp_dir / f"test_{offset}"
+                self.workspace.check(len(test_chunk))
                 with open(test_file, 'wb') as f:
                     f.write(test_chunk)
                 
@@ -281,15 +301,20 @@ class FirmwareExtractor:
                         
                         if len(fs_data) > 1024:
                             fs_temp = self.temp_dir / f"squashfs_{offset}"
+                            self.workspace.check(len(fs_data))
                             with open(fs_temp, 'wb') as f:
                                 f.write(fs_data)
                             
                             if self._extract_squashfs_rootfs(fs_temp):
                                 self.extraction_log.append(f"Extracted SquashFS from offset {offset}")
                                 return
+                except WorkspaceQuotaExceeded:
+                    raise
                 except Exception:
                     continue
                         
+        except WorkspaceQuotaExceeded:
+            raise
         except Exception as e:
             self.extraction_log.append(f"Error extracting SquashFS from firmware: {str(e)[:100]}")
 
@@ -309,12 +334,11 @@ class FirmwareExtractor:
                 shutil.rmtree(self.rootfs_dir)
             self.rootfs_dir.mkdir(parents=True, exist_ok=True)
             
-            result = subprocess.run(
-                ['unsquashfs', '-f', '-no-xattrs', '-d', str(self.rootfs_dir), str(sqfs_path)],
-                capture_output=True,
-                text=True,
-                timeout=180
-            )
+            with get_profiler().span('extract.unsquashfs'):
+                result = self.workspace.run(
+                    ['unsquashfs', '-f', '-no-xattrs', '-d', str(self.rootfs_dir), str(sqfs_path)],
+                    timeout=180
+                )
             
             file_count = sum(1 for _ in self.rootfs_dir.rglob('*') if _.is_file()) if self.rootfs_dir.exists() else 0
             
@@ -338,6 +362,8 @@ class FirmwareExtractor:
                     self.extraction_log.append(f"Extracted SquashFS rootfs: {file_count} files")
                     return True
                     
+        except WorkspaceQuotaExceeded:
+            raise
         except Exception as e:
             self.extraction_log.append(f"SquashFS extraction error: {str(e)[:100]}")
         return False
@@ -359,9 +385,12 @@ class FirmwareExtractor:
             
             if len(data) >= 1024:
                 output_file = target_dir / name
+                self.workspace.check(len(data))
                 with open(output_file, 'wb') as f:
                     f.write(data)
                 self.extraction_log.append(f"Extracted component at offset {offset}: {len(data)} bytes -> {name}")
+        except WorkspaceQuotaExceeded:
+            raise
         except Exception as e:
             self.extraction_log.append(f"Error extracting component: {str(e)[:100]}")
 
@@ -0,0 +1,491 @@
+"""
+governor.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A resource governor module that bounds the memory, CPU time and open
+files of an analysis worker and the tools it launches, degrades passes
+that run out of headroom instead of crashing, and reports the peak
+usage observed for each image.
+"""
+
+import contextlib
+import errno
+import gc
+import itertools
+import math
+import os
+import signal
+import threading
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+CGROUP_ROOT = Path('/sys/fs/cgroup')
+CGROUP_PREFIX = 'firmaforge-'
+CPU_PERIOD_US = 100000
+
+# fraction of the memory limit above which passes switch to sampled mode
+SAMPLE_THRESHOLD = 0.75
+
+
+# derives from BaseException so per-file "except Exception" handlers in
+# the analyzers do not swallow it and the whole pass is degraded instead
+class CpuBudgetExceeded(BaseException):
+    """Raised in the worker when its CPU time limit is reached."""
+
+
+def _on_sigxcpu(signum: int, frame: Any) -> None:
+    raise CpuBudgetExceeded("CPU time limit reached")
+
+
+def _current_rss_kb() -> int:
+    """Returns the current resident set size in KB, or 0 if unavailable."""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except Exception:
+        pass
+    return 0
+
+
+def _cpu_seconds() -> float:
+    """Returns the CPU time this process has used so far."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _pid_alive(pid: int) -> bool:
+    """Checks whether a process exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _open_fds() -> int:
+    """Returns the number of open file descriptors, or 0 if unavailable."""
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return 0
+
+
+class CgroupLimiter:
+    """
+    Module containing functions for confining a worker to its own
+    cgroup v2 group with memory, CPU and pid limits.
+
+    cgroup v2 only lets a non-root group enable controllers for its
+    children while it holds no processes itself, so workers move into
+    their own leaf group under the base group they were started in
+    before enabling the controllers on it. Every process of the base
+    group has to move out this way, including a supervisor that spawns
+    workers (see vacate()).
+    """
+
+    def __init__(self, path: Path, origin: Optional[Path] = None, base: Optional[Path] = None):
+        """
+        Initializes the limiter for an existing cgroup directory.
+
+        Args:
+            path: The process's leaf group
+            origin: Group the process was in before
+            base: Group the leaf was created under
+        """
+        self.path = path
+        self.origin = origin
+        self.base = base
+
+    @staticmethod
+    def _current() -> Path:
+        """Returns this process's cgroup v2 directory."""
+        with open('/proc/self/cgroup', 'r') as f:
+            unified = [line.strip()[3:] for line in f if line.startswith('0::')]
+        if not unified or not (CGROUP_ROOT / 'cgroup.controllers').exists():
+            raise OSError("cgroup v2 is not mounted")
+        return CGROUP_ROOT / unified[0].lstrip('/')
+
+    @staticmethod
+    def _base(current: Path) -> Path:
+        """Returns the group above any firmaforge leaf groups the process inherited."""
+        base = current
+        while base.name.startswith(CGROUP_PREFIX) and base != CGROUP_ROOT:
+            base = base.parent
+        return base
+
+    @staticmethod
+    def _sweep(base: Path, keep: Path) -> None:
+        """Removes empty firmaforge leaf groups left by exited processes and earlier images."""
+        for group in base.glob(f"{CGROUP_PREFIX}*"):
+            owner = group.name[len(CGROUP_PREFIX):].split('-')[0]
+            if group == keep or (owner.isdigit() and int(owner) != os.getpid() and _pid_alive(int(owner))):
+                continue
+            try:
+                # populated groups refuse rmdir
+                group.rmdir()
+            except OSError:
+                pass
+
+    @classmethod
+    def _enter(cls, name: str) -> tuple:
+        """Moves this process into a leaf group under its base group; returns (leaf, base, previous)."""
+        current = cls._current()
+        base = cls._base(current)
+        leaf = base / name
+        leaf.mkdir(exist_ok=True)
+        if current != leaf:
+            (leaf / 'cgroup.procs').write_text(str(os.getpid()))
+        cls._sweep(base, leaf)
+        return leaf, base, current
+
+    @classmethod
+    def vacate(cls) -> Optional[Path]:
+        """
+        Moves this process out of its base group into an unlimited leaf,
+        so processes it spawns afterwards start there and can enable
+        controllers on the base group themselves.
+
+        Returns:
+            The leaf group, or None if cgroup v2 is unavailable
+        """
+        try:
+            leaf, _, _ = cls._enter(f"{CGROUP_PREFIX}{os.getpid()}-supervisor")
+        except OSError:
+            return None
+        return leaf
+
+    @classmethod
+    def create(cls, name: str, memory_max: Optional[int] = None, cpu_quota: Optional[float] = None,
+               pids_max: Optional[int] = None) -> 'CgroupLimiter':
+        """
+        Moves this process into a new leaf group and applies limits to it.
+
+        Args:
+            name: Name of the leaf group, starting with CGROUP_PREFIX
+            memory_max: Optional memory.max in bytes
+            cpu_quota: Optional CPU quota in cores
+            pids_max: Optional pids.max
+
+        Raises:
+            OSError: If cgroup v2 is unavailable, a controller is not
+                delegated, or other processes still share the base group
+        """
+        wanted = [c for c, value in (('memory', memory_max), ('cpu', cpu_quota), ('pids', pids_max)) if value is not None]
+        leaf, base, previous = cls._enter(name)
+        try:
+            available = (base / 'cgroup.controllers').read_text().split()
+            missing = [c for c in wanted if c not in available]
+            if missing:
+                raise OSError(f"controllers not delegated to {base}: {' '.join(missing)}")
+            enabled = (base / 'cgroup.subtree_control').read_text().split()
+            to_enable = [c for c in wanted if c not in enabled]
+            if to_enable:
+                try:
+                    (base / 'cgroup.subtree_control').write_text(' '.join(f"+{c}" for c in to_enable))
+                except OSError as e:
+                    if e.errno == errno.EBUSY:
+                        raise OSError(f"other processes share {base}; run the analysis in its own cgroup") from e
+                    raise
+        except OSError:
+            # controllers are not enabled on the base group, so the process may return there
+            cls(leaf, previous, base).release()
+            raise
+
+        limiter = cls(leaf, previous, base)
+        try:
+            if memory_max is not None:
+                (leaf / 'memory.max').write_text(str(memory_max))
+                if (leaf / 'memory.swap.max').exists():
+                    (leaf / 'memory.swap.max').write_text('0')
+            if cpu_quota is not None:
+                (leaf / 'cpu.max').write_text(f"{int(cpu_quota * CPU_PERIOD_US)} {CPU_PERIOD_US}")
+            if pids_max is not None:
+                (leaf / 'pids.max').write_text(str(pids_max))
+        except OSError:
+            limiter.release()
+            raise
+        return limiter
+
+    def release(self) -> None:
+        """
+        Returns this process to the group it came from and removes the
+        leaf group; when the base group now has controllers enabled and
+        cannot take the process back, the leaf's limits are lifted
+        instead and the group is removed by a later sweep.
+        """
+        # the origin may be an earlier image's leaf that has been swept since
+        for group in (self.origin, self.base):
+            if group is None:
+                continue
+            try:
+                (group / 'cgroup.procs').write_text(str(os.getpid()))
+            except OSError:
+                continue
+            try:
+                self.path.rmdir()
+            except OSError:
+                pass
+            return
+        for name in ('memory.max', 'memory.swap.max', 'cpu.max', 'pids.max'):
+            try:
+                if (self.path / name).exists():
+                    (self.path / name).write_text('max')
+            except OSError:
+                pass
+
+    def peak_bytes(self) -> int:
+        """
+        Returns the group's peak memory usage (current usage on older kernels).
+        """
+        for name in ('memory.peak', 'memory.current'):
+            try:
+                return int((self.path / name).read_text().strip())
+            except (OSError, ValueError):
+                continue
+        return 0
+
+    def oom_kills(self) -> int:
+        """
+        Returns how many processes in the group were OOM-killed.
+        """
+        try:
+            for line in (self.path / 'memory.events').read_text().splitlines():
+                key, value = line.split()
+                if key == 'oom_kill':
+                    return int(value)
+        except (OSError, ValueError):
+            pass
+        return 0
+
+
+class ResourceGovernor:
+    """
+    Module containing functions for applying per-image resource limits
+    and recording how analysis degraded under them.
+    """
+
+    def __init__(self, max_memory_bytes: Optional[int] = None, max_cpu_s: Optional[int] = None,
+                 max_open_files: Optional[int] = None, use_cgroup: bool = True, enabled: bool = True,
+                 max_cpu_cores: Optional[float] = None, max_processes: Optional[int] = None):
+        """
+        Initializes the governor.
+
+        Args:
+            max_memory_bytes: Optional address-space limit for the worker and each child tool
+            max_cpu_s: Optional CPU time limit for the worker
+            max_open_files: Optional open file descriptor limit
+            use_cgroup: If True, also try a cgroup v2 group covering the worker and its children
+            enabled: If False, no limits are applied and passes never degrade
+            max_cpu_cores: Optional CPU bandwidth shared by the worker and its children (cgroup only)
+            max_processes: Optional number of processes the worker and its children may run (cgroup only)
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.max_cpu_s = max_cpu_s
+        self.max_open_files = max_open_files
+        self.max_cpu_cores = max_cpu_cores
+        self.max_processes = max_processes
+        self.use_cgroup = use_cgroup
+        self.enabled = enabled
+        self.sampled = False
+        self.degraded: List[Dict[str, Any]] = []
+        self.backend = 'none'
+        self.backend_note = None
+        self._cgroup: Optional[CgroupLimiter] = None
+        self._saved_limits: Dict[int, tuple] = {}
+        self._saved_handler = None
+        self._peak_fds = 0
+        self._cgroup_peak = None
+        self._cgroup_oom_kills = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # only the configuration crosses process boundaries
+        return {'max_memory_bytes': self.max_memory_bytes, 'max_cpu_s': self.max_cpu_s,
+                'max_open_files': self.max_open_files, 'use_cgroup': self.use_cgroup, 'enabled': self.enabled,
+                'max_cpu_cores': self.max_cpu_cores, 'max_processes': self.max_processes}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)
+
+    def _set_soft_limit(self, which: int, value: int) -> None:
+        """Lowers a soft rlimit, remembering the previous value."""
+        soft, hard = resource.getrlimit(which)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        self._saved_limits[which] = (soft, hard)
+        resource.setrlimit(which, (value, hard))
+
+    def apply(self) -> None:
+        """
+        Applies the configured limits to this process; child tools
+        inherit them.
+        """
+        if not self.enabled:
+            return
+
+        self.sampled = False
+        self.degraded = []
+        self.backend = 'none'
+        self.backend_note = None
+        self._cgroup_peak = None
+        self._cgroup_oom_kills = None
+        self._peak_fds = _open_fds()
+
+        if self.use_cgroup and (self.max_memory_bytes or self.max_cpu_cores or self.max_processes):
+            try:
+                # a fresh group per image so its peak and OOM counters cover only this image
+                self._cgroup = CgroupLimiter.create(f"{CGROUP_PREFIX}{os.getpid()}-{next(_cgroup_serial)}",
+                                                    memory_max=self.max_memory_bytes or None,
+                                                    cpu_quota=self.max_cpu_cores or None,
+                                                    pids_max=self.max_processes or None)
+                self.backend = 'cgroup'
+            except OSError as e:
+                self.backend_note = f"cgroup v2 unavailable: {e}"
+        elif self.max_cpu_cores or self.max_processes:
+            self.backend_note = "CPU core and process limits need cgroup v2"
+
+        if resource is not None:
+            if self.max_memory_bytes:
+                self._set_soft_limit(resource.RLIMIT_AS, self.max_memory_bytes)
+            if self.max_cpu_s:
+                # RLIMIT_CPU counts from process start, so a warm worker's
+                # budget starts at the time it has already used
+                self._set_soft_limit(resource.RLIMIT_CPU, math.ceil(_cpu_seconds()) + self.max_cpu_s)
+                if threading.current_thread() is threading.main_thread():
+                    self._saved_handler = signal.signal(signal.SIGXCPU, _on_sigxcpu)
+            if self.max_open_files:
+                self._set_soft_limit(resource.RLIMIT_NOFILE, self.max_open_files)
+            if self._saved_limits and self.backend == 'none':
+                self.backend = 'rlimit'
+            elif self._saved_limits:
+                self.backend = 'cgroup+rlimit'
+
+    def restore(self) -> None:
+        """
+        Restores the limits that were in place before apply().
+        """
+        for which, limits in self._saved_limits.items():
+            try:
+                resource.setrlimit(which, limits)
+            except (ValueError, OSError):
+                pass
+        self._saved_limits = {}
+        if self._cgroup is not None:
+            self._cgroup_peak = self._cgroup.peak_bytes()
+            self._cgroup_oom_kills = self._cgroup.oom_kills()
+            self._cgroup.release()
+            self._cgroup = None
+        if self._saved_handler is not None:
+            signal.signal(signal.SIGXCPU, self._saved_handler)
+            self._saved_handler = None
+
+    def grant_cpu_grace(self) -> None:
+        """
+        Extends an exceeded CPU limit by a tenth of the budget (at least
+        10 seconds) so the remaining passes can still report.
+        """
+        if resource is None or resource.RLIMIT_CPU not in self._saved_limits:
+            return
+        soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        grace = math.ceil(_cpu_seconds()) + max(10, self.max_cpu_s // 10)
+        if hard != resource.RLIM_INFINITY:
+            grace = min(grace, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (grace, hard))
+
+    def should_sample(self, pass_name: Optional[str] = None) -> bool:
+        """
+        Returns True if passes should read sampled data, either because
+        a pass already ran out of memory or usage is close to the limit.
+        """
+        if not self.enabled:
+            return False
+        if not self.sampled and self.max_memory_bytes:
+            if _current_rss_kb() * 1024 > self.max_memory_bytes * SAMPLE_THRESHOLD:
+                self.sampled = True
+                self.record(pass_name, 'sampled', 'memory usage near limit')
+        return self.sampled
+
+    def observe(self) -> None:
+        """
+        Samples usage counters that are not tracked by the kernel as peaks.
+        """
+        self._peak_fds = max(self._peak_fds, _open_fds())
+
+    def record(self, pass_name: Optional[str], action: str, reason: str) -> None:
+        """
+        Records that a pass was sampled or skipped.
+        """
+        self.degraded.append({'pass': pass_name, 'action': action, 'reason': reason})
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Returns the 'resources' report section.
+        """
+        if not self.enabled:
+            return {'enabled': False}
+
+        self.observe()
+        section = {
+            'enabled': True,
+            'backend': self.backend,
+            'limits': {
+                'max_memory_bytes': self.max_memory_bytes,
+                'max_cpu_s': self.max_cpu_s,
+                'max_open_files': self.max_open_files,
+                'max_cpu_cores': self.max_cpu_cores,
+                'max_processes': self.max_processes,
+            },
+            'peak_fds': self._peak_fds,
+            'sampled': self.sampled,
+            'degraded': list(self.degraded),
+        }
+        if resource is not None:
+            self_usage = resource.getrusage(resource.RUSAGE_SELF)
+            child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            section['peak_rss_kb'] = self_usage.ru_maxrss
+            section['peak_child_rss_kb'] = child_usage.ru_maxrss
+            section['cpu_s'] = round(self_usage.ru_utime + self_usage.ru_stime, 3)
+            section['child_cpu_s'] = round(child_usage.ru_utime + child_usage.ru_stime, 3)
+        if self._cgroup is not None:
+            section['cgroup_peak_bytes'] = self._cgroup.peak_bytes()
+            section['cgroup_oom_kills'] = self._cgroup.oom_kills()
+        elif self._cgroup_peak is not None:
+            section['cgroup_peak_bytes'] = self._cgroup_peak
+            section['cgroup_oom_kills'] = self._cgroup_oom_kills
+        if self.backend_note:
+            section['note'] = self.backend_note
+        return section
+
+
+_active_governor = ResourceGovernor(enabled=False)
+_cgroup_serial = itertools.count(1)
+
+
+def get_governor() -> ResourceGovernor:
+    """Returns the governor passes should consult."""
+    return _active_governor
+
+
+@contextlib.contextmanager
+def governing(governor: ResourceGovernor) -> Iterator[ResourceGovernor]:
+    """Applies a governor's limits and makes it active for the duration of the block."""
+    global _active_governor
+    previous = _active_governor
+    _active_governor = governor
+    governor.apply()
+    try:
+        yield governor
+    finally:
+        governor.restore()
+        _active_governor = previous
+        gc.collect()
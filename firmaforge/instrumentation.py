@@ -0,0 +1,197 @@
+"""
+instrumentation.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A lightweight span/timer module that records wall time, CPU time,
+peak RSS growth, bytes read and subprocess launches for each stage
+of the analysis pipeline.
+"""
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterator, List
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+_NULL_SPAN = contextlib.nullcontext()
+_hook_installed = False
+_hook_lock = threading.Lock()
+
+
+def _audit_hook(event: str, args: tuple) -> None:
+    """Counts subprocess launches for the active profiler."""
+    if event == 'subprocess.Popen':
+        profiler = _active_profiler
+        if profiler.enabled:
+            profiler.subprocess_count += 1
+
+
+def _install_audit_hook() -> None:
+    """Installs the subprocess audit hook once per interpreter."""
+    global _hook_installed
+    with _hook_lock:
+        if not _hook_installed:
+            sys.addaudithook(_audit_hook)
+            _hook_installed = True
+
+
+def _read_io_bytes() -> int:
+    """Returns bytes read by this process so far, or 0 if unavailable."""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except Exception:
+        pass
+    return 0
+
+
+def _rusage_snapshot() -> Dict[str, float]:
+    """Returns peak RSS (KB) and child CPU seconds."""
+    if resource is None:
+        return {'maxrss_kb': 0, 'child_cpu_s': 0.0}
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        'maxrss_kb': self_usage.ru_maxrss,
+        'child_cpu_s': child_usage.ru_utime + child_usage.ru_stime,
+    }
+
+
+class Profiler:
+    """
+    Module containing functions for recording nested timing spans.
+    """
+
+    def __init__(self, enabled: bool = True):
+        """
+        Initializes the profiler.
+
+        Args:
+            enabled: If False, spans are no-ops
+        """
+        self.enabled = enabled
+        self.spans: List[Dict[str, Any]] = []
+        self.subprocess_count = 0
+        self._stack: List[str] = []
+        self._origin = time.perf_counter()
+        if enabled:
+            _install_audit_hook()
+
+    def span(self, name: str, category: str = 'stage'):
+        """
+        Returns a context manager that records a span.
+
+        Args:
+            name: Span name, e.g. 'extract.binwalk'
+            category: Span category for trace viewers
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._record(name, category)
+
+    @contextlib.contextmanager
+    def _record(self, name: str, category: str) -> Iterator[None]:
+        """
+        Measures a span and appends it to the span list.
+        """
+        parent = self._stack[-1] if self._stack else None
+        self._stack.append(name)
+        start_usage = _rusage_snapshot()
+        start_io = _read_io_bytes()
+        start_subprocesses = self.subprocess_count
+        start_cpu = time.process_time()
+        start_wall = time.perf_counter()
+        try:
+            yield
+        finally:
+            end_wall = time.perf_counter()
+            end_cpu = time.process_time()
+            end_usage = _rusage_snapshot()
+            self._stack.pop()
+            self.spans.append({
+                'name': name,
+                'category': category,
+                'parent': parent,
+                'start_s': round(start_wall - self._origin, 6),
+                'wall_s': round(end_wall - start_wall, 6),
+                'cpu_s': round(end_cpu - start_cpu, 6),
+                'child_cpu_s': round(end_usage['child_cpu_s'] - start_usage['child_cpu_s'], 6),
+                'peak_rss_delta_kb': end_usage['maxrss_kb'] - start_usage['maxrss_kb'],
+                'peak_rss_kb': end_usage['maxrss_kb'],
+                'bytes_read': _read_io_bytes() - start_io,
+                'subprocesses': self.subprocess_count - start_subprocesses,
+            })
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Returns the 'performance' report section.
+        """
+        if not self.enabled:
+            return {'enabled': False}
+
+        top_level = [s for s in self.spans if s['parent'] is None]
+        return {
+            'enabled': True,
+            'total_wall_s': round(sum(s['wall_s'] for s in top_level), 6),
+            'total_subprocesses': self.subprocess_count,
+            'peak_rss_kb': max((s['peak_rss_kb'] for s in self.spans), default=0),
+            'spans': sorted(self.spans, key=lambda s: s['start_s']),
+        }
+
+    def write_trace(self, trace_path: str) -> None:
+        """
+        Writes spans as a Chrome trace / Perfetto compatible JSON file.
+
+        Args:
+            trace_path: Path to the trace file
+        """
+        events = []
+        pid = os.getpid()
+        for s in self.spans:
+            events.append({
+                'name': s['name'],
+                'cat': s['category'],
+                'ph': 'X',
+                'ts': int(s['start_s'] * 1e6),
+                'dur': int(s['wall_s'] * 1e6),
+                'pid': pid,
+                'tid': 0,
+                'args': {k: v for k, v in s.items() if k not in ('name', 'category', 'start_s', 'wall_s')},
+            })
+
+        Path(trace_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(trace_path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+_active_profiler = Profiler(enabled=False)
+
+
+def get_profiler() -> Profiler:
+    """Returns the profiler stages should record spans on."""
+    return _active_profiler
+
+
+@contextlib.contextmanager
+def profiling(profiler: Profiler) -> Iterator[Profiler]:
+    """Makes a profiler active for the duration of the block."""
+    global _active_profiler
+    previous = _active_profiler
+    _active_profiler = profiler
+    try:
+        yield profiler
+    finally:
+        _active_profiler = previous
@@ -0,0 +1,450 @@
+"""
+journal.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A durable job journal module that records per-image stage completion
+for batch corpus runs, so a restarted run skips finished work, resumes
+partially analyzed images from their last completed stage, retries
+failures with backoff and sets poison images aside.
+"""
+
+import argparse
+import json
+import multiprocessing
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from .governor import CgroupLimiter, ResourceGovernor
+from .workspace import ExtractionWorkspace
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BACKOFF_S = 30.0
+MAX_BACKOFF_S = 3600.0
+
+# image states; 'poisoned' images exhausted their attempts and are not retried
+STATES = ('pending', 'running', 'done', 'failed', 'poisoned')
+
+# exit code of an image process whose analysis finished without its required stages
+EXIT_INCOMPLETE = 3
+
+
+class JobJournal:
+    """
+    Module containing functions for recording image and stage progress
+    of a batch run in SQLite.
+    """
+
+    def __init__(self, journal_path: str):
+        """
+        Opens (and if needed creates) the journal.
+
+        Args:
+            journal_path: Path to the journal database
+        """
+        self.journal_path = Path(journal_path)
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.journal_path), timeout=60)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS images (
+                name TEXT PRIMARY KEY,
+                firmware_path TEXT NOT NULL,
+                fingerprint TEXT,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                updated_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS stages (
+                name TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                completed_at REAL,
+                data TEXT,
+                PRIMARY KEY (name, stage)
+            );
+        """)
+
+    def close(self) -> None:
+        """
+        Closes the journal.
+        """
+        self.conn.close()
+
+    def register(self, firmware_path: str) -> str:
+        """
+        Adds an image to the journal. If the file changed since it was
+        recorded, its stages are discarded and it is queued again.
+
+        Returns:
+            Image name
+        """
+        path = Path(firmware_path)
+        st = path.stat()
+        name = path.stem
+        fingerprint = f"{st.st_size}:{int(st.st_mtime)}"
+        row = self.conn.execute("SELECT fingerprint FROM images WHERE name = ?", (name,)).fetchone()
+        with self.conn:
+            if row is None:
+                self.conn.execute(
+                    "INSERT INTO images (name, firmware_path, fingerprint, state, updated_at) VALUES (?, ?, ?, 'pending', ?)",
+                    (name, str(path), fingerprint, time.time())
+                )
+            elif row['fingerprint'] != fingerprint:
+                self.conn.execute("DELETE FROM stages WHERE name = ?", (name,))
+                self.conn.execute(
+                    "UPDATE images SET firmware_path = ?, fingerprint = ?, state = 'pending', attempts = 0, "
+                    "last_error = NULL, next_attempt_at = 0, updated_at = ? WHERE name = ?",
+                    (str(path), fingerprint, time.time(), name)
+                )
+        return name
+
+    def image(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns an image's journal row with its completed stages.
+        """
+        row = self.conn.execute("SELECT * FROM images WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        image = dict(row)
+        image['stages'] = [r['stage'] for r in self.conn.execute(
+            "SELECT stage FROM stages WHERE name = ? ORDER BY completed_at", (name,))]
+        return image
+
+    def images(self, state: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Returns all journal rows, optionally filtered by state.
+        """
+        if state:
+            rows = self.conn.execute("SELECT * FROM images WHERE state = ? ORDER BY name", (state,))
+        else:
+            rows = self.conn.execute("SELECT * FROM images ORDER BY name")
+        return [dict(r) for r in rows]
+
+    def next_ready(self, max_attempts: int) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+        """
+        Returns the next image to run, or the time the next backed-off
+        image becomes ready when none is ready now.
+
+        Args:
+            max_attempts: Attempts after which an image is no longer retried
+        """
+        now = time.time()
+        rows = self.conn.execute(
+            "SELECT * FROM images WHERE state IN ('pending', 'running', 'failed') AND attempts < ? "
+            "ORDER BY next_attempt_at, name", (max_attempts,)
+        ).fetchall()
+        for row in rows:
+            if row['next_attempt_at'] <= now:
+                return dict(row), None
+        return None, (rows[0]['next_attempt_at'] if rows else None)
+
+    def recover_interrupted(self, max_attempts: int, backoff_s: float) -> int:
+        """
+        Fails images left running by a batch that was killed, so they are
+        retried, or poisoned if that was their last attempt.
+
+        Returns:
+            Number of images recovered
+        """
+        names = [row['name'] for row in self.conn.execute("SELECT name FROM images WHERE state = 'running'")]
+        for name in names:
+            self.fail(name, "interrupted while running", max_attempts, backoff_s)
+        return len(names)
+
+    def start(self, name: str) -> None:
+        """
+        Marks an image as running and counts the attempt.
+        """
+        with self.conn:
+            self.conn.execute(
+                "UPDATE images SET state = 'running', attempts = attempts + 1, updated_at = ? WHERE name = ?",
+                (time.time(), name)
+            )
+
+    def finish(self, name: str) -> None:
+        """
+        Marks an image as done.
+        """
+        with self.conn:
+            self.conn.execute(
+                "UPDATE images SET state = 'done', last_error = NULL, updated_at = ? WHERE name = ?",
+                (time.time(), name)
+            )
+
+    def fail(self, name: str, error: str, max_attempts: int, backoff_s: float) -> str:
+        """
+        Records a failed attempt, scheduling a retry with exponential
+        backoff or marking the image poisoned once attempts run out.
+
+        Returns:
+            New state of the image
+        """
+        attempts = self.conn.execute("SELECT attempts FROM images WHERE name = ?", (name,)).fetchone()['attempts']
+        state = 'poisoned' if attempts >= max_attempts else 'failed'
+        delay = min(backoff_s * (2 ** max(0, attempts - 1)), MAX_BACKOFF_S)
+        with self.conn:
+            self.conn.execute(
+                "UPDATE images SET state = ?, last_error = ?, next_attempt_at = ?, updated_at = ? WHERE name = ?",
+                (state, error[-2000:], time.time() + delay, time.time(), name)
+            )
+        return state
+
+    def requeue(self, name: Optional[str] = None, state: str = 'poisoned') -> int:
+        """
+        Resets attempts of one image, or of every image in a state, so they run again.
+
+        Returns:
+            Number of images requeued
+        """
+        with self.conn:
+            if name:
+                cursor = self.conn.execute(
+                    "UPDATE images SET state = 'pending', attempts = 0, next_attempt_at = 0 WHERE name = ?", (name,))
+            else:
+                cursor = self.conn.execute(
+                    "UPDATE images SET state = 'pending', attempts = 0, next_attempt_at = 0 WHERE state = ?", (state,))
+        return cursor.rowcount
+
+    def checkpoint(self, name: str) -> 'StageCheckpoint':
+        """
+        Returns the stage checkpoint for an image.
+        """
+        return StageCheckpoint(self, name)
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Returns the number of images in each state.
+        """
+        counts = {state: 0 for state in STATES}
+        for row in self.conn.execute("SELECT state, COUNT(*) AS n FROM images GROUP BY state"):
+            counts[row['state']] = row['n']
+        return counts
+
+
+class StageCheckpoint:
+    """
+    Module containing functions for saving and loading the outputs of
+    completed pipeline stages for one image.
+    """
+
+    def __init__(self, journal: JobJournal, name: str):
+        """
+        Initializes the checkpoint.
+
+        Args:
+            journal: Journal the stages are recorded in
+            name: Image name
+        """
+        self.journal = journal
+        self.name = name
+
+    def load(self, stage: str) -> Tuple[bool, Any]:
+        """
+        Returns (True, output) if a stage completed, else (False, None).
+        """
+        row = self.journal.conn.execute(
+            "SELECT data FROM stages WHERE name = ? AND stage = ?", (self.name, stage)).fetchone()
+        if row is None:
+            return False, None
+        return True, json.loads(row['data']) if row['data'] is not None else None
+
+    def save(self, stage: str, output: Any = None) -> None:
+        """
+        Records a stage as completed together with its output.
+        """
+        with self.journal.conn:
+            self.journal.conn.execute(
+                "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?)",
+                (self.name, stage, time.time(), json.dumps(output, default=str))
+            )
+
+    def clear(self) -> None:
+        """
+        Forgets all completed stages of the image.
+        """
+        with self.journal.conn:
+            self.journal.conn.execute("DELETE FROM stages WHERE name = ?", (self.name,))
+
+
+def _analyze_image(firmware_path: str, results_dir: str, journal_path: str, name: str,
+                   options: Dict[str, Any]) -> None:
+    """Runs one image in a child process with its stage checkpoint.
+
+    analyze_firmware reports most stage errors instead of raising, so the
+    process exits with EXIT_INCOMPLETE when extraction, detection or the
+    report were not recorded, and the image is retried.
+    """
+    from .summarize_results import analyze_firmware
+    journal = JobJournal(journal_path)
+    try:
+        checkpoint = journal.checkpoint(name)
+        report = analyze_firmware(firmware_path, results_dir=results_dir, checkpoint=checkpoint, **options)
+        # an empty report means the image was skipped as not OpenWrt
+        if not report:
+            return
+        required = ['detected', 'report']
+        if options.get('extract_first', True):
+            required.insert(0, 'extracted')
+        missing = [stage for stage in required if not checkpoint.load(stage)[0]]
+        if missing:
+            print(f"[journal] {name}: stages not completed: {', '.join(missing)}")
+            raise SystemExit(EXIT_INCOMPLETE)
+    finally:
+        journal.close()
+
+
+def run_batch(firmware_dir: str, results_dir: str = 'results', journal_path: Optional[str] = None,
+              max_attempts: int = DEFAULT_MAX_ATTEMPTS, backoff_s: float = DEFAULT_BACKOFF_S,
+              timeout_s: Optional[float] = None, exclude: Optional[str] = None,
+              options: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """
+    Analyzes every image in a directory, resuming from the journal.
+
+    Each image runs in its own process so a crash or kill only fails
+    that image. Failed images are retried with exponential backoff and
+    marked poisoned after max_attempts.
+
+    Args:
+        firmware_dir: Directory of firmware images
+        results_dir: Results directory
+        journal_path: Journal database (defaults to <results_dir>/.journal.db)
+        max_attempts: Attempts before an image is marked poisoned
+        backoff_s: Base retry delay, doubled per attempt
+        timeout_s: Optional per-image time limit
+        exclude: Optional regex of file names to skip
+        options: Extra analyze_firmware keyword arguments
+
+    Returns:
+        Number of images in each state at the end of the run
+    """
+    journal_path = journal_path or str(Path(results_dir) / ".journal.db")
+    journal = JobJournal(journal_path)
+    exclude_re = re.compile(exclude) if exclude else None
+    ctx = multiprocessing.get_context('spawn')
+
+    # image processes can only get cgroup limits once this supervisor has left their base group
+    governor = (options or {}).get('governor')
+    if governor is not None and governor.enabled and governor.use_cgroup:
+        CgroupLimiter.vacate()
+
+    for path in sorted(Path(firmware_dir).iterdir()):
+        if path.is_file() and not (exclude_re and exclude_re.search(path.name)):
+            journal.register(str(path))
+    recovered = journal.recover_interrupted(max_attempts, backoff_s)
+    if recovered:
+        print(f"[journal] {recovered} image(s) were left running by an interrupted batch")
+
+    try:
+        while True:
+            image, ready_at = journal.next_ready(max_attempts)
+            if image is None:
+                if ready_at is None:
+                    break
+                time.sleep(max(0.0, ready_at - time.time()))
+                continue
+
+            name = image['name']
+            journal.start(name)
+            print(f"[journal] {name}: attempt {image['attempts'] + 1}/{max_attempts}")
+
+            process = ctx.Process(target=_analyze_image,
+                                  args=(image['firmware_path'], results_dir, journal_path, name, options or {}))
+            process.start()
+            process.join(timeout_s)
+            if process.is_alive():
+                process.kill()
+                process.join()
+                error = f"timed out after {timeout_s}s"
+            elif process.exitcode == EXIT_INCOMPLETE:
+                error = "finished without completing extraction, detection or the report"
+            elif process.exitcode != 0:
+                error = f"exited with code {process.exitcode}"
+            else:
+                error = None
+
+            if error is None:
+                journal.finish(name)
+            else:
+                state = journal.fail(name, error, max_attempts, backoff_s)
+                print(f"[journal] {name}: {error} ({state})")
+        return journal.counts()
+    finally:
+        journal.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m firmaforge.journal."""
+    parser = argparse.ArgumentParser(description="Resumable batch analysis with a stage journal")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_run = sub.add_parser('run', help="analyze every image in a directory, resuming earlier progress")
+    p_run.add_argument('firmware_dir')
+    p_run.add_argument('--results-dir', default='results')
+    p_run.add_argument('--journal', default=None)
+    p_run.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS)
+    p_run.add_argument('--backoff', type=float, default=DEFAULT_BACKOFF_S)
+    p_run.add_argument('--timeout', type=float, default=None, help="per-image time limit in seconds")
+    p_run.add_argument('--exclude', default=None, help="regex of file names to skip")
+    p_run.add_argument('--max-memory-mb', type=int, default=None, help="per-image memory limit")
+    p_run.add_argument('--max-cpu', type=int, default=None, help="per-image CPU time limit in seconds")
+    p_run.add_argument('--max-open-files', type=int, default=None, help="per-image open file limit")
+    p_run.add_argument('--max-cpu-cores', type=float, default=None, help="per-image CPU bandwidth in cores (cgroup v2)")
+    p_run.add_argument('--max-processes', type=int, default=None, help="per-image process limit (cgroup v2)")
+    p_run.add_argument('--vuln-feed', default=None, help="vulnerability feed index to match packages against")
+    p_run.add_argument('--sbom', action='store_true', help="write a CycloneDX SBOM next to each report")
+    p_run.add_argument('--scratch-dir', default=None, help="directory for temporary extraction output")
+    p_run.add_argument('--max-extract-mb', type=int, default=None, help="per-image extraction size limit")
+    p_run.add_argument('--max-extract-inodes', type=int, default=None, help="per-image extracted file limit")
+    p_run.add_argument('--tmpfs', action='store_true', help="extract in RAM (/dev/shm); needs --max-extract-mb")
+
+    for command in ('status', 'requeue'):
+        p = sub.add_parser(command)
+        p.add_argument('--results-dir', default='results')
+        p.add_argument('--journal', default=None)
+        if command == 'requeue':
+            p.add_argument('name', nargs='?', help="image to requeue (default: all poisoned images)")
+
+    args = parser.parse_args(argv)
+    journal_path = args.journal or str(Path(args.results_dir) / ".journal.db")
+
+    if args.command == 'run':
+        options = {}
+        if args.max_memory_mb or args.max_cpu or args.max_open_files or args.max_cpu_cores or args.max_processes:
+            options['governor'] = ResourceGovernor(max_memory_bytes=args.max_memory_mb * 1024 * 1024 if args.max_memory_mb else None,
+                                                   max_cpu_s=args.max_cpu, max_open_files=args.max_open_files,
+                                                   max_cpu_cores=args.max_cpu_cores, max_processes=args.max_processes)
+        if args.vuln_feed:
+            options['vuln_feed'] = args.vuln_feed
+        if args.sbom:
+            options['sbom'] = True
+        if args.scratch_dir or args.max_extract_mb or args.max_extract_inodes or args.tmpfs:
+            options['workspace'] = ExtractionWorkspace(args.scratch_dir,
+                                                       args.max_extract_mb * 1024 * 1024 if args.max_extract_mb else None,
+                                                       args.max_extract_inodes, use_tmpfs=args.tmpfs)
+        counts = run_batch(args.firmware_dir, args.results_dir, journal_path, args.max_attempts,
+                           args.backoff, args.timeout, args.exclude, options)
+        print(' '.join(f"{state}={n}" for state, n in counts.items()))
+        return 0 if counts['failed'] == 0 and counts['poisoned'] == 0 else 1
+
+    journal = JobJournal(journal_path)
+    try:
+        if args.command == 'requeue':
+            print(f"Requeued {journal.requeue(args.name)} images")
+            return 0
+        for image in journal.images():
+            stages = journal.image(image['name'])['stages']
+            print(f"{image['state']:9} {image['attempts']} {image['name']} [{', '.join(stages)}]"
+                  + (f" {image['last_error']}" if image['last_error'] else ''))
+        return 0
+    finally:
+        journal.close()
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,397 @@
+"""
+kernel_analyzer.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A kernel analysis module that locates the compressed payload of an
+extracted kernel image (uImage, FIT or a bare stream), decompresses it
+in bounded-memory chunks without writing it to disk, and pulls out the
+Linux version banner, compiler string and embedded IKCONFIG, caching
+the results by kernel hash.
+"""
+
+import json
+import lzma
+import re
+import zlib
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .report import write_atomic
+from .rootfs_index import hash_file
+from .triage import (BudgetedReader, FDT_MAGIC, PROBE_OFFSETS, iter_fdt_properties, parse_uimage)
+
+KERNEL_CACHE_VERSION = 1
+READ_CHUNK_BYTES = 64 * 1024
+OUTPUT_CHUNK_BYTES = 1024 * 1024
+MAX_OUTPUT_BYTES = 128 * 1024 * 1024
+MAX_CONFIG_BYTES = 4 * 1024 * 1024
+
+# bytes kept between output chunks so markers split across them are found
+OVERLAP_BYTES = 1024
+
+BANNER_PREFIX = b'Linux version '
+IKCONFIG_START = b'IKCFG_ST'
+
+# magic of bare compressed kernel streams
+STREAM_MAGICS = {
+    b'\xfd7zXZ\x00': 'xz',
+    b'\x1f\x8b\x08': 'gzip',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+    b'\x5d\x00\x00': 'lzma',
+}
+
+# kernel options worth surfacing in the report
+SECURITY_OPTIONS = [
+    'CONFIG_MODULES', 'CONFIG_MODULE_SIG', 'CONFIG_STRICT_KERNEL_RWX', 'CONFIG_STRICT_DEVMEM',
+    'CONFIG_DEVMEM', 'CONFIG_STACKPROTECTOR', 'CONFIG_STACKPROTECTOR_STRONG', 'CONFIG_SECCOMP',
+    'CONFIG_KALLSYMS', 'CONFIG_RANDOMIZE_BASE', 'CONFIG_HARDENED_USERCOPY', 'CONFIG_SECURITY',
+    'CONFIG_SECURITY_SELINUX', 'CONFIG_BPF_SYSCALL', 'CONFIG_USER_NS', 'CONFIG_IKCONFIG_PROC',
+]
+
+CONFIG_LINE_PATTERN = re.compile(r'^(CONFIG_[A-Za-z0-9_]+)=(.*)$')
+CONFIG_UNSET_PATTERN = re.compile(r'^# (CONFIG_[A-Za-z0-9_]+) is not set$')
+VERSION_PATTERN = re.compile(r'^(\d+\.\d+(?:\.\d+)?)')
+
+
+def find_kernel_payload(kernel_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Locates the compressed kernel payload in an image file.
+
+    Looks for a uImage or FIT at the start of the file or at the usual
+    vendor padding offsets, falling back to a bare compressed stream.
+
+    Returns:
+        Dictionary with container, offset, length and compression, or None
+    """
+    with BudgetedReader(kernel_path, 1024 * 1024, 5.0) as reader:
+        for offset in (0,) + PROBE_OFFSETS:
+            header = reader.read(offset, 64)
+            uimage = parse_uimage(header)
+            if uimage:
+                data_offset = offset + 64
+                length = uimage['size']
+                if uimage['image_type'] == 'multi':
+                    # multi-file images start with a zero-terminated size table
+                    sizes = []
+                    while len(sizes) < 16:
+                        entry = reader.read(data_offset + 4 * len(sizes), 4)
+                        if len(entry) < 4 or entry == b'\x00\x00\x00\x00':
+                            break
+                        sizes.append(int.from_bytes(entry, 'big'))
+                    data_offset += 4 * (len(sizes) + 1)
+                    length = sizes[0] if sizes else 0
+                return {'container': 'uImage', 'offset': data_offset, 'length': length,
+                        'compression': uimage['compression'], 'name': uimage['name'], 'arch': uimage['arch']}
+
+            if header[:4] == FDT_MAGIC:
+                payload = _find_fit_kernel(reader, offset)
+                if payload:
+                    return payload
+
+            for magic, compression in STREAM_MAGICS.items():
+                if header.startswith(magic):
+                    return {'container': 'raw', 'offset': offset, 'length': reader.size - offset,
+                            'compression': compression}
+    return None
+
+
+def _find_fit_kernel(reader: BudgetedReader, base: int) -> Optional[Dict[str, Any]]:
+    """Returns the data location and compression of the kernel image node of a FIT."""
+    nodes: Dict[str, Dict[str, Any]] = {}
+    for path, name, value, value_offset, length in iter_fdt_properties(reader, base):
+        if not path.startswith('/images/'):
+            continue
+        node = nodes.setdefault(path, {})
+        if name == 'data':
+            node['offset'], node['length'] = value_offset, length
+        elif name in ('type', 'compression', 'arch', 'description'):
+            node[name] = value.split(b'\x00', 1)[0].decode('ascii', errors='replace')
+    for path, node in nodes.items():
+        if node.get('type') == 'kernel' and 'offset' in node:
+            return {'container': 'FIT', 'offset': node['offset'], 'length': node['length'],
+                    'compression': node.get('compression', 'none'), 'name': node.get('description'),
+                    'arch': node.get('arch')}
+    return None
+
+
+def _decompressor(compression: str) -> Any:
+    """Returns a streaming decompressor object for a compression name."""
+    if compression == 'lzma':
+        return lzma.LZMADecompressor(format=lzma.FORMAT_ALONE)
+    if compression == 'xz':
+        return lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+    if compression == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if compression == 'zstd' and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"unsupported kernel compression: {compression}")
+
+
+def iter_decompressed(kernel_path: str, offset: int, length: int, compression: str,
+                      max_output: int = MAX_OUTPUT_BYTES) -> Iterator[bytes]:
+    """
+    Yields the decompressed payload in chunks of at most OUTPUT_CHUNK_BYTES.
+
+    Input is read READ_CHUNK_BYTES at a time and output is capped per
+    call, so memory stays bounded regardless of kernel size.
+    """
+    with open(kernel_path, 'rb') as f:
+        f.seek(offset)
+        remaining = length
+        if compression == 'none':
+            while remaining > 0:
+                chunk = f.read(min(OUTPUT_CHUNK_BYTES, remaining))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                yield chunk
+            return
+
+        decompressor = _decompressor(compression)
+        produced = 0
+        pending = b''
+        while produced < max_output:
+            if not pending:
+                if remaining <= 0:
+                    break
+                pending = f.read(min(READ_CHUNK_BYTES, remaining))
+                if not pending:
+                    break
+                remaining -= len(pending)
+
+            if isinstance(decompressor, lzma.LZMADecompressor):
+                out = decompressor.decompress(pending, max_length=OUTPUT_CHUNK_BYTES)
+                pending = b''
+                # drain buffered output before feeding more input
+                while out:
+                    produced += len(out)
+                    yield out
+                    if decompressor.eof or decompressor.needs_input or produced >= max_output:
+                        break
+                    out = decompressor.decompress(b'', max_length=OUTPUT_CHUNK_BYTES)
+                if decompressor.eof:
+                    break
+            elif hasattr(decompressor, 'unconsumed_tail'):
+                out = decompressor.decompress(pending, OUTPUT_CHUNK_BYTES)
+                pending = decompressor.unconsumed_tail
+                if out:
+                    produced += len(out)
+                    yield out
+                if decompressor.eof:
+                    break
+            else:
+                out = decompressor.decompress(pending)
+                pending = b''
+                if out:
+                    produced += len(out)
+                    yield out
+
+
+def parse_banner(banner: str) -> Dict[str, Any]:
+    """
+    Splits a 'Linux version ...' banner into version, builder, compiler and build string.
+    """
+    rest = banner[len('Linux version '):]
+    version, _, rest = rest.partition(' ')
+    groups: List[str] = []
+    # the builder and compiler are parenthesized and may nest parentheses
+    while rest.startswith('(') and len(groups) < 2:
+        depth = 0
+        for i, ch in enumerate(rest):
+            depth += 1 if ch == '(' else -1 if ch == ')' else 0
+            if depth == 0:
+                groups.append(rest[1:i])
+                rest = rest[i + 1:].lstrip()
+                break
+        else:
+            break
+    match = VERSION_PATTERN.match(version)
+    return {
+        'release': version,
+        'version': match.group(1) if match else None,
+        'builder': groups[0] if groups else None,
+        'compiler': groups[1] if len(groups) > 1 else None,
+        'build': rest.strip() or None,
+    }
+
+
+def parse_config(config_text: str) -> Dict[str, str]:
+    """
+    Parses a kernel .config into option -> value ('n' for unset options).
+    """
+    options = {}
+    for line in config_text.splitlines():
+        match = CONFIG_LINE_PATTERN.match(line)
+        if match:
+            options[match.group(1)] = match.group(2).strip('"')
+            continue
+        match = CONFIG_UNSET_PATTERN.match(line)
+        if match:
+            options[match.group(1)] = 'n'
+    return options
+
+
+class _KernelScanner:
+    """
+    Module containing functions for finding the banner and IKCONFIG in
+    a stream of decompressed kernel chunks.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty scan.
+        """
+        self.banner: Optional[str] = None
+        self.config_parts: List[bytes] = []
+        self.config_size = 0
+        self.config_done = False
+        self._config_inflater = None
+        self._tail = b''
+        self.scanned = 0
+
+    def feed(self, chunk: bytes) -> None:
+        """Scans one decompressed chunk."""
+        data = self._tail + chunk
+
+        if self.banner is None:
+            pos = data.find(BANNER_PREFIX)
+            while pos != -1:
+                end = data.find(b'\n', pos)
+                nul = data.find(b'\x00', pos)
+                end = min(e for e in (end, nul, pos + 512) if e != -1)
+                candidate = data[pos:end]
+                # skip format strings such as '%s version %s' and truncated tails
+                if end < len(data) and candidate[len(BANNER_PREFIX):len(BANNER_PREFIX) + 1].isdigit():
+                    self.banner = candidate.decode('utf-8', errors='replace')
+                    break
+                pos = data.find(BANNER_PREFIX, pos + 1)
+
+        if not self.config_done:
+            if self._config_inflater is not None:
+                self._inflate_config(chunk)
+            else:
+                pos = data.find(IKCONFIG_START)
+                if pos != -1:
+                    self._config_inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    self._inflate_config(data[pos + len(IKCONFIG_START):])
+
+        self.scanned += len(chunk)
+        self._tail = data[-OVERLAP_BYTES:]
+
+    def _inflate_config(self, data: bytes) -> None:
+        """Feeds bytes following IKCFG_ST to the embedded gzip stream."""
+        try:
+            out = self._config_inflater.decompress(data, MAX_CONFIG_BYTES - self.config_size)
+        except zlib.error:
+            self.config_done = True
+            return
+        self.config_parts.append(out)
+        self.config_size += len(out)
+        if self._config_inflater.eof or self.config_size >= MAX_CONFIG_BYTES:
+            self.config_done = True
+
+    def config_text(self) -> Optional[str]:
+        """Returns the embedded .config, or None if the kernel has no IKCONFIG."""
+        if not self.config_parts:
+            return None
+        return b''.join(self.config_parts).decode('utf-8', errors='replace')
+
+
+def analyze_kernel(kernel_path: str, cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Extracts version, compiler and IKCONFIG metadata from a kernel image.
+
+    Args:
+        kernel_path: Path to an extracted kernel image
+        cache_dir: Optional directory of per-hash results; a kernel seen
+            before is answered from it without decompressing
+
+    Returns:
+        Dictionary of kernel metadata, including the full parsed config
+        under 'config' when the kernel embeds one
+    """
+    digest = hash_file(Path(kernel_path))
+    cache_path = Path(cache_dir) / f"{digest}.json" if cache_dir else None
+    if cache_path is not None and cache_path.exists():
+        try:
+            with open(cache_path, 'r') as f:
+                cached = json.load(f)
+            if cached.get('cache_version') == KERNEL_CACHE_VERSION:
+                cached['cached'] = True
+                return cached
+        except (OSError, ValueError):
+            pass
+
+    result: Dict[str, Any] = {
+        'cache_version': KERNEL_CACHE_VERSION,
+        'file': Path(kernel_path).name,
+        'sha256': digest,
+        'payload': None,
+        'banner': None,
+        'ikconfig': False,
+    }
+    payload = find_kernel_payload(kernel_path)
+    scanner = _KernelScanner()
+    try:
+        if payload:
+            result['payload'] = payload
+            for chunk in iter_decompressed(kernel_path, payload['offset'], payload['length'], payload['compression']):
+                scanner.feed(chunk)
+                if scanner.banner and scanner.config_done:
+                    break
+        else:
+            # possibly an uncompressed image; scan it as is
+            for chunk in iter_decompressed(kernel_path, 0, Path(kernel_path).stat().st_size, 'none'):
+                scanner.feed(chunk)
+                if scanner.banner and scanner.config_done:
+                    break
+    except (ValueError, lzma.LZMAError, zlib.error, EOFError) as e:
+        result['error'] = str(e)
+
+    result['decompressed_bytes_scanned'] = scanner.scanned
+    if scanner.banner:
+        result['banner'] = scanner.banner
+        result.update(parse_banner(scanner.banner))
+    config_text = scanner.config_text()
+    if config_text:
+        config = parse_config(config_text)
+        result['ikconfig'] = True
+        result['config_options'] = len(config)
+        result['security_options'] = {opt: config.get(opt, 'n') for opt in SECURITY_OPTIONS}
+        result['config'] = config
+
+    if cache_path is not None and 'error' not in result:
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(str(cache_path), json.dumps(result).encode())
+        except OSError:
+            pass
+    result['cached'] = False
+    return result
+
+
+def analyze_kernels(firmware_result_dir: str, cache_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Analyzes every kernel under <firmware_result_dir>/raw_extracts/kernel.
+
+    Returns:
+        One metadata dictionary per kernel file, without the full config
+    """
+    kernel_dir = Path(firmware_result_dir) / "raw_extracts" / "kernel"
+    if not kernel_dir.exists():
+        return []
+    kernels = []
+    for kernel_file in sorted(kernel_dir.iterdir()):
+        if kernel_file.is_file() and not kernel_file.is_symlink():
+            info = analyze_kernel(str(kernel_file), cache_dir)
+            info.pop('config', None)
+            info.pop('cache_version', None)
+            kernels.append(info)
+    return kernels
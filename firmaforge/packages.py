@@ -0,0 +1,502 @@
+"""
+packages.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A package inventory module that reads the installed packages and
+versions of an OpenWrt rootfs from its opkg status and control files,
+and matches them offline against a pre-indexed vulnerability feed that
+is memory-mapped and searched by package name and version range.
+"""
+
+import argparse
+import bisect
+import functools
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from .report import iter_reports, load_result, write_atomic
+
+OPKG_STATUS_PATHS = ['usr/lib/opkg/status', 'var/lib/opkg/status']
+OPKG_INFO_DIR = 'usr/lib/opkg/info'
+APK_INSTALLED_PATH = 'lib/apk/db/installed'
+
+# feed index layout: header, package table sorted by name, record table
+# grouped by package and sorted by introduced version, then a string pool
+# holding the feed metadata followed by package names and record fields
+FEED_MAGIC = b'FFVI'
+FEED_FORMAT_VERSION = 1
+FEED_HEADER = struct.Struct('<4sHHIIII')
+FEED_PACKAGE = struct.Struct('<IIII')
+FEED_RECORD = struct.Struct('<II')
+FIELD_SEPARATOR = '\x1f'
+RECORD_FIELDS = ('id', 'introduced', 'fixed', 'last_affected', 'severity', 'summary')
+
+# OpenWrt appends "~<git hash>" to snapshot and kernel package versions
+SNAPSHOT_SUFFIX = re.compile(r'~[0-9a-f]{7,}(?=-|$)')
+VERSION_SEGMENTS = re.compile(r'(\D*)(\d*)')
+
+# package name used for kernel versions taken from the kernel banner
+KERNEL_PACKAGE = 'linux'
+
+
+def _char_order(c: str) -> int:
+    """Returns the opkg sort weight of a non-digit version character."""
+    if c == '~':
+        return -1
+    if c.isalpha():
+        return ord(c)
+    return ord(c) + 256
+
+
+@functools.lru_cache(maxsize=4096)
+def _text_key(text: str) -> Tuple[int, ...]:
+    """Returns the sort key of a non-digit run of a version."""
+    # each run ends in 0 (the weight of "end of string") so plain tuple
+    # comparison matches opkg's character-by-character comparison
+    return tuple(_char_order(c) for c in text) + (0,)
+
+
+def _segment_key(part: str) -> List[Tuple[Tuple[int, ...], int]]:
+    """Returns a sort key for an upstream version or revision string."""
+    return [(_text_key(text), int(digits) if digits else 0) for text, digits in VERSION_SEGMENTS.findall(part)]
+
+
+@functools.lru_cache(maxsize=65536)
+def version_key(version: str) -> Tuple[int, List[Any], List[Any]]:
+    """
+    Returns a sort key that orders versions the way opkg does
+    ([epoch:]upstream[-revision], with '~' sorting before everything).
+    """
+    version = SNAPSHOT_SUFFIX.sub('', version.strip())
+    epoch = 0
+    if ':' in version:
+        head, rest = version.split(':', 1)
+        if head.isdigit():
+            epoch, version = int(head), rest
+    upstream, _, revision = version.rpartition('-') if '-' in version else (version, '', '')
+    return epoch, _segment_key(upstream), _segment_key(revision)
+
+
+def compare_versions(a: str, b: str) -> int:
+    """
+    Compares two package versions.
+
+    Returns:
+        -1, 0 or 1 as a is older than, equal to or newer than b
+    """
+    key_a, key_b = version_key(a), version_key(b)
+    return (key_a > key_b) - (key_a < key_b)
+
+
+def parse_control(text: str) -> Iterator[Dict[str, str]]:
+    """
+    Parses a control or status file into one dictionary per stanza.
+    """
+    fields: Dict[str, str] = {}
+    key = None
+    for line in text.splitlines():
+        if not line.strip():
+            if fields:
+                yield fields
+            fields, key = {}, None
+        elif line[0] in ' \t':
+            if key is not None:
+                fields[key] += '\n' + line.strip()
+        elif ':' in line:
+            key, value = line.split(':', 1)
+            key = key.strip()
+            fields[key] = value.strip()
+    if fields:
+        yield fields
+
+
+def _parse_apk_installed(text: str) -> Iterator[Dict[str, str]]:
+    """Parses an apk installed database into one dictionary per package."""
+    fields: Dict[str, str] = {}
+    for line in text.splitlines():
+        if not line.strip():
+            if fields:
+                yield fields
+            fields = {}
+        elif len(line) > 2 and line[1] == ':' and line[0] in 'PVA':
+            fields[{'P': 'Package', 'V': 'Version', 'A': 'Architecture'}[line[0]]] = line[2:].strip()
+    if fields:
+        yield fields
+
+
+def _read_text(path: Path) -> Optional[str]:
+    """Reads a regular file as text, or returns None."""
+    if not path.is_file() or path.is_symlink():
+        return None
+    try:
+        return path.read_text(errors='replace')
+    except OSError:
+        return None
+
+
+def read_package_inventory(rootfs_dir: Path) -> List[Dict[str, Any]]:
+    """
+    Reads the installed packages of a rootfs from the opkg status file and
+    per-package control files (or the apk database on newer releases).
+
+    Returns:
+        Sorted list of packages with name, version, architecture and source
+    """
+    rootfs_dir = Path(rootfs_dir)
+    packages: Dict[str, Dict[str, Any]] = {}
+
+    def add(stanza: Dict[str, str], source: str) -> None:
+        name = stanza.get('Package')
+        version = stanza.get('Version')
+        if not name or name in packages:
+            return
+        status = stanza.get('Status')
+        if status and status.split()[-1] != 'installed':
+            return
+        packages[name] = {'name': name, 'version': version, 'architecture': stanza.get('Architecture'), 'source': source}
+
+    for rel_path in OPKG_STATUS_PATHS:
+        text = _read_text(rootfs_dir / rel_path)
+        if text:
+            for stanza in parse_control(text):
+                add(stanza, 'opkg_status')
+
+    # ROM packages list only Package/Status in some status files; their
+    # versions are in the control files
+    info_dir = rootfs_dir / OPKG_INFO_DIR
+    if info_dir.is_dir():
+        for control_file in sorted(info_dir.glob('*.control')):
+            text = _read_text(control_file)
+            if not text:
+                continue
+            for stanza in parse_control(text):
+                existing = packages.get(stanza.get('Package'))
+                if existing is not None and not existing['version']:
+                    existing['version'] = stanza.get('Version')
+                    existing['architecture'] = existing['architecture'] or stanza.get('Architecture')
+                else:
+                    add(stanza, 'opkg_control')
+
+    text = _read_text(rootfs_dir / APK_INSTALLED_PATH)
+    if text:
+        for stanza in _parse_apk_installed(text):
+            add(stanza, 'apk')
+
+    return sorted((p for p in packages.values() if p['version']), key=lambda p: p['name'])
+
+
+def read_package_files(rootfs_dir: Path) -> Dict[str, List[str]]:
+    """
+    Reads the files each opkg package installed from usr/lib/opkg/info/*.list.
+
+    Returns:
+        Mapping of package name to rootfs-relative file paths
+    """
+    owned: Dict[str, List[str]] = {}
+    info_dir = Path(rootfs_dir) / OPKG_INFO_DIR
+    if not info_dir.is_dir():
+        return owned
+    for list_file in sorted(info_dir.glob('*.list')):
+        text = _read_text(list_file)
+        if text:
+            # lines are "/path" or "/path<TAB>mode"
+            owned[list_file.stem] = [line.split('\t', 1)[0].strip().lstrip('/')
+                                     for line in text.splitlines() if line.strip()]
+    return owned
+
+
+def build_feed(source_path: str, output_path: str) -> Dict[str, Any]:
+    """
+    Builds a feed index from a JSON-lines vulnerability feed.
+
+    Each line describes one affected version range of one package:
+    {"package", "id", "introduced", "fixed", "last_affected", "severity",
+    "summary"}; a missing "introduced" means every version before the fix.
+
+    Returns:
+        The feed metadata stored in the index
+    """
+    by_package: Dict[str, List[Dict[str, Any]]] = {}
+    with open(source_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry.get('package') and entry.get('id'):
+                by_package.setdefault(entry['package'], []).append(entry)
+
+    meta = {'source': os.path.basename(source_path), 'built': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'packages': len(by_package), 'records': sum(len(v) for v in by_package.values())}
+    meta_bytes = json.dumps(meta).encode()
+    pool = bytearray(meta_bytes)
+    package_table = bytearray()
+    record_table = bytearray()
+    record_index = 0
+    for name in sorted(by_package, key=lambda n: n.encode()):
+        records = sorted(by_package[name], key=lambda r: version_key(r.get('introduced') or '0'))
+        encoded = name.encode()
+        package_table += FEED_PACKAGE.pack(len(pool), len(encoded), record_index, len(records))
+        pool += encoded
+        for record in records:
+            data = FIELD_SEPARATOR.join(str(record.get(k) or '').replace(FIELD_SEPARATOR, ' ')
+                                        for k in RECORD_FIELDS).encode()
+            record_table += FEED_RECORD.pack(len(pool), len(data))
+            pool += data
+            record_index += 1
+
+    # pool offsets are relative to the start of the pool
+    pool_offset = FEED_HEADER.size + len(package_table) + len(record_table)
+    header = FEED_HEADER.pack(FEED_MAGIC, FEED_FORMAT_VERSION, 0, len(by_package), record_index,
+                              pool_offset, len(meta_bytes))
+    write_atomic(output_path, header + bytes(package_table) + bytes(record_table) + bytes(pool))
+    return meta
+
+
+class VulnFeed:
+    """
+    Module containing functions for looking up vulnerable version ranges
+    in a memory-mapped feed index.
+    """
+
+    def __init__(self, index_path: str):
+        """
+        Opens and maps a feed index built by build_feed().
+
+        Raises:
+            ValueError: If the file is not a feed index
+        """
+        self.path = index_path
+        self._file = open(index_path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{index_path} is empty")
+        (magic, version, _, self.package_count, self.record_count,
+         self._pool, meta_length) = FEED_HEADER.unpack_from(self._map, 0)
+        if magic != FEED_MAGIC or version != FEED_FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{index_path} is not a FirmaForge feed index")
+        self._records_offset = FEED_HEADER.size + self.package_count * FEED_PACKAGE.size
+        self._names = _PackageNames(self)
+        self.meta = json.loads(self._map[self._pool:self._pool + meta_length])
+        self._decoded: Dict[str, List[Dict[str, Any]]] = {}
+        self._matches: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+
+    def close(self) -> None:
+        """Unmaps the index."""
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> 'VulnFeed':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _package_name(self, i: int) -> bytes:
+        """Returns the name of the i-th package in the table."""
+        name_offset, name_length, _, _ = FEED_PACKAGE.unpack_from(self._map, FEED_HEADER.size + i * FEED_PACKAGE.size)
+        start = self._pool + name_offset
+        return self._map[start:start + name_length]
+
+    def records(self, package: str) -> List[Dict[str, Any]]:
+        """
+        Returns the vulnerable ranges recorded for a package, ordered by
+        the version they were introduced in.
+        """
+        cached = self._decoded.get(package)
+        if cached is not None:
+            return cached
+        encoded = package.encode()
+        i = bisect.bisect_left(self._names, encoded)
+        records = []
+        if i < self.package_count and self._package_name(i) == encoded:
+            _, _, first, count = FEED_PACKAGE.unpack_from(self._map, FEED_HEADER.size + i * FEED_PACKAGE.size)
+            for r in range(first, first + count):
+                offset, length = FEED_RECORD.unpack_from(self._map, self._records_offset + r * FEED_RECORD.size)
+                start = self._pool + offset
+                values = self._map[start:start + length].decode(errors='replace').split(FIELD_SEPARATOR)
+                record = {k: v or None for k, v in zip(RECORD_FIELDS, values)}
+                record['_keys'] = (version_key(record['introduced'] or '0'),
+                                   version_key(record['fixed']) if record['fixed'] else None,
+                                   version_key(record['last_affected']) if record['last_affected'] else None,
+                                   3 if record['last_affected'] and '-' in record['last_affected'] else 2)
+                records.append(record)
+        self._decoded[package] = records
+        return records
+
+    def match(self, package: str, version: str) -> List[Dict[str, Any]]:
+        """
+        Returns the feed records whose range contains a package version.
+        """
+        cached = self._matches.get((package, version))
+        if cached is not None:
+            return cached
+        records = self.records(package)
+        matches = []
+        if records:
+            key = version_key(version)
+            for record in records:
+                # records are sorted by introduced version, so none later can match
+                introduced, fixed, last_affected, depth = record['_keys']
+                if key < introduced:
+                    break
+                if fixed is not None and key >= fixed:
+                    continue
+                # a last_affected version without a revision covers all of its revisions
+                if last_affected is not None and key[:depth] > last_affected[:depth]:
+                    continue
+                matches.append({k: record[k] for k in RECORD_FIELDS})
+        self._matches[(package, version)] = matches
+        return matches
+
+
+class _PackageNames:
+    """Sequence view of a feed's sorted package names for bisect."""
+
+    def __init__(self, feed: VulnFeed):
+        self._feed = feed
+
+    def __len__(self) -> int:
+        return self._feed.package_count
+
+    def __getitem__(self, i: int) -> bytes:
+        return self._feed._package_name(i)
+
+
+_open_feeds: Dict[str, Tuple[float, VulnFeed]] = {}
+
+
+def open_feed(index_path: str) -> VulnFeed:
+    """Returns a mapped feed index, reusing it while the file is unchanged."""
+    path = os.path.abspath(index_path)
+    mtime = os.stat(path).st_mtime
+    cached = _open_feeds.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    if cached is not None:
+        cached[1].close()
+    feed = VulnFeed(path)
+    _open_feeds[path] = (mtime, feed)
+    return feed
+
+
+def match_packages(feed: VulnFeed, packages: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Matches an inventory against a feed.
+
+    Returns:
+        One entry per affected package and vulnerability
+    """
+    affected = []
+    for package in packages:
+        if not package.get('name') or not package.get('version'):
+            continue
+        for record in feed.match(package['name'], package['version']):
+            entry = {'package': package['name'], 'version': package['version']}
+            entry.update(record)
+            affected.append(entry)
+    return affected
+
+
+def report_packages(report: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Returns the packages of an analysis report, with kernel versions from
+    the 'kernel' section added as the 'linux' package.
+    """
+    packages = list(report.get('static_analysis', {}).get('packages', []))
+    names = {p.get('name') for p in packages}
+    if KERNEL_PACKAGE not in names:
+        for kernel in report.get('kernel', []):
+            if kernel.get('version'):
+                packages.append({'name': KERNEL_PACKAGE, 'version': kernel['version'], 'source': 'kernel'})
+    return packages
+
+
+def match_report(feed: VulnFeed, report: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns the 'vulnerabilities' report section for an analysis report.
+    """
+    packages = report_packages(report)
+    affected = match_packages(feed, packages)
+    return {
+        'feed': feed.meta,
+        'packages_checked': len(packages),
+        'affected_packages': len({a['package'] for a in affected}),
+        'affected': affected,
+    }
+
+
+def _iter_db_inventories(db_path: str) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Yields (image name, packages) from a results database."""
+    from .results_db import ResultsDB
+
+    with ResultsDB(db_path) as db:
+        inventories: Dict[str, List[Dict[str, Any]]] = {}
+        for row in db.query("SELECT i.name AS image, p.name, p.version FROM packages p "
+                            "JOIN images i ON i.id = p.image_id ORDER BY i.name"):
+            inventories.setdefault(row['image'], []).append(row)
+        for row in db.query("SELECT i.name AS image, k.version FROM kernels k "
+                            "JOIN images i ON i.id = k.image_id WHERE k.version IS NOT NULL"):
+            packages = inventories.setdefault(row['image'], [])
+            if not any(p['name'] == KERNEL_PACKAGE for p in packages):
+                packages.append({'name': KERNEL_PACKAGE, 'version': row['version']})
+    yield from sorted(inventories.items())
+
+
+def _iter_report_inventories(results_dir: str) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Yields (image name, packages) from the reports in a results directory."""
+    for name, report_path in iter_reports(results_dir):
+        yield name, report_packages(load_result(str(report_path)))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m firmaforge.packages."""
+    parser = argparse.ArgumentParser(description="FirmaForge package inventory and vulnerability matching")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_build = sub.add_parser('build-feed', help="index a JSON-lines vulnerability feed")
+    p_build.add_argument('source')
+    p_build.add_argument('index')
+    p_inventory = sub.add_parser('inventory', help="list the packages installed in a rootfs")
+    p_inventory.add_argument('rootfs_dir')
+    p_match = sub.add_parser('match', help="match stored inventories against a feed index")
+    p_match.add_argument('index')
+    source = p_match.add_mutually_exclusive_group(required=True)
+    source.add_argument('--db', help="corpus results database")
+    source.add_argument('--results-dir', help="directory of *_analysis.json reports")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build-feed':
+        meta = build_feed(args.source, args.index)
+        print(f"Indexed {meta['records']} records for {meta['packages']} packages")
+        return 0
+    if args.command == 'inventory':
+        for package in read_package_inventory(Path(args.rootfs_dir)):
+            print(json.dumps(package))
+        return 0
+
+    start = time.perf_counter()
+    images = 0
+    with VulnFeed(args.index) as feed:
+        inventories = _iter_db_inventories(args.db) if args.db else _iter_report_inventories(args.results_dir)
+        for name, packages in inventories:
+            images += 1
+            for entry in match_packages(feed, packages):
+                print(json.dumps({'image': name, **entry}))
+    print(f"Matched {images} images in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,212 @@
+"""
+perf_gate.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A performance regression gate module that runs the pipeline on fixed
+reference images and fails when any stage exceeds its stored budget
+for wall time, peak RSS growth or subprocess count.
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from . import benchmark
+
+
+DEFAULT_BUDGETS = 'benchmarks/budgets.json'
+DEFAULT_TOLERANCE = 0.25
+
+# stages faster than this are too noisy to gate on relative wall time
+MIN_WALL_S = 0.05
+
+# allocator and import noise in peak RSS growth
+MIN_RSS_DELTA_KB = 4096
+
+# the two OpenWrt 24.10.4 images represented in results/
+REFERENCE_IMAGES = [
+    'openwrt-24.10.4-apm821xx-nand-meraki_mr24-squashfs-sysupgrade',
+    'openwrt-24.10.4-qualcommax-ipq807x-arcadyan_aw1000-squashfs-sysupgrade',
+]
+
+
+def find_reference_images(firmware_dir: str, work_dir: str, synthetic_tier: str = 'tiny') -> Dict[str, str]:
+    """
+    Locates the reference images, falling back to a generated
+    synthetic equivalent when none of them are available.
+
+    Args:
+        firmware_dir: Directory holding the reference firmware files
+        work_dir: Directory for synthetic images
+        synthetic_tier: Benchmark tier used as the fallback
+
+    Returns:
+        Mapping of reference name to image path
+    """
+    images = {}
+    for name in REFERENCE_IMAGES:
+        for suffix in ('.bin', '.img', ''):
+            path = Path(firmware_dir) / f"{name}{suffix}"
+            if path.is_file():
+                images[name] = str(path)
+                break
+
+    if not images:
+        meta = benchmark.build_image(synthetic_tier, work_dir)
+        images[Path(meta['image']).stem] = meta['image']
+
+    return images
+
+
+def check_budget(measured: Dict[str, Dict[str, Any]], budget: Dict[str, Dict[str, Any]],
+                 tolerance: float = DEFAULT_TOLERANCE, strict: bool = False) -> List[Dict[str, Any]]:
+    """
+    Compares measured stage metrics with a stored budget.
+
+    Wall time and peak RSS growth may exceed the budget by the tolerance;
+    subprocess and span call counts must not grow at all. RSS is gated on
+    how much each stage raised the process high-water mark, since the
+    mark itself carries over from earlier stages.
+
+    Args:
+        measured: Per-stage metrics from benchmark.profile_image
+        budget: Per-stage budget for the same image
+        tolerance: Allowed relative overshoot for wall time and RSS
+        strict: If True, stages without a budget are violations
+
+    Returns:
+        List of violations
+    """
+    violations = []
+    for stage, metrics in sorted(measured.items()):
+        limits = budget.get(stage)
+        if limits is None:
+            if strict:
+                violations.append({'stage': stage, 'metric': 'unbudgeted', 'measured': None, 'budget': None})
+            continue
+
+        wall_limit = max(limits['wall_s'] * (1 + tolerance), limits['wall_s'] + MIN_WALL_S)
+        if metrics['wall_s'] > wall_limit:
+            violations.append({'stage': stage, 'metric': 'wall_s', 'measured': metrics['wall_s'], 'budget': limits['wall_s']})
+
+        # budgets recorded before RSS growth was tracked have none
+        if 'peak_rss_delta_kb' in limits:
+            rss_limit = max(limits['peak_rss_delta_kb'] * (1 + tolerance), limits['peak_rss_delta_kb'] + MIN_RSS_DELTA_KB)
+            if metrics.get('peak_rss_delta_kb', 0) > rss_limit:
+                violations.append({'stage': stage, 'metric': 'peak_rss_delta_kb', 'measured': metrics['peak_rss_delta_kb'],
+                                   'budget': limits['peak_rss_delta_kb']})
+
+        if metrics['subprocesses'] > limits['subprocesses']:
+            violations.append({'stage': stage, 'metric': 'subprocesses', 'measured': metrics['subprocesses'], 'budget': limits['subprocesses']})
+
+        # budgets recorded before call counts were tracked have none
+        if 'calls' in limits and metrics.get('calls', 1) > limits['calls']:
+            violations.append({'stage': stage, 'metric': 'calls', 'measured': metrics['calls'], 'budget': limits['calls']})
+
+    return violations
+
+
+def load_budgets(budgets_path: str) -> Dict[str, Any]:
+    """Loads the budgets file, returning an empty structure if missing."""
+    path = Path(budgets_path)
+    if not path.exists():
+        return {'tolerance': DEFAULT_TOLERANCE, 'images': {}}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_budgets(budgets_path: str, budgets: Dict[str, Any]) -> None:
+    """Writes the budgets file."""
+    path = Path(budgets_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(budgets, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def run_gate(firmware_dir: str = 'demo_firmware', work_dir: str = 'benchmarks/work',
+             budgets_path: str = DEFAULT_BUDGETS, update: bool = False, repeat: int = 3,
+             tolerance: Optional[float] = None, strict: bool = False) -> Dict[str, Any]:
+    """
+    Runs the regression gate over all reference images.
+
+    Args:
+        firmware_dir: Directory holding the reference firmware files
+        work_dir: Directory for synthetic images and results
+        budgets_path: Path to the budgets JSON file
+        update: If True, record measured metrics as the new budgets instead of checking
+        repeat: Runs per image; the fastest wall time per stage is used
+        tolerance: Optional override of the stored tolerance
+        strict: If True, images and stages without a budget fail the gate
+
+    Returns:
+        Dictionary with per-image violations and a passed flag
+    """
+    budgets = load_budgets(budgets_path)
+    tolerance = tolerance if tolerance is not None else budgets.get('tolerance', DEFAULT_TOLERANCE)
+    images = find_reference_images(firmware_dir, work_dir)
+
+    report = {'passed': True, 'tolerance': tolerance, 'images': {}}
+    for name, image_path in sorted(images.items()):
+        measured = benchmark.profile_image(image_path, str(Path(work_dir) / 'gate' / name), repeat)
+
+        if update:
+            budgets.setdefault('images', {})[name] = {
+                'recorded': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'stages': measured['stages'],
+            }
+            report['images'][name] = {'updated': True}
+            continue
+
+        budget = budgets.get('images', {}).get(name)
+        if budget is None:
+            # like unbudgeted stages, a new image only fails the gate when strict
+            violations = [{'stage': None, 'metric': 'missing_budget', 'measured': None, 'budget': None}] if strict else []
+        else:
+            violations = check_budget(measured['stages'], budget['stages'], tolerance, strict)
+
+        report['images'][name] = {'violations': violations, 'total_wall_s': measured['total_wall_s'],
+                                  'budgeted': budget is not None}
+        if violations:
+            report['passed'] = False
+
+    if update:
+        budgets['tolerance'] = tolerance
+        save_budgets(budgets_path, budgets)
+
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m firmaforge.perf_gate."""
+    parser = argparse.ArgumentParser(description="Fail when pipeline stages exceed their performance budgets")
+    parser.add_argument('--firmware-dir', default='demo_firmware')
+    parser.add_argument('--work-dir', default='benchmarks/work')
+    parser.add_argument('--budgets', default=DEFAULT_BUDGETS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=None)
+    parser.add_argument('--strict', action='store_true', help="fail on images and stages without a budget")
+    parser.add_argument('--update', action='store_true', help="record current metrics as the budgets")
+    args = parser.parse_args(argv)
+
+    report = run_gate(args.firmware_dir, args.work_dir, args.budgets, args.update, args.repeat,
+                      args.tolerance, args.strict)
+
+    for name, result in report['images'].items():
+        if result.get('updated'):
+            print(f"{name}: budgets updated")
+            continue
+        status = 'FAIL' if result['violations'] else ('ok' if result['budgeted'] else 'no budget, run with --update')
+        print(f"{name}: {status} ({result['total_wall_s']:.2f}s)")
+        for v in result['violations']:
+            print(f"  {v['stage']} {v['metric']}: measured {v['measured']}, budget {v['budget']}")
+
+    return 0 if report['passed'] else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
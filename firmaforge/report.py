@@ -0,0 +1,246 @@
+"""
+report.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A module that collects analysis results from every pipeline stage
+in memory and serializes them once with an atomic write.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Any, Iterator, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+ENCODERS = ('json', 'orjson', 'msgpack')
+
+# file suffix of the reports each encoder writes
+REPORT_SUFFIXES = {'json': '.json', 'orjson': '.json', 'msgpack': '.msgpack'}
+
+
+def report_filename(name: str, encoder: str = 'json') -> str:
+    """
+    Returns the report file name of an image for the given encoder.
+    """
+    if encoder not in ENCODERS:
+        raise ValueError(f"Unknown encoder: {encoder}")
+    return f"{name}_analysis{REPORT_SUFFIXES[encoder]}"
+
+
+def iter_reports(results_dir: str) -> Iterator[Tuple[str, Path]]:
+    """
+    Yields (image name, report path) for every report in a results directory.
+    """
+    suffixes = set(REPORT_SUFFIXES.values())
+    for path in sorted(Path(results_dir).glob('*/*_analysis.*')):
+        if path.suffix in suffixes:
+            yield path.name[:-len(f"_analysis{path.suffix}")], path
+
+
+def _new_file_mode() -> int:
+    """
+    Returns the mode a plain open() would give a new file under the
+    process umask, read without changing it.
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('Umask:'):
+                    return 0o666 & ~int(line.split()[1], 8)
+    except (OSError, ValueError):
+        pass
+    # kernels without a Umask field only expose it by setting it
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def encode_result(data: Dict[str, Any], encoder: str = 'json') -> bytes:
+    """
+    Serializes a result dictionary with the requested encoder.
+
+    Args:
+        data: Result dictionary
+        encoder: One of 'json', 'orjson' or 'msgpack'
+
+    Returns:
+        Encoded bytes
+    """
+    if encoder not in ENCODERS:
+        raise ValueError(f"Unknown encoder: {encoder}")
+
+    if encoder == 'orjson':
+        if orjson is None:
+            raise RuntimeError("orjson is not installed")
+        return orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+    if encoder == 'msgpack':
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed")
+        return msgpack.packb(data, default=str, use_bin_type=True)
+
+    return json.dumps(data, indent=2, default=str).encode('utf-8')
+
+
+def write_atomic(output_path: str, payload: bytes, sync: bool = True) -> None:
+    """
+    Writes bytes to a temporary file next to output_path and renames
+    it into place so readers never observe a partial file.
+
+    Args:
+        output_path: Destination path
+        payload: Bytes to write
+        sync: Whether to fsync the file before the rename
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=str(output_path.parent), prefix=f".{output_path.name}.")
+    try:
+        # mkstemp creates files as 0600
+        os.fchmod(fd, _new_file_mode())
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_name, output_path)
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+class ResultBuilder:
+    """
+    Module containing functions for assembling an analysis report
+    from per-stage contributions.
+    """
+
+    def __init__(self, initial: Optional[Dict[str, Any]] = None):
+        """
+        Initializes the builder with optional initial content.
+
+        Args:
+            initial: Optional dictionary to start the report from
+        """
+        self.data: Dict[str, Any] = dict(initial) if initial else {}
+
+    def add(self, section: str, value: Any) -> None:
+        """
+        Sets a top-level report section.
+        """
+        self.data[section] = value
+
+    def update(self, values: Dict[str, Any]) -> None:
+        """
+        Merges several top-level sections into the report.
+        """
+        self.data.update(values)
+
+    def get(self, section: str, default: Any = None) -> Any:
+        """
+        Returns a top-level report section.
+        """
+        return self.data.get(section, default)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the assembled report.
+        """
+        return self.data
+
+    def write(self, output_path: str, encoder: str = 'json') -> None:
+        """
+        Serializes the report once and atomically writes it.
+
+        Args:
+            output_path: Path to the report file
+            encoder: One of 'json', 'orjson' or 'msgpack'
+        """
+        write_atomic(output_path, encode_result(self.data, encoder))
+
+
+class FindingStream:
+    """
+    Module containing functions for streaming findings to an NDJSON
+    file as they are produced.
+    """
+
+    def __init__(self, output_path: str):
+        """
+        Opens the NDJSON output file for writing records.
+
+        Args:
+            output_path: Path to the NDJSON file
+        """
+        self.output_path = Path(output_path)
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.counts: Dict[str, int] = {}
+        self._file = open(self.output_path, 'w', buffering=1)
+
+    def emit(self, analyzer: str, record: Dict[str, Any]) -> None:
+        """
+        Writes a single finding as one JSON line and flushes it so
+        consumers can tail the file live.
+        """
+        line = {'analyzer': analyzer}
+        line.update(record)
+        if orjson is not None:
+            self._file.write(orjson.dumps(line, default=str).decode('utf-8') + '\n')
+        else:
+            self._file.write(json.dumps(line, default=str, separators=(',', ':')) + '\n')
+        self.counts[analyzer] = self.counts.get(analyzer, 0) + 1
+
+    def sink(self, analyzer: str) -> Callable[[Dict[str, Any]], None]:
+        """
+        Returns a callable that emits records tagged with an analyzer name.
+        """
+        return lambda record: self.emit(analyzer, record)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns the stream location and per-analyzer record counts.
+        """
+        return {
+            'path': str(self.output_path),
+            'format': 'ndjson',
+            'records': sum(self.counts.values()),
+            'counts': dict(self.counts),
+        }
+
+    def close(self) -> None:
+        """
+        Closes the NDJSON file.
+        """
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self) -> 'FindingStream':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def load_result(path: str) -> Dict[str, Any]:
+    """Loads a report written by ResultBuilder, detecting msgpack output."""
+    with open(path, 'rb') as f:
+        payload = f.read()
+    if payload[:1] in (b'{', b'[') or not payload:
+        return json.loads(payload or b'{}')
+    if msgpack is None:
+        raise RuntimeError("msgpack is required to read this report")
+    return msgpack.unpackb(payload, raw=False)
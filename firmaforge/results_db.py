@@ -0,0 +1,492 @@
+"""
+results_db.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A corpus-wide results store module that keeps every analysis report
+in one SQLite database with normalized, indexed tables for
+cross-image queries.
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+from .report import iter_reports, load_result
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    firmware_file TEXT,
+    size INTEGER,
+    file_type TEXT,
+    entropy REAL,
+    possibly_encrypted INTEGER,
+    extracted_directory TEXT,
+    analyzed_at TEXT,
+    report TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS architectures (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    arch TEXT,
+    endianness TEXT,
+    confidence TEXT,
+    method TEXT
+);
+CREATE TABLE IF NOT EXISTS users (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    username TEXT,
+    uid INTEGER,
+    shell TEXT,
+    hash_type TEXT,
+    has_valid_password_hash INTEGER,
+    login_capable INTEGER
+);
+CREATE TABLE IF NOT EXISTS default_credentials (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    source TEXT,
+    username TEXT,
+    password TEXT
+);
+CREATE TABLE IF NOT EXISTS elfs (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    file TEXT,
+    bitness TEXT,
+    linking TEXT,
+    rpath TEXT,
+    rwx_segments TEXT,
+    dangerous_functions TEXT
+);
+CREATE TABLE IF NOT EXISTS libraries (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    elf_file TEXT,
+    library TEXT
+);
+CREATE TABLE IF NOT EXISTS findings (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    analyzer TEXT,
+    type TEXT,
+    file TEXT,
+    confidence TEXT,
+    context TEXT
+);
+CREATE TABLE IF NOT EXISTS services (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    name TEXT,
+    start INTEGER,
+    stop INTEGER
+);
+CREATE TABLE IF NOT EXISTS firewall_zones (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS firewall_rules (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    kind TEXT,
+    name TEXT,
+    proto TEXT,
+    src TEXT,
+    dest TEXT,
+    target TEXT,
+    dest_port TEXT,
+    src_dport TEXT,
+    dest_ip TEXT
+);
+CREATE TABLE IF NOT EXISTS kernels (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    file TEXT,
+    sha256 TEXT,
+    version TEXT,
+    compiler TEXT,
+    ikconfig INTEGER
+);
+CREATE TABLE IF NOT EXISTS packages (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    name TEXT,
+    version TEXT,
+    architecture TEXT
+);
+CREATE TABLE IF NOT EXISTS vulnerabilities (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    package TEXT,
+    version TEXT,
+    vuln_id TEXT,
+    severity TEXT,
+    fixed TEXT
+);
+CREATE TABLE IF NOT EXISTS listeners (
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    service TEXT,
+    proto TEXT,
+    port INTEGER,
+    interface TEXT,
+    wan_reachable INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_architectures_image ON architectures(image_id);
+CREATE INDEX IF NOT EXISTS idx_architectures_arch ON architectures(arch);
+CREATE INDEX IF NOT EXISTS idx_users_image ON users(image_id);
+CREATE INDEX IF NOT EXISTS idx_users_lookup ON users(username, hash_type, login_capable);
+CREATE INDEX IF NOT EXISTS idx_credentials_image ON default_credentials(image_id);
+CREATE INDEX IF NOT EXISTS idx_elfs_image ON elfs(image_id);
+CREATE INDEX IF NOT EXISTS idx_elfs_file ON elfs(file);
+CREATE INDEX IF NOT EXISTS idx_libraries_image ON libraries(image_id);
+CREATE INDEX IF NOT EXISTS idx_libraries_library ON libraries(library);
+CREATE INDEX IF NOT EXISTS idx_findings_image ON findings(image_id);
+CREATE INDEX IF NOT EXISTS idx_findings_type ON findings(type);
+CREATE INDEX IF NOT EXISTS idx_services_image ON services(image_id);
+CREATE INDEX IF NOT EXISTS idx_services_name ON services(name);
+CREATE INDEX IF NOT EXISTS idx_zones_image ON firewall_zones(image_id);
+CREATE INDEX IF NOT EXISTS idx_rules_image ON firewall_rules(image_id);
+CREATE INDEX IF NOT EXISTS idx_rules_port ON firewall_rules(dest_port);
+CREATE INDEX IF NOT EXISTS idx_kernels_image ON kernels(image_id);
+CREATE INDEX IF NOT EXISTS idx_kernels_version ON kernels(version);
+CREATE INDEX IF NOT EXISTS idx_packages_image ON packages(image_id);
+CREATE INDEX IF NOT EXISTS idx_packages_name ON packages(name, version);
+CREATE INDEX IF NOT EXISTS idx_vulnerabilities_image ON vulnerabilities(image_id);
+CREATE INDEX IF NOT EXISTS idx_vulnerabilities_id ON vulnerabilities(vuln_id);
+CREATE INDEX IF NOT EXISTS idx_listeners_image ON listeners(image_id);
+CREATE INDEX IF NOT EXISTS idx_listeners_port ON listeners(port, wan_reachable);
+"""
+
+
+class ResultsDB:
+    """
+    Module containing functions for storing and querying analysis
+    reports across a firmware corpus.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Opens (and if needed creates) the results database.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=60)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """
+        Closes the database connection.
+        """
+        self.conn.close()
+
+    def __enter__(self) -> 'ResultsDB':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def store_report(self, name: str, report: Dict[str, Any]) -> int:
+        """
+        Stores an analysis report, replacing any earlier report for the image.
+
+        Args:
+            name: Image name (firmware file stem)
+            report: Analysis report as produced by analyze_firmware
+
+        Returns:
+            Database id of the image
+        """
+        file_info = report.get('file_info', {})
+        encryption = report.get('encryption_check', {})
+        static = report.get('static_analysis', {})
+
+        with self.conn:
+            self.conn.execute("DELETE FROM images WHERE name = ?", (name,))
+            cursor = self.conn.execute(
+                "INSERT INTO images (name, firmware_file, size, file_type, entropy, possibly_encrypted, "
+                "extracted_directory, analyzed_at, report) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, report.get('firmware_file'), file_info.get('size'), file_info.get('file_type'),
+                 encryption.get('entropy'), int(bool(encryption.get('possibly_encrypted'))),
+                 report.get('extracted_directory'), time.strftime('%Y-%m-%dT%H:%M:%S'),
+                 json.dumps(report, default=str))
+            )
+            image_id = cursor.lastrowid
+
+            arch = report.get('architecture', {})
+            endianness = report.get('endianness', {}).get('detected', [])
+            for detected in arch.get('detected', []):
+                self.conn.execute(
+                    "INSERT INTO architectures VALUES (?, ?, ?, ?, ?)",
+                    (image_id, detected, ','.join(endianness), arch.get('confidence'), arch.get('method'))
+                )
+
+            login_capable = set(static.get('login_capable_users', []))
+            self.conn.executemany(
+                "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(image_id, u.get('username'), u.get('uid'), u.get('shell'), u.get('hash_type'),
+                  int(bool(u.get('has_valid_password_hash'))), int(u.get('username') in login_capable))
+                 for u in static.get('users', [])]
+            )
+
+            self.conn.executemany(
+                "INSERT INTO default_credentials VALUES (?, ?, ?, ?)",
+                [(image_id, c.get('source'), c.get('username'), c.get('password'))
+                 for c in static.get('default_credentials', [])]
+            )
+
+            self._store_elfs(image_id, static.get('elf_analysis', []))
+            self._store_findings(image_id, 'secrets_analysis', static.get('secrets_analysis', {}).get('findings', []))
+            self._store_findings(image_id, 'web_security', static.get('web_security', {}).get('findings', []))
+
+            # findings written to the NDJSON stream instead of the report
+            stream = static.get('findings_stream')
+            if stream and Path(stream['path']).exists():
+                self._store_stream(image_id, stream['path'])
+
+            self.conn.executemany(
+                "INSERT INTO services VALUES (?, ?, ?, ?)",
+                [(image_id, s.get('name'), s.get('start'), s.get('stop')) for s in static.get('startup_services', [])]
+            )
+
+            firewall = static.get('firewall', {})
+            self.conn.executemany(
+                "INSERT INTO firewall_zones VALUES (?, ?)",
+                [(image_id, zone) for zone in firewall.get('zones', [])]
+            )
+            rules = [('rule', r) for r in firewall.get('rules', [])] + [('redirect', r) for r in firewall.get('redirects', [])]
+            self.conn.executemany(
+                "INSERT INTO firewall_rules VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(image_id, kind, r.get('name'), r.get('proto'), r.get('src'), r.get('dest'), r.get('target'),
+                  r.get('dest_port'), r.get('src_dport'), r.get('dest_ip')) for kind, r in rules]
+            )
+
+            self.conn.executemany(
+                "INSERT INTO kernels VALUES (?, ?, ?, ?, ?, ?)",
+                [(image_id, k.get('file'), k.get('sha256'), k.get('version'), k.get('compiler'),
+                  int(bool(k.get('ikconfig')))) for k in report.get('kernel', [])]
+            )
+
+            self.conn.executemany(
+                "INSERT INTO packages VALUES (?, ?, ?, ?)",
+                [(image_id, p.get('name'), p.get('version'), p.get('architecture')) for p in static.get('packages', [])]
+            )
+            self.conn.executemany(
+                "INSERT INTO vulnerabilities VALUES (?, ?, ?, ?, ?, ?)",
+                [(image_id, v.get('package'), v.get('version'), v.get('id'), v.get('severity'), v.get('fixed'))
+                 for v in report.get('vulnerabilities', {}).get('affected', [])]
+            )
+            self.conn.executemany(
+                "INSERT INTO listeners VALUES (?, ?, ?, ?, ?, ?)",
+                [(image_id, l.get('service'), l.get('proto'), l.get('port'), l.get('interface'),
+                  int(bool(l.get('wan_reachable')))) for l in static.get('exposure', {}).get('listeners', [])]
+            )
+
+        return image_id
+
+    def _store_elfs(self, image_id: int, elfs: List[Dict[str, Any]]) -> None:
+        """
+        Inserts ELF records and their library links.
+        """
+        for elf in elfs:
+            security = elf.get('security', {})
+            self.conn.execute(
+                "INSERT INTO elfs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (image_id, elf.get('file'), elf.get('bitness'), elf.get('linking'), security.get('rpath'),
+                 security.get('rwx_segments'), ','.join(elf.get('dangerous_functions', [])))
+            )
+            self.conn.executemany(
+                "INSERT INTO libraries VALUES (?, ?, ?)",
+                [(image_id, elf.get('file'), lib) for lib in elf.get('libraries', [])]
+            )
+
+    def _store_findings(self, image_id: int, analyzer: str, findings: List[Dict[str, Any]]) -> None:
+        """
+        Inserts findings for one analyzer.
+        """
+        self.conn.executemany(
+            "INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?)",
+            [(image_id, analyzer, f.get('type'), f.get('file'), f.get('confidence'), f.get('context'))
+             for f in findings]
+        )
+
+    def _store_stream(self, image_id: int, stream_path: str) -> None:
+        """
+        Inserts records from an NDJSON findings stream.
+        """
+        elfs = []
+        with open(stream_path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                analyzer = record.pop('analyzer', None)
+                if analyzer == 'elf_analysis':
+                    elfs.append(record)
+                else:
+                    self._store_findings(image_id, analyzer, [record])
+        self._store_elfs(image_id, elfs)
+
+    def query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        """
+        Runs a SQL query on a read-only connection and returns rows as dictionaries.
+        """
+        conn = sqlite3.connect(self.db_path.resolve().as_uri() + "?mode=ro", uri=True, timeout=60)
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def image_names(self) -> List[str]:
+        """
+        Returns the names of all stored images.
+        """
+        return [row['name'] for row in self.conn.execute("SELECT name FROM images ORDER BY name")]
+
+    def images_with_user_hash(self, username: str = 'root', hash_type: Optional[str] = None,
+                              login_capable: bool = True) -> List[str]:
+        """
+        Finds images where a user has a given password hash type,
+        e.g. login-capable root with a DES hash.
+        """
+        sql = ("SELECT DISTINCT i.name FROM users u JOIN images i ON i.id = u.image_id "
+               "WHERE u.username = ? AND u.login_capable = ?")
+        params: List[Any] = [username, int(login_capable)]
+        if hash_type is not None:
+            sql += " AND u.hash_type = ?"
+            params.append(hash_type)
+        return [row['name'] for row in self.conn.execute(sql + " ORDER BY i.name", params)]
+
+    def images_with_finding(self, finding_type: str) -> List[str]:
+        """
+        Finds images with at least one finding of a type, e.g. 'AWS API Key'.
+        """
+        return [row['name'] for row in self.conn.execute(
+            "SELECT DISTINCT i.name FROM findings f JOIN images i ON i.id = f.image_id "
+            "WHERE f.type = ? ORDER BY i.name", (finding_type,))]
+
+    def images_with_library(self, library: str) -> List[str]:
+        """
+        Finds images with an ELF linking against a library (prefix match).
+        """
+        return [row['name'] for row in self.conn.execute(
+            "SELECT DISTINCT i.name FROM libraries l JOIN images i ON i.id = l.image_id "
+            "WHERE l.library >= ? AND l.library < ? ORDER BY i.name", (library, library + '\uffff'))]
+
+    def images_by_architecture(self, arch: str) -> List[str]:
+        """
+        Finds images detected as a given architecture.
+        """
+        return [row['name'] for row in self.conn.execute(
+            "SELECT DISTINCT i.name FROM architectures a JOIN images i ON i.id = a.image_id "
+            "WHERE a.arch = ? ORDER BY i.name", (arch,))]
+
+    def images_exposing_port(self, port: str) -> List[str]:
+        """
+        Finds images with a firewall rule or redirect for a destination port.
+        """
+        return [row['name'] for row in self.conn.execute(
+            "SELECT DISTINCT i.name FROM firewall_rules r JOIN images i ON i.id = r.image_id "
+            "WHERE r.dest_port = ? OR r.src_dport = ? ORDER BY i.name", (port, port))]
+
+    def images_listening_on(self, port: int, wan_only: bool = True) -> List[str]:
+        """
+        Finds images with a service listening on a port, by default only if it is reachable from the WAN.
+        """
+        sql = ("SELECT DISTINCT i.name FROM listeners l JOIN images i ON i.id = l.image_id "
+               "WHERE l.port = ?" + (" AND l.wan_reachable = 1" if wan_only else "") + " ORDER BY i.name")
+        return [row['name'] for row in self.conn.execute(sql, (port,))]
+
+    def images_with_kernel(self, version: str) -> List[str]:
+        """
+        Finds images whose kernel version starts with a prefix, e.g. '5.4.'.
+        """
+        return [row['name'] for row in self.conn.execute(
+            "SELECT DISTINCT i.name FROM kernels k JOIN images i ON i.id = k.image_id "
+            "WHERE k.version >= ? AND k.version < ? ORDER BY i.name", (version, version + '\uffff'))]
+
+    def images_with_package(self, name: str, version: Optional[str] = None) -> List[str]:
+        """
+        Finds images with a package installed, optionally at an exact version.
+        """
+        if version is None:
+            rows = self.conn.execute("SELECT DISTINCT i.name FROM packages p JOIN images i ON i.id = p.image_id "
+                                     "WHERE p.name = ? ORDER BY i.name", (name,))
+        else:
+            rows = self.conn.execute("SELECT DISTINCT i.name FROM packages p JOIN images i ON i.id = p.image_id "
+                                     "WHERE p.name = ? AND p.version = ? ORDER BY i.name", (name, version))
+        return [row['name'] for row in rows]
+
+    def images_with_vulnerability(self, vuln_id: str) -> List[str]:
+        """
+        Finds images matched to a vulnerability id, e.g. 'CVE-2023-48795'.
+        """
+        return [row['name'] for row in self.conn.execute(
+            "SELECT DISTINCT i.name FROM vulnerabilities v JOIN images i ON i.id = v.image_id "
+            "WHERE v.vuln_id = ? ORDER BY i.name", (vuln_id,))]
+
+    def export_json(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns a stored image's report in the per-image JSON schema.
+        """
+        row = self.conn.execute("SELECT report FROM images WHERE name = ?", (name,)).fetchone()
+        return json.loads(row['report']) if row else None
+
+    def iter_reports(self) -> Iterator[Dict[str, Any]]:
+        """
+        Iterates over all stored reports.
+        """
+        for row in self.conn.execute("SELECT report FROM images ORDER BY name"):
+            yield json.loads(row['report'])
+
+
+def import_results_dir(db_path: str, results_dir: str) -> int:
+    """
+    Loads every existing *_analysis.json under a results directory into the database.
+
+    Returns:
+        Number of reports imported
+    """
+    count = 0
+    with ResultsDB(db_path) as db:
+        for name, report_path in iter_reports(results_dir):
+            db.store_report(name, load_result(str(report_path)))
+            count += 1
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m firmaforge.results_db."""
+    parser = argparse.ArgumentParser(description="FirmaForge corpus results database")
+    parser.add_argument('db', help="path to the SQLite database")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_import = sub.add_parser('import', help="import *_analysis.json files from a results directory")
+    p_import.add_argument('results_dir')
+    p_query = sub.add_parser('query', help="run an SQL query")
+    p_query.add_argument('sql')
+    p_export = sub.add_parser('export', help="print an image's report as JSON")
+    p_export.add_argument('name')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        print(f"Imported {import_results_dir(args.db, args.results_dir)} reports")
+        return 0
+
+    with ResultsDB(args.db) as db:
+        if args.command == 'query':
+            for row in db.query(args.sql):
+                print(json.dumps(row, default=str))
+        else:
+            report = db.export_json(args.name)
+            if report is None:
+                print(f"No report for {args.name}")
+                return 1
+            print(json.dumps(report, indent=2, default=str))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
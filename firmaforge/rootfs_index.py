@@ -0,0 +1,173 @@
+"""
+rootfs_index.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A module that walks an extracted tree once and records every
+entry's type, size, mode, symlink target and content hash.
+"""
+
+import hashlib
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# hashlib and file reads release the GIL, so threads hash files in parallel
+DEFAULT_HASH_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def hash_file(file_path: Path) -> str:
+    """Computes the SHA-256 of a file using large read buffers."""
+    digest = hashlib.sha256()
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def _try_hash_file(file_path: Path) -> Optional[str]:
+    """Hashes a file, returning None if it cannot be read."""
+    try:
+        return hash_file(file_path)
+    except OSError:
+        return None
+
+
+class RootfsIndex:
+    """
+    Module containing functions for indexing an extracted tree.
+    """
+
+    def __init__(self, root: Path, entries: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Initializes the index for a root directory.
+
+        Args:
+            root: Path to the indexed directory
+            entries: Optional pre-built mapping of relative path to entry
+        """
+        self.root = Path(root)
+        self.entries: Dict[str, Dict[str, Any]] = entries if entries is not None else {}
+
+    @classmethod
+    def build(cls, root: Path, hash_files: bool = True, workers: int = DEFAULT_HASH_WORKERS) -> 'RootfsIndex':
+        """
+        Walks a directory tree and indexes every entry.
+
+        Args:
+            root: Path to the directory to index
+            hash_files: If True, compute SHA-256 for regular files
+            workers: Number of threads hashing files
+
+        Returns:
+            Populated RootfsIndex
+        """
+        index = cls(root)
+        root = Path(root)
+        if not root.exists():
+            return index
+
+        for current, dirs, files in os.walk(root):
+            current_path = Path(current)
+            for name in dirs + files:
+                full_path = current_path / name
+                try:
+                    entry = index._make_entry(full_path)
+                except OSError:
+                    continue
+                index.entries[entry['path']] = entry
+
+        if hash_files:
+            index._hash_files(workers)
+        return index
+
+    def _hash_files(self, workers: int) -> None:
+        """
+        Hashes every regular file entry, dropping files that cannot be read.
+        """
+        entries = list(self.files())
+        paths = [self.root / entry['path'] for entry in entries]
+        if workers > 1 and len(paths) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                digests = list(pool.map(_try_hash_file, paths))
+        else:
+            digests = [_try_hash_file(path) for path in paths]
+        for entry, digest in zip(entries, digests):
+            if digest is None:
+                del self.entries[entry['path']]
+            else:
+                entry['sha256'] = digest
+
+    def _make_entry(self, full_path: Path) -> Dict[str, Any]:
+        """
+        Builds the index entry for a single path.
+        """
+        st = os.lstat(full_path)
+        entry = {
+            'path': full_path.relative_to(self.root).as_posix(),
+            'type': 'other',
+            'mode': stat.S_IMODE(st.st_mode),
+            'size': 0,
+        }
+
+        if stat.S_ISLNK(st.st_mode):
+            entry['type'] = 'symlink'
+            entry['target'] = os.readlink(full_path)
+        elif stat.S_ISDIR(st.st_mode):
+            entry['type'] = 'dir'
+        elif stat.S_ISREG(st.st_mode):
+            entry['type'] = 'file'
+            entry['size'] = st.st_size
+
+        return entry
+
+    def get(self, rel_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the entry for a relative path, if indexed.
+        """
+        return self.entries.get(rel_path)
+
+    def files(self) -> Iterator[Dict[str, Any]]:
+        """
+        Iterates over regular file entries.
+        """
+        for entry in self.entries.values():
+            if entry['type'] == 'file':
+                yield entry
+
+    def total_size(self) -> int:
+        """
+        Returns the total size of all regular files.
+        """
+        return sum(entry['size'] for entry in self.files())
+
+    def subtree(self, rel_dir: str) -> 'RootfsIndex':
+        """
+        Returns an index of a subdirectory, with paths relative to it.
+        """
+        prefix = rel_dir.strip('/') + '/'
+        return RootfsIndex(self.root / rel_dir, {path[len(prefix):]: dict(entry, path=path[len(prefix):])
+                                                 for path, entry in self.entries.items() if path.startswith(prefix)})
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """
+        Returns all entries sorted by path.
+        """
+        return [self.entries[path] for path in sorted(self.entries)]
+
+    @classmethod
+    def from_list(cls, root: Path, entries: List[Dict[str, Any]]) -> 'RootfsIndex':
+        """
+        Rebuilds an index from a list of entries.
+        """
+        return cls(root, {entry['path']: entry for entry in entries})
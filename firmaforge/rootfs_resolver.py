@@ -0,0 +1,204 @@
+"""
+rootfs_resolver.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A path resolution module that records every symlink of an extracted
+rootfs once and resolves paths the way the device sees them: absolute
+link targets start at the rootfs, '..' never climbs above it, and
+nothing is looked up on the host. It also maps each real file to all
+the names that lead to it, such as BusyBox and its applet links.
+"""
+
+import os
+import posixpath
+import stat
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from .rootfs_index import RootfsIndex
+
+# the kernel's limit on symlinks followed in one lookup
+MAX_SYMLINK_HOPS = 40
+
+
+class RootfsResolver:
+    """
+    Module containing functions for resolving paths chroot-style inside
+    an extracted rootfs.
+    """
+
+    def __init__(self, root: Path, types: Dict[str, str], links: Dict[str, str]):
+        """
+        Initializes the resolver from a link table.
+
+        Args:
+            root: Path to the extracted rootfs
+            types: Mapping of relative path to 'file', 'dir', 'symlink' or 'other'
+            links: Mapping of relative symlink path to its target as stored
+        """
+        self.root = Path(root)
+        self.types = types
+        self.links = links
+        self._resolved: Dict[str, Optional[str]] = {}
+        self._aliases: Optional[Dict[str, List[str]]] = None
+
+    @classmethod
+    def build(cls, root: Path, index: Optional[RootfsIndex] = None) -> 'RootfsResolver':
+        """
+        Builds the link table from a rootfs-relative index, or by walking
+        the tree once when no index is given.
+        """
+        root = Path(root)
+        types: Dict[str, str] = {}
+        links: Dict[str, str] = {}
+        if index is not None:
+            for path, entry in index.entries.items():
+                types[path] = entry['type']
+                if entry['type'] == 'symlink':
+                    links[path] = entry['target']
+            return cls(root, types, links)
+
+        if not root.exists():
+            return cls(root, types, links)
+        for current, dirs, files in os.walk(root):
+            rel_dir = os.path.relpath(current, root)
+            for name in dirs + files:
+                rel_path = name if rel_dir == '.' else f"{rel_dir}/{name}".replace(os.sep, '/')
+                try:
+                    st = os.lstat(os.path.join(current, name))
+                except OSError:
+                    continue
+                if stat.S_ISLNK(st.st_mode):
+                    types[rel_path] = 'symlink'
+                    try:
+                        links[rel_path] = os.readlink(os.path.join(current, name))
+                    except OSError:
+                        links[rel_path] = ''
+                elif stat.S_ISDIR(st.st_mode):
+                    types[rel_path] = 'dir'
+                elif stat.S_ISREG(st.st_mode):
+                    types[rel_path] = 'file'
+                else:
+                    types[rel_path] = 'other'
+        return cls(root, types, links)
+
+    def resolve(self, rel_path: str) -> Optional[str]:
+        """
+        Resolves every symlink along a path inside the rootfs.
+
+        Args:
+            rel_path: Path relative to the rootfs (a leading '/' is ignored)
+
+        Returns:
+            Relative path of the file or directory reached ('' for the rootfs
+            itself), or None if a link is broken, loops, or the path is missing
+        """
+        rel_path = rel_path.strip('/')
+        if rel_path in self._resolved:
+            return self._resolved[rel_path]
+
+        pending = [part for part in rel_path.split('/') if part]
+        pending.reverse()
+        current: List[str] = []
+        hops = 0
+        resolved: Optional[str] = None
+        while True:
+            if not pending:
+                resolved = '/'.join(current)
+                break
+            part = pending.pop()
+            if part == '.':
+                continue
+            if part == '..':
+                # like a chroot, the rootfs is its own parent
+                if current:
+                    current.pop()
+                continue
+            candidate = '/'.join(current + [part])
+            kind = self.types.get(candidate)
+            if kind is None:
+                break
+            if kind != 'symlink':
+                if pending and kind != 'dir':
+                    break
+                current.append(part)
+                continue
+            hops += 1
+            if hops > MAX_SYMLINK_HOPS:
+                break
+            target = self.links.get(candidate, '')
+            if not target:
+                break
+            if target.startswith('/'):
+                current = []
+            pending.extend(reversed([p for p in target.split('/') if p]))
+
+        self._resolved[rel_path] = resolved
+        return resolved
+
+    def is_file(self, rel_path: str) -> bool:
+        """
+        Checks whether a path resolves to a regular file.
+        """
+        resolved = self.resolve(rel_path)
+        return resolved is not None and self.types.get(resolved) == 'file'
+
+    def is_dir(self, rel_path: str) -> bool:
+        """
+        Checks whether a path resolves to a directory.
+        """
+        resolved = self.resolve(rel_path)
+        return resolved == '' or (resolved is not None and self.types.get(resolved) == 'dir')
+
+    def is_broken(self, rel_path: str) -> bool:
+        """
+        Checks whether a path is a symlink that does not resolve inside the rootfs.
+        """
+        return self.types.get(rel_path.strip('/')) == 'symlink' and self.resolve(rel_path) is None
+
+    def host_path(self, rel_path: str) -> Optional[Path]:
+        """
+        Returns the host path of the regular file a path resolves to, or None.
+        """
+        resolved = self.resolve(rel_path)
+        if resolved is None or self.types.get(resolved) != 'file':
+            return None
+        return self.root / resolved
+
+    def files(self) -> Iterator[str]:
+        """
+        Iterates over the relative paths of regular files, in sorted order.
+        """
+        for path in sorted(p for p, kind in self.types.items() if kind == 'file'):
+            yield path
+
+    def entries(self, name: str) -> Iterator[str]:
+        """
+        Iterates over the relative paths of every entry with a given
+        base name, including symlinks, in sorted order.
+        """
+        for path in sorted(self.types):
+            if posixpath.basename(path) == name:
+                yield path
+
+    def aliases(self) -> Dict[str, List[str]]:
+        """
+        Returns the symlinks leading to each regular file, e.g. BusyBox's
+        applet links, keyed by the real file's relative path.
+        """
+        if self._aliases is None:
+            aliases: Dict[str, List[str]] = {}
+            for link in sorted(self.links):
+                resolved = self.resolve(link)
+                if resolved is not None and self.types.get(resolved) == 'file':
+                    aliases.setdefault(resolved, []).append(link)
+            self._aliases = aliases
+        return self._aliases
+
+    def applets(self) -> Dict[str, str]:
+        """
+        Returns the map of every link name to the real file it runs.
+        """
+        return {link: real for real, links in self.aliases().items() for link in links}
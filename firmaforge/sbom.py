@@ -0,0 +1,282 @@
+"""
+sbom.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A software bill of materials module that turns an image's extract
+index into a CycloneDX JSON document listing every file with its size
+and SHA-256, the opkg packages that own them, the kernel, and the
+shared libraries each ELF binary links against.
+"""
+
+import json
+import posixpath
+import struct
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from .packages import read_package_files, read_package_inventory
+from .report import write_atomic
+from .rootfs_index import DEFAULT_HASH_WORKERS, RootfsIndex
+
+CYCLONEDX_SPEC_VERSION = '1.5'
+ROOTFS_PREFIX = 'rootfs/'
+LIBRARY_DIRS = ('lib', 'usr/lib')
+MAX_SYMLINK_HOPS = 8
+
+# upper bounds for the ELF structures read when collecting DT_NEEDED
+MAX_PROGRAM_HEADERS = 256
+MAX_DYNAMIC_BYTES = 64 * 1024
+MAX_DYNSTR_BYTES = 1024 * 1024
+
+PT_LOAD = 1
+PT_DYNAMIC = 2
+DT_NULL = 0
+DT_NEEDED = 1
+DT_STRTAB = 5
+DT_STRSZ = 10
+
+
+def elf_needed(file_path: Path) -> Optional[List[str]]:
+    """
+    Reads the DT_NEEDED entries of an ELF file.
+
+    Returns:
+        Needed library names, or None if the file is not an ELF
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            header = f.read(64)
+            if len(header) < 52 or header[:4] != b'\x7fELF':
+                return None
+            is64 = header[4] == 2
+            end = '<' if header[5] == 1 else '>'
+            if is64:
+                phoff, = struct.unpack_from(end + 'Q', header, 32)
+                phentsize, phnum = struct.unpack_from(end + 'HH', header, 54)
+                phdr, dyn = struct.Struct(end + 'IIQQQQ'), struct.Struct(end + 'qQ')
+            else:
+                phoff, = struct.unpack_from(end + 'I', header, 28)
+                phentsize, phnum = struct.unpack_from(end + 'HH', header, 42)
+                phdr, dyn = struct.Struct(end + 'IIIII'), struct.Struct(end + 'iI')
+            if phentsize < phdr.size or phnum > MAX_PROGRAM_HEADERS:
+                return []
+
+            f.seek(phoff)
+            table = f.read(phentsize * phnum)
+            loads = []
+            dynamic = None
+            for i in range(len(table) // phentsize):
+                fields = phdr.unpack_from(table, i * phentsize)
+                if is64:
+                    p_type, p_offset, p_vaddr, p_filesz = fields[0], fields[2], fields[3], fields[5]
+                else:
+                    p_type, p_offset, p_vaddr, p_filesz = fields[0], fields[1], fields[2], fields[4]
+                if p_type == PT_LOAD:
+                    loads.append((p_vaddr, p_offset, p_filesz))
+                elif p_type == PT_DYNAMIC:
+                    dynamic = (p_offset, min(p_filesz, MAX_DYNAMIC_BYTES))
+            if dynamic is None:
+                return []
+
+            f.seek(dynamic[0])
+            data = f.read(dynamic[1])
+            needed, strtab, strsz = [], None, MAX_DYNSTR_BYTES
+            for offset in range(0, len(data) - dyn.size + 1, dyn.size):
+                tag, value = dyn.unpack_from(data, offset)
+                if tag == DT_NULL:
+                    break
+                if tag == DT_NEEDED:
+                    needed.append(value)
+                elif tag == DT_STRTAB:
+                    strtab = value
+                elif tag == DT_STRSZ:
+                    strsz = min(value, MAX_DYNSTR_BYTES)
+            if strtab is None or not needed:
+                return []
+
+            # DT_STRTAB is a virtual address; map it through the loadable segments
+            for vaddr, offset, filesz in loads:
+                if vaddr <= strtab < vaddr + filesz:
+                    f.seek(offset + strtab - vaddr)
+                    strings = f.read(strsz)
+                    break
+            else:
+                return []
+    except (OSError, struct.error):
+        return None
+
+    names = []
+    for offset in needed:
+        stop = strings.find(b'\0', offset)
+        if offset < len(strings) and stop > offset:
+            names.append(strings[offset:stop].decode(errors='replace'))
+    return names
+
+
+def _resolve(index: RootfsIndex, path: str) -> Optional[str]:
+    """Follows symlinks inside the extract index to a regular file path."""
+    for _ in range(MAX_SYMLINK_HOPS):
+        entry = index.get(path)
+        if entry is None:
+            return None
+        if entry['type'] == 'file':
+            return path
+        if entry['type'] != 'symlink':
+            return None
+        target = entry['target']
+        if target.startswith('/'):
+            path = ROOTFS_PREFIX + target.lstrip('/')
+        else:
+            path = posixpath.normpath(posixpath.join(posixpath.dirname(path), target))
+        # never step out of the extracted rootfs
+        if not path.startswith(ROOTFS_PREFIX):
+            return None
+    return None
+
+
+def _display_path(rel_path: str) -> str:
+    """Returns the name a file is listed under: its path on the device for rootfs files."""
+    return '/' + rel_path[len(ROOTFS_PREFIX):] if rel_path.startswith(ROOTFS_PREFIX) else rel_path
+
+
+def _file_component(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the CycloneDX component of an indexed file."""
+    return {
+        'type': 'file',
+        'bom-ref': f"file:{entry['path']}",
+        'name': _display_path(entry['path']),
+        'hashes': [{'alg': 'SHA-256', 'content': entry['sha256']}],
+        'properties': [
+            {'name': 'firmaforge:size', 'value': str(entry['size'])},
+            {'name': 'firmaforge:mode', 'value': oct(entry.get('mode', 0))},
+        ],
+    }
+
+
+def build_sbom(firmware_name: str, index: RootfsIndex, packages: Optional[List[Dict[str, Any]]] = None,
+               kernels: Optional[List[Dict[str, Any]]] = None, firmware_sha256: Optional[str] = None,
+               workers: int = DEFAULT_HASH_WORKERS) -> Dict[str, Any]:
+    """
+    Builds a CycloneDX SBOM from an index of an image's raw_extracts.
+
+    Args:
+        firmware_name: Image name
+        index: Hashed RootfsIndex of <firmware_result_dir>/raw_extracts
+        packages: Optional package inventory (read from the rootfs if None)
+        kernels: Optional 'kernel' report section
+        firmware_sha256: Optional SHA-256 of the firmware image itself
+        workers: Number of threads reading ELF dynamic sections
+
+    Returns:
+        CycloneDX JSON document
+    """
+    rootfs_dir = index.root / ROOTFS_PREFIX
+    if packages is None:
+        packages = read_package_inventory(rootfs_dir)
+    owned_files = read_package_files(rootfs_dir)
+
+    files = [entry for entry in index.files() if entry.get('sha256')]
+    components_by_path = {entry['path']: _file_component(entry) for entry in files}
+
+    # shared libraries by name, including symlinked sonames
+    libraries: Dict[str, str] = {}
+    for path, entry in index.entries.items():
+        directory, name = posixpath.split(path)
+        if (entry['type'] in ('file', 'symlink') and directory.startswith(ROOTFS_PREFIX)
+                and directory[len(ROOTFS_PREFIX):] in LIBRARY_DIRS):
+            resolved = _resolve(index, path)
+            if resolved is not None:
+                libraries.setdefault(name, resolved)
+
+    rootfs_files = [entry for entry in files if entry['path'].startswith(ROOTFS_PREFIX) and entry['size'] >= 52]
+    paths = [index.root / entry['path'] for entry in rootfs_files]
+    if workers > 1 and len(paths) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            needed_lists = list(pool.map(elf_needed, paths))
+    else:
+        needed_lists = [elf_needed(path) for path in paths]
+
+    dependencies = []
+    for entry, needed in zip(rootfs_files, needed_lists):
+        if needed is None:
+            continue
+        component = components_by_path[entry['path']]
+        component['properties'].append({'name': 'firmaforge:elf', 'value': 'true'})
+        resolved = [libraries[name] for name in needed if name in libraries]
+        missing = [name for name in needed if name not in libraries]
+        if missing:
+            component['properties'].append({'name': 'firmaforge:unresolved_needed', 'value': ','.join(missing)})
+        if resolved:
+            dependencies.append({'ref': component['bom-ref'],
+                                 'dependsOn': sorted({f"file:{path}" for path in resolved})})
+
+    components = []
+    for kernel in kernels or []:
+        components.append({
+            'type': 'operating-system',
+            'bom-ref': f"kernel:{kernel.get('file')}",
+            'name': 'linux',
+            'version': kernel.get('version') or 'unknown',
+            'properties': [{'name': 'firmaforge:compiler', 'value': kernel.get('compiler') or 'unknown'}],
+        })
+
+    package_refs = []
+    for package in packages:
+        ref = f"package:{package['name']}"
+        package_refs.append(ref)
+        owned = [components_by_path.pop(ROOTFS_PREFIX + path)
+                 for path in owned_files.get(package['name'], []) if ROOTFS_PREFIX + path in components_by_path]
+        component = {
+            'type': 'library' if package['name'].startswith(('lib', 'kmod-')) else 'application',
+            'bom-ref': ref,
+            'name': package['name'],
+            'version': package['version'],
+        }
+        if package.get('architecture'):
+            component['properties'] = [{'name': 'firmaforge:architecture', 'value': package['architecture']}]
+        if owned:
+            component['components'] = owned
+        components.append(component)
+
+    # files no package claims (configuration, generated files, kernel images)
+    components.extend(components_by_path[path] for path in sorted(components_by_path))
+
+    firmware = {'type': 'firmware', 'bom-ref': 'firmware', 'name': firmware_name}
+    if firmware_sha256:
+        firmware['hashes'] = [{'alg': 'SHA-256', 'content': firmware_sha256}]
+    dependencies.insert(0, {'ref': 'firmware', 'dependsOn': package_refs})
+
+    return {
+        'bomFormat': 'CycloneDX',
+        'specVersion': CYCLONEDX_SPEC_VERSION,
+        'serialNumber': f"urn:uuid:{uuid.uuid4()}",
+        'version': 1,
+        'metadata': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'tools': {'components': [{'type': 'application', 'name': 'firmaforge'}]},
+            'component': firmware,
+        },
+        'components': components,
+        'dependencies': dependencies,
+    }
+
+
+def write_sbom(document: Dict[str, Any], output_path: str) -> Dict[str, Any]:
+    """
+    Atomically writes an SBOM and returns its summary for the report.
+    """
+    write_atomic(output_path, json.dumps(document, separators=(',', ':')).encode())
+    files = sum(1 for c in document['components'] if c['type'] == 'file')
+    files += sum(len(c.get('components', [])) for c in document['components'])
+    return {
+        'path': output_path,
+        'format': f"CycloneDX {document['specVersion']}",
+        'packages': sum(1 for c in document['components'] if c['type'] in ('library', 'application')),
+        'files': files,
+        'elf_dependencies': len(document['dependencies']) - 1,
+    }
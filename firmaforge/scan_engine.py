@@ -0,0 +1,254 @@
+"""
+scan_engine.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A text scanning module that compiles patterns for the linear-time RE2
+backend when it is installed and accepts them, and bounds how long a
+pass spends on each file and on the whole image. Files that run out of
+time are abandoned and listed in the pass's report instead of stalling
+the worker. Outside the main thread, where no timer signal can
+interrupt a match, large files are skipped and backtracking patterns
+run on smaller chunks.
+"""
+
+import re
+import signal
+import threading
+import time
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+DEFAULT_FILE_BUDGET_S = 5.0
+DEFAULT_IMAGE_BUDGET_S = 300.0
+
+# text is matched in newline-aligned chunks so deadlines are checked between them;
+# each chunk also sees the next SCAN_OVERLAP_CHARS so matches crossing into it are found
+SCAN_CHUNK_CHARS = 64 * 1024
+SCAN_OVERLAP_CHARS = 16 * 1024
+MATCHES_PER_CHECK = 256
+
+# without a timer signal only the chunk size bounds a backtracking match
+UNGUARDED_CHUNK_CHARS = 4 * 1024
+UNGUARDED_MAX_CHARS = 1024 * 1024
+
+# inline flags RE2 understands for the re flags patterns are compiled with
+RE2_FLAGS = ((re.IGNORECASE, 'i'), (re.MULTILINE, 'm'), (re.DOTALL, 's'))
+
+
+# derives from BaseException so per-file "except Exception" handlers in
+# the analyzers do not swallow it before the budget records the file
+class ScanTimeout(BaseException):
+    """Raised inside a file scan when its time budget runs out."""
+
+
+class ScanPattern:
+    """
+    Module containing functions for matching one pattern with RE2 when
+    it accepts the pattern, and with re otherwise.
+    """
+
+    def __init__(self, pattern: str, flags: int = 0):
+        """
+        Compiles the pattern.
+
+        Args:
+            pattern: Regular expression in re syntax
+            flags: re flags; only IGNORECASE, MULTILINE and DOTALL can be passed to RE2
+        """
+        self.pattern = pattern
+        self.regex = re.compile(pattern, flags)
+        self.backend = 're'
+        supported = 0
+        for flag, _ in RE2_FLAGS:
+            supported |= flag
+        if re2 is not None and not flags & ~supported:
+            inline = ''.join(letter for flag, letter in RE2_FLAGS if flags & flag)
+            try:
+                self.regex = re2.compile(f"(?{inline}){pattern}" if inline else pattern)
+                self.backend = 're2'
+            except re2.error:
+                # backreferences and lookarounds need the backtracking engine
+                pass
+
+    @property
+    def linear(self) -> bool:
+        """Returns True if matching runs in linear time."""
+        return self.backend == 're2'
+
+    def finditer(self, text: str, pos: int = 0, endpos: Optional[int] = None) -> Iterator[Any]:
+        """
+        Iterates over non-overlapping matches in text[pos:endpos].
+        """
+        return self.regex.finditer(text, pos, len(text) if endpos is None else endpos)
+
+
+class ScanBudget:
+    """
+    Module containing functions for bounding the time a pass spends
+    per file and per image.
+    """
+
+    def __init__(self, pass_name: str, file_budget_s: float = DEFAULT_FILE_BUDGET_S,
+                 image_budget_s: float = DEFAULT_IMAGE_BUDGET_S):
+        """
+        Starts the image budget.
+
+        In the main thread a running file scan is interrupted by a timer
+        signal, even inside a single regex match. Elsewhere deadlines are
+        checked between chunks and matches, files over UNGUARDED_MAX_CHARS
+        are not scanned, and backtracking patterns get smaller chunks.
+
+        Args:
+            pass_name: Name of the pass, for the report
+            file_budget_s: Wall-clock seconds allowed per file
+            image_budget_s: Wall-clock seconds allowed for all files of the image
+        """
+        self.pass_name = pass_name
+        self.file_budget_s = file_budget_s
+        self.image_budget_s = image_budget_s
+        self.image_deadline = time.monotonic() + image_budget_s
+        self.timed_out: List[Dict[str, Any]] = []
+        self.oversized: List[Dict[str, Any]] = []
+        self.skipped = 0
+        self.backends: Dict[str, str] = {}
+        self.deadline: Optional[float] = None
+        self.guarded = False
+        self._armed = False
+        self._saved_handler = None
+
+    def exhausted(self) -> bool:
+        """
+        Checks whether the image budget is spent; files after that are
+        counted as skipped by the caller.
+        """
+        return time.monotonic() >= self.image_deadline
+
+    def check(self) -> None:
+        """
+        Raises ScanTimeout if the current file is past its deadline.
+        """
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise ScanTimeout(self.pass_name)
+
+    def _on_alarm(self, signum: int, frame: Any) -> None:
+        # the timer is one-shot, so the scan is interrupted at most once
+        if self._armed:
+            self._armed = False
+            raise ScanTimeout(self.pass_name)
+
+    def _arm(self, seconds: float) -> bool:
+        """
+        Starts a one-shot timer signal if this thread may own SIGALRM and nobody else uses it.
+
+        Returns:
+            True if the timer was started
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return False
+        if signal.getsignal(signal.SIGALRM) not in (signal.SIG_DFL, signal.SIG_IGN, None) \
+                or signal.getitimer(signal.ITIMER_REAL)[0]:
+            return False
+        self._saved_handler = signal.signal(signal.SIGALRM, self._on_alarm) or signal.SIG_DFL
+        self._armed = True
+        signal.setitimer(signal.ITIMER_REAL, max(seconds, 0.001))
+        return True
+
+    def _disarm(self) -> None:
+        """Stops the timer signal and restores the previous handler."""
+        if self._saved_handler is None:
+            return
+        self._armed = False
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, self._saved_handler)
+        self._saved_handler = None
+
+    def run(self, rel_path: str, func: Callable[..., Any], *args: Any, size: int = 0) -> Tuple[bool, Any]:
+        """
+        Runs one file's scan under the budget.
+
+        Args:
+            rel_path: File being scanned, for the report
+            func: Scan function; partial results of an abandoned scan are discarded
+            *args: Arguments for func
+            size: Characters the scan reads, checked when no timer signal is available
+
+        Returns:
+            (True, result) if the scan finished, (False, None) if it ran out of time
+            or was too large to scan without a timer signal
+        """
+        start = time.monotonic()
+        self.deadline = min(start + self.file_budget_s, self.image_deadline)
+        try:
+            try:
+                self.guarded = self._arm(self.deadline - start)
+                if not self.guarded and size > UNGUARDED_MAX_CHARS:
+                    self.oversized.append({'file': rel_path, 'chars': size})
+                    return False, None
+                result = func(*args)
+                # without a timer the last chunk may have run past the deadline
+                self.check()
+            finally:
+                self._disarm()
+        except ScanTimeout:
+            # the alarm may have cut the disarm above short; it cannot fire again
+            self._disarm()
+            self.timed_out.append({'file': rel_path, 'elapsed_s': round(time.monotonic() - start, 3)})
+            return False, None
+        finally:
+            self.deadline = None
+            self.guarded = False
+        return True, result
+
+    def finditer(self, pattern: ScanPattern, text: str) -> Iterator[Any]:
+        """
+        Iterates over a pattern's matches in newline-aligned chunks,
+        checking the deadline between chunks and every few matches.
+
+        Each chunk is matched together with the text that follows it up
+        to SCAN_OVERLAP_CHARS, and only matches starting inside the chunk
+        are kept, so a match crossing a boundary is found once as long as
+        it is no longer than the overlap.
+        """
+        self.backends[pattern.pattern] = pattern.backend
+        chunk = SCAN_CHUNK_CHARS if self.guarded or pattern.linear else UNGUARDED_CHUNK_CHARS
+        overlap = min(chunk, SCAN_OVERLAP_CHARS)
+        pos, length = 0, len(text)
+        while pos < length:
+            self.check()
+            end = self._line_end(text, pos + chunk)
+            next_pos = end
+            for count, match in enumerate(pattern.finditer(text, pos, self._line_end(text, end + overlap)), 1):
+                if match.start() >= end:
+                    break
+                yield match
+                # the next chunk resumes after a match that ran into it, as one unchunked scan would
+                next_pos = max(next_pos, match.end())
+                if count % MATCHES_PER_CHECK == 0:
+                    self.check()
+            pos = next_pos if next_pos > pos else end
+
+    @staticmethod
+    def _line_end(text: str, pos: int) -> int:
+        """Returns the index after the first newline at or past pos, or the text length."""
+        if pos >= len(text):
+            return len(text)
+        return text.find('\n', pos) + 1 or len(text)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Returns the budget settings and the files that ran out of time.
+        """
+        return {
+            'file_budget_s': self.file_budget_s,
+            'image_budget_s': self.image_budget_s,
+            'regex_backends': dict(self.backends),
+            'timed_out_files': list(self.timed_out),
+            'oversized_files': list(self.oversized),
+            'skipped_files': self.skipped,
+        }
@@ -0,0 +1,671 @@
+"""
+script_tokenizer.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A script analysis module with small single-pass tokenizers for shell,
+Lua and ucode. Command execution sinks, request parameter sources and
+assignments are found on the token stream, and request data is traced
+through the assignments of a file to the sinks it reaches.
+"""
+
+import bisect
+import re
+from pathlib import PurePosixPath
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+# (kind, text, start offset, end offset)
+Token = Tuple[str, str, int, int]
+
+SH = 'sh'
+LUA = 'lua'
+UCODE = 'ucode'
+
+SHELLS = {'sh', 'ash', 'bash', 'dash'}
+SUFFIX_LANGUAGES = {'.sh': SH, '.cgi': SH, '.lua': LUA, '.uc': UCODE, '.ut': UCODE}
+LUA_TEMPLATE_SUFFIXES = ('.htm', '.html')
+LUA_DIRS = ('usr/lib/lua/',)
+UCODE_DIRS = ('usr/share/ucode/', 'usr/share/rpcd/ucode/')
+
+# substrings a file must contain to be worth tokenizing
+SINK_HINTS = {
+    SH: ('eval', '-c'),
+    LUA: ('execute', 'popen', 'exec', '.call', 'sysauth'),
+    UCODE: ('system', 'popen', 'sysauth'),
+}
+
+LUA_SINKS = ('os.execute', 'io.popen', 'sys.exec', 'sys.call', 'util.exec', 'util.execi',
+             'nixio.exec', 'nixio.execp', 'nixio.exece')
+UCODE_SINKS = {'system', 'popen'}
+SINK_NAMES = {LUA: {sink.rsplit('.', 1)[1] for sink in LUA_SINKS}, UCODE: UCODE_SINKS}
+LUA_DISPATCH_TARGETS = {'call', 'post', 'post_on'}
+
+# request data: luci.http accessors, rpcd call arguments and CGI variables
+HTTP_SOURCE_CALLS = {'formvalue', 'formvaluetable', 'content', 'getcookie'}
+CGI_SOURCE_VARS = {'QUERY_STRING', 'REQUEST_URI', 'PATH_INFO', 'HTTP_COOKIE'}
+CGI_SOURCE_PREFIX = 'HTTP_'
+SOURCE_NAMES = HTTP_SOURCE_CALLS | {'args', 'getenv'}
+
+# calls whose result cannot carry shell metacharacters
+SANITIZERS = {
+    LUA: {'shellquote', 'tonumber'},
+    UCODE: {'shellquote', 'int', 'length', 'type', 'localtime', 'gmtime', 'timelocal'},
+}
+
+KEYWORDS = {
+    LUA: {'and', 'break', 'do', 'else', 'elseif', 'end', 'false', 'for', 'function', 'goto', 'if', 'in',
+          'local', 'nil', 'not', 'or', 'repeat', 'return', 'then', 'true', 'until', 'while'},
+    UCODE: {'break', 'case', 'catch', 'const', 'continue', 'default', 'delete', 'elif', 'else', 'endfor',
+            'endfunction', 'endif', 'endwhile', 'export', 'false', 'for', 'from', 'function', 'if', 'import',
+            'in', 'let', 'null', 'return', 'switch', 'this', 'true', 'try', 'while'},
+}
+DECLARATIONS = {LUA: {'local'}, UCODE: {'let', 'const', 'var'}}
+REGEX_KEYWORDS = {'return', 'typeof', 'case', 'in', 'delete', 'else', 'do'}
+
+# leading whitespace is part of each match so it costs no iteration of its own
+LUA_TOKEN = re.compile(r"""
+    [ \t\r\f]*
+    (?:(?P<nl>\n)
+    |(?P<comment>--\[(?P<ceq>=*)\[.*?\](?P=ceq)\]|--[^\n]*)
+    |(?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*'|\[(?P<seq>=*)\[.*?\](?P=seq)\])
+    |(?P<number>0[xX][0-9a-fA-F]+|\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)
+    |(?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    |(?P<op>\.\.\.?|==|~=|<=|>=|::|//|<<|>>|[^ \t\r\f]))
+""", re.S | re.X)
+
+UCODE_TOKEN = re.compile(r"""
+    [ \t\r\f]*
+    (?:(?P<nl>\n)
+    |(?P<comment>//[^\n]*|/\*.*?\*/)
+    |(?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    |(?P<template>`)
+    |(?P<number>0[xX][0-9a-fA-F]+|\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)
+    |(?P<name>[A-Za-z_$][A-Za-z0-9_$]*)
+    |(?P<op>\.\.\.|\?\.|===|!==|==|!=|<=|>=|&&|\|\||\?\?|=>|\+\+|--|[-+*/%&|^]=|[^ \t\r\f]))
+""", re.S | re.X)
+
+SH_TOKEN = re.compile(r"""
+    (?:[ \t\r\f]|\\\n)*
+    (?:(?P<nl>\n)
+    |(?P<comment>\#[^\n]*)
+    |(?P<sq>'[^']*')
+    |(?P<dq>"(?:[^"\\]|\\.)*")
+    |(?P<bt>`(?:[^`\\]|\\.)*`)
+    |(?P<subst>\$\(\(?)
+    |(?P<var>\$\{[^}\n]*\}|\$[A-Za-z_][A-Za-z0-9_]*|\$[0-9\#?$!@*-])
+    |(?P<op>;;|&&|\|\||>>|<<-?|[;&|()<>])
+    |(?P<word>(?:[^\s'"`;&|()<>$\\]|\\.)+|[^ \t\r\f]))
+""", re.S | re.X)
+
+REGEX_LITERAL = re.compile(r'/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[gisu]*')
+TEMPLATE_STOP = re.compile(r'\\.|`|\$\{', re.S)
+INTERPOLATION_STOP = re.compile(r'[{}]|"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|`(?:[^`\\]|\\.)*`', re.S)
+UCODE_TEMPLATE_BLOCK = re.compile(r'\{%[-+]?(.*?)[-+]?%\}|\{\{[-+]?(.*?)[-+]?\}\}', re.S)
+LUA_TEMPLATE_BLOCK = re.compile(r'<%(?!#)[=:+]?(.*?)-?%>', re.S)
+SH_VAR_REF = re.compile(r'\$(?:\{[#!]?([A-Za-z_][A-Za-z0-9_]*|[0-9]+)|([A-Za-z_][A-Za-z0-9_]*|[0-9]))')
+SH_ASSIGNMENT = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)=')
+
+
+def detect_language(rel_path: str, head: str) -> Optional[str]:
+    """
+    Picks the tokenizer for a file from its shebang, suffix or location.
+
+    Args:
+        rel_path: Path relative to the rootfs
+        head: First bytes of the file as text
+
+    Returns:
+        'sh', 'lua', 'ucode', or None for files none of them handles
+    """
+    if head.startswith('#!'):
+        for word in head[2:].split('\n', 1)[0].split():
+            name = word.rsplit('/', 1)[-1]
+            if name.startswith('lua'):
+                return LUA
+            if name == 'ucode':
+                return UCODE
+            if name in SHELLS:
+                return SH
+        return None
+    rel_path = rel_path.replace('\\', '/')
+    suffix = PurePosixPath(rel_path).suffix.lower()
+    if suffix in SUFFIX_LANGUAGES:
+        return SUFFIX_LANGUAGES[suffix]
+    if suffix in LUA_TEMPLATE_SUFFIXES and rel_path.startswith(LUA_DIRS):
+        return LUA
+    if rel_path.startswith(UCODE_DIRS):
+        return UCODE
+    if rel_path.startswith(LUA_DIRS) and not suffix:
+        return LUA
+    return None
+
+
+def is_template(rel_path: str, text: str, language: str) -> bool:
+    """Checks whether a file is a ucode or LuCI Lua template rather than plain code."""
+    suffix = PurePosixPath(rel_path).suffix.lower()
+    if language == UCODE:
+        return suffix == '.ut' or text.lstrip().startswith(('{%', '{{', '{#'))
+    return language == LUA and suffix in LUA_TEMPLATE_SUFFIXES
+
+
+def _scan_template(text: str, pos: int, end: int) -> Tuple[List[Tuple[int, int]], int]:
+    """Returns the spans of a ucode template literal's ${...} expressions and the offset after it."""
+    spans = []
+    i = pos + 1
+    while True:
+        m = TEMPLATE_STOP.search(text, i, end)
+        if m is None:
+            return spans, end
+        if m.group() == '`':
+            return spans, m.end()
+        if m.group() != '${':
+            i = m.end()
+            continue
+        depth, j = 1, m.end()
+        while depth:
+            inner = INTERPOLATION_STOP.search(text, j, end)
+            if inner is None:
+                return spans, end
+            j = inner.end()
+            if inner.group() == '{':
+                depth += 1
+            elif inner.group() == '}':
+                depth -= 1
+        spans.append((m.end(), j - 1))
+        i = j
+
+
+def _regex_allowed(tokens: List[Token]) -> bool:
+    """Checks whether a '/' after these tokens starts a ucode regex literal rather than a division."""
+    for kind, text, _, _ in reversed(tokens):
+        if kind == 'nl':
+            continue
+        if kind == 'name':
+            return text in REGEX_KEYWORDS
+        return kind == 'op' and text not in (')', ']', '}')
+    return True
+
+
+def _tokenize_code(text: str, language: str, pos: int, end: int, tokens: List[Token]) -> None:
+    """Appends the Lua or ucode tokens of text[pos:end], dropping whitespace and comments."""
+    pattern = LUA_TOKEN if language == LUA else UCODE_TOKEN
+    append = tokens.append
+    while pos < end:
+        # template and regex literals need the scanner to resume past them
+        for m in pattern.finditer(text, pos, end):
+            kind = m.lastgroup
+            start = m.start(kind)
+            if kind == 'template':
+                spans, pos = _scan_template(text, start, end)
+                append(('string', text[start:pos], start, pos))
+                # interpolated expressions follow the literal as parenthesized tokens
+                for first, last in spans:
+                    append(('op', '(', first, first))
+                    _tokenize_code(text, language, first, last, tokens)
+                    append(('op', ')', last, last))
+                break
+            if kind == 'op' and language == UCODE and text[start] == '/' and _regex_allowed(tokens):
+                literal = REGEX_LITERAL.match(text, start, end)
+                if literal is not None:
+                    pos = literal.end()
+                    append(('string', literal.group(), start, pos))
+                    break
+            if kind != 'comment':
+                append((kind, m.group(kind), start, m.end()))
+        else:
+            return
+
+
+def _tokenize_sh(text: str, pos: int, end: int, tokens: List[Token]) -> None:
+    """
+    Appends the shell tokens of text[pos:end]. A backtick substitution is
+    emitted like '$(' ... ')', and here-document bodies become one token.
+    """
+    heredocs = []
+    while pos < end:
+        # here-document bodies need the scanner to resume past them
+        for m in SH_TOKEN.finditer(text, pos, end):
+            kind = m.lastgroup
+            start, stop = m.start(kind), m.end()
+            if kind == 'bt':
+                tokens.append(('subst', '`', start, start + 1))
+                _tokenize_sh(text, start + 1, stop - 1, tokens)
+                tokens.append(('op', ')', stop - 1, stop))
+            elif kind == 'nl' and heredocs:
+                tokens.append(('nl', '\n', start, stop))
+                for delimiter, strip_tabs in heredocs:
+                    quoted = delimiter[:1] in ('"', "'")
+                    delimiter = delimiter.strip('"\'')
+                    terminator = re.compile('^' + ('\t*' if strip_tabs else '') + re.escape(delimiter) + '[ \t]*$',
+                                            re.M)
+                    found = terminator.search(text, stop, end)
+                    body_end = found.start() if found else end
+                    tokens.append(('sq' if quoted else 'heredoc', text[stop:body_end], stop, body_end))
+                    stop = found.end() if found else end
+                heredocs = []
+                pos = stop
+                break
+            elif kind != 'comment':
+                if tokens and tokens[-1][0] == 'op' and tokens[-1][1].startswith('<<') and kind in ('word', 'sq', 'dq'):
+                    heredocs.append((m.group(kind), tokens[-1][1] == '<<-'))
+                tokens.append((kind, m.group(kind), start, stop))
+        else:
+            return
+
+
+def tokenize(text: str, language: str, template: bool = False) -> List[Token]:
+    """
+    Tokenizes a script in one pass.
+
+    Args:
+        text: Script source
+        language: 'sh', 'lua' or 'ucode'
+        template: Tokenize only the code blocks of a ucode or LuCI Lua template
+
+    Returns:
+        List of (kind, text, start, end) tokens
+    """
+    tokens: List[Token] = []
+    if language == SH:
+        _tokenize_sh(text, 0, len(text), tokens)
+    elif template:
+        blocks = UCODE_TEMPLATE_BLOCK if language == UCODE else LUA_TEMPLATE_BLOCK
+        for m in blocks.finditer(text):
+            group = 1 if m.start(1) >= 0 else 2
+            _tokenize_code(text, language, m.start(group), m.end(group), tokens)
+            tokens.append(('nl', '', m.end(), m.end()))
+    else:
+        _tokenize_code(text, language, 0, len(text), tokens)
+    return tokens
+
+
+def _string_value(token: Token) -> Optional[str]:
+    """Returns the contents of a plain quoted string token."""
+    if token[0] != 'string' or token[1][:1] not in ('"', "'"):
+        return None
+    return token[1][1:-1]
+
+
+def _is_cgi_source(name: str) -> bool:
+    """Checks whether a CGI environment variable carries request data."""
+    return name in CGI_SOURCE_VARS or name.startswith(CGI_SOURCE_PREFIX)
+
+
+def _matching_parens(tokens: List[Token]) -> Dict[int, int]:
+    """Maps the index of each '(' to the index of its ')'."""
+    matches, stack = {}, []
+    for i, (kind, text, _, _) in enumerate(tokens):
+        if kind == 'op' and text == '(':
+            stack.append(i)
+        elif kind == 'op' and text == ')' and stack:
+            matches[stack.pop()] = i
+    return matches
+
+
+def _chain(tokens: List[Token], i: int) -> List[str]:
+    """Returns the dotted name ending at token i, e.g. ['luci', 'sys', 'exec']."""
+    parts = [tokens[i][1]]
+    while i >= 2 and tokens[i - 1][0] == 'op' and tokens[i - 1][1] in ('.', '?.', ':') and tokens[i - 2][0] == 'name':
+        i -= 2
+        parts.append(tokens[i][1])
+    parts.reverse()
+    return parts
+
+
+def _code_sink(language: str, parts: List[str]) -> Optional[str]:
+    """Returns the sink a called name refers to, if any."""
+    if language == UCODE:
+        return parts[-1] if parts[-1] in UCODE_SINKS else None
+    chain = '.'.join(parts)
+    for sink in LUA_SINKS:
+        if chain == sink or chain.endswith('.' + sink):
+            return sink
+    return None
+
+
+def _code_source(tokens: List[Token], i: int, language: str) -> Optional[str]:
+    """Returns a label if token i reads request data."""
+    kind, text, _, _ = tokens[i]
+    if kind != 'name':
+        return None
+    follows = tokens[i + 1] if i + 1 < len(tokens) else None
+    member = i > 0 and tokens[i - 1][0] == 'op' and tokens[i - 1][1] in ('.', '?.')
+    if language == UCODE and text == 'args' and member and i >= 2 and tokens[i - 2][0] == 'name':
+        return f"{tokens[i - 2][1]}.args"
+    if follows is None or follows[1] != '(':
+        return None
+    parts = _chain(tokens, i)
+    if text in HTTP_SOURCE_CALLS and 'http' in parts[:-1]:
+        return '.'.join(parts[-2:])
+    if text == 'getenv' and i + 2 < len(tokens):
+        variable = _string_value(tokens[i + 2])
+        if variable and _is_cgi_source(variable):
+            return f"getenv({variable})"
+    return None
+
+
+def _expression_end(tokens: List[Token], pos: int) -> int:
+    """Returns the index just past the expression starting at pos."""
+    depth = 0
+    for i in range(pos, len(tokens)):
+        kind, text, _, _ = tokens[i]
+        if kind == 'op':
+            if text in ('(', '[', '{'):
+                depth += 1
+            elif text in (')', ']', '}'):
+                depth -= 1
+                if depth < 0:
+                    return i
+            elif text == ';' and depth == 0:
+                return i
+        elif kind == 'nl' and depth == 0 and i > pos:
+            previous = tokens[i - 1]
+            # a line ending in an operator continues on the next line
+            if previous[0] != 'op' or previous[1] in (')', ']', '}'):
+                return i
+    return len(tokens)
+
+
+def _code_assignments(tokens: List[Token], language: str) -> List[Tuple[Set[str], int, int]]:
+    """Returns (target names, expression start, expression end) of each assignment."""
+    assignments = []
+    declarations = DECLARATIONS[language]
+    for i, (kind, text, _, _) in enumerate(tokens):
+        if kind == 'op' and text == '=':
+            previous = tokens[i - 1] if i else None
+            if previous is None or previous[0] != 'name':
+                continue
+            if i >= 2 and tokens[i - 2][0] == 'op' and tokens[i - 2][1] in ('.', '?.', ':'):
+                continue
+            assignments.append(({previous[1]}, i + 1, _expression_end(tokens, i + 1)))
+        elif kind == 'name' and text in declarations:
+            # 'local a, b = ...' and 'let { a, b } = ...' assign every name before '='
+            targets, j = set(), i + 1
+            while j < len(tokens) and tokens[j][0] != 'nl' and tokens[j][1] not in ('=', ';', 'function'):
+                if tokens[j][0] == 'name':
+                    targets.add(tokens[j][1])
+                j += 1
+            # a single plain name is already covered by the '=' branch
+            if j < len(tokens) and tokens[j][1] == '=' and (len(targets) > 1 or tokens[j - 1][0] != 'name'):
+                assignments.append((targets, j + 1, _expression_end(tokens, j + 1)))
+    return assignments
+
+
+def _dispatched_parameters(tokens: List[Token], parens: Dict[int, int]) -> Set[str]:
+    """Returns the parameters of LuCI controller actions, which receive URL path segments."""
+    actions = set()
+    for i, (kind, text, _, _) in enumerate(tokens):
+        if kind == 'name' and text in LUA_DISPATCH_TARGETS and i + 1 in parens:
+            for j in range(i + 2, parens[i + 1]):
+                value = _string_value(tokens[j])
+                if value:
+                    actions.add(value)
+    parameters = set()
+    if not actions:
+        return parameters
+    for i, (kind, text, _, _) in enumerate(tokens):
+        if kind == 'name' and text == 'function' and i + 2 < len(tokens) and tokens[i + 1][1] in actions \
+                and i + 2 in parens:
+            parameters.update(t[1] for t in tokens[i + 3:parens[i + 2]] if t[0] == 'name')
+    return parameters
+
+
+def _line_of(newlines: List[int], offset: int) -> int:
+    """Returns the 1-based line number of an offset."""
+    return bisect.bisect_left(newlines, offset) + 1
+
+
+def _finding(text: str, newlines: List[int], offset: int, **fields: Any) -> Dict[str, Any]:
+    """Builds a finding with the line number and text of the line it is on."""
+    line = _line_of(newlines, offset)
+    start = newlines[line - 2] + 1 if line > 1 else 0
+    stop = newlines[line - 1] if line - 1 < len(newlines) else len(text)
+    finding = {'line': line, 'context': text[start:min(stop, start + 400)].strip()[:200]}
+    finding.update(fields)
+    return finding
+
+
+def _analyze_code(text: str, tokens: List[Token], language: str) -> List[Dict[str, Any]]:
+    """Finds sinks, their taint and unauthenticated endpoints in Lua or ucode tokens."""
+    parens = _matching_parens(tokens)
+    sanitizers = SANITIZERS[language]
+    keywords = KEYWORDS[language]
+    sink_names = SINK_NAMES[language]
+
+    sources: Dict[int, str] = {}
+    clean = [False] * len(tokens)
+    for i, (kind, name, _, _) in enumerate(tokens):
+        if kind != 'name':
+            continue
+        if name in SOURCE_NAMES:
+            label = _code_source(tokens, i, language)
+            if label is not None:
+                sources[i] = label
+        elif name in sanitizers and i + 1 in parens:
+            first = i - 2 * (len(_chain(tokens, i)) - 1)
+            for j in range(first, parens[i + 1] + 1):
+                clean[j] = True
+
+    def is_variable(i: int) -> bool:
+        kind, name, _, _ = tokens[i]
+        if kind != 'name' or name in keywords:
+            return False
+        previous = tokens[i - 1][1] if i else ''
+        if previous in ('.', '?.', ':') and tokens[i - 1][0] == 'op':
+            return False
+        follows = tokens[i + 1][1] if i + 1 < len(tokens) else ''
+        return follows != '(' and not (follows == ':' and previous in ('{', ','))
+
+    tainted: Dict[str, str] = {}
+    if language == LUA:
+        for parameter in _dispatched_parameters(tokens, parens):
+            tainted[parameter] = 'dispatcher arguments'
+
+    def taint_of(start: int, end: int) -> List[str]:
+        labels = set()
+        for i in range(start, end):
+            if clean[i]:
+                continue
+            if i in sources:
+                labels.add(sources[i])
+            elif tokens[i][1] in tainted and is_variable(i):
+                labels.add(tainted[tokens[i][1]])
+        return sorted(labels)
+
+    assignments = _code_assignments(tokens, language) if sources or tainted else None
+    changed = bool(assignments)
+    while changed:
+        changed = False
+        for targets, start, end in assignments:
+            if targets.issubset(tainted):
+                continue
+            labels = taint_of(start, end)
+            if labels:
+                for target in targets:
+                    tainted.setdefault(target, labels[0])
+                changed = True
+
+    safe: Optional[Set[str]] = None
+    newlines = [m.start() for m in re.finditer('\n', text)]
+    findings = []
+    for i, (kind, name, offset, _) in enumerate(tokens):
+        if kind != 'name':
+            continue
+        if name == 'sysauth' and i + 2 < len(tokens) and tokens[i + 1][1] in ('=', ':') and tokens[i + 2][1] == 'false':
+            findings.append(_finding(text, newlines, offset, kind='endpoint', sink='sysauth', confidence='medium'))
+            continue
+        if name not in sink_names or i + 1 not in parens:
+            continue
+        sink = _code_sink(language, _chain(tokens, i))
+        if sink is None:
+            continue
+        start, end = i + 2, parens[i + 1]
+        labels = taint_of(start, end)
+        if labels:
+            findings.append(_finding(text, newlines, offset, kind='injection', sink=sink, sources=labels,
+                                     confidence='high'))
+            continue
+        dynamic = [j for j in range(start, end) if not clean[j] and (is_variable(j) or j in sources)]
+        if dynamic or any(clean[start:end]):
+            if safe is None:
+                # names only ever assigned literals or sanitized values
+                if assignments is None:
+                    assignments = _code_assignments(tokens, language)
+                assigned, unsafe = set(), set()
+                for targets, first, last in assignments:
+                    assigned |= targets
+                    if any(not clean[j] and (is_variable(j) or j in sources) for j in range(first, last)):
+                        unsafe |= targets
+                safe = assigned - unsafe
+            confidence = 'low' if all(tokens[j][1] in safe for j in dynamic) else 'medium'
+            findings.append(_finding(text, newlines, offset, kind='dynamic', sink=sink, confidence=confidence))
+    return findings
+
+
+def _sh_references(token: Token) -> List[str]:
+    """Returns the variables a shell token expands."""
+    kind, text, _, _ = token
+    if kind in ('var', 'dq', 'heredoc'):
+        return [a or b for a, b in SH_VAR_REF.findall(text)]
+    return []
+
+
+def _sh_commands(tokens: List[Token]) -> List[List[List[int]]]:
+    """Splits shell tokens into simple commands of words (lists of token indices)."""
+    commands, words = [], []
+    skip_word = False
+    for i, (kind, text, start, _) in enumerate(tokens):
+        if kind == 'op' and text in ('<', '>', '>>', '<<', '<<-'):
+            skip_word = True
+            continue
+        if kind in ('nl', 'subst') or (kind == 'op' and text not in ('<', '>', '>>')):
+            if words:
+                commands.append(words)
+            words = []
+            continue
+        if words and tokens[i - 1][3] == start and tokens[i - 1][0] not in ('op', 'nl', 'subst'):
+            words[-1].append(i)
+        elif skip_word:
+            skip_word = False
+        else:
+            words.append([i])
+    if words:
+        commands.append(words)
+    return commands
+
+
+def _analyze_sh(text: str, tokens: List[Token]) -> List[Dict[str, Any]]:
+    """Finds eval and 'sh -c' sinks and their taint in shell tokens."""
+    # variable assignments and the variables their values expand
+    assignments: List[Tuple[str, Set[str]]] = []
+    for i, (kind, word, start, _) in enumerate(tokens):
+        if kind != 'word' or (i and tokens[i - 1][3] == start and tokens[i - 1][0] not in ('op', 'nl', 'subst')):
+            continue
+        m = SH_ASSIGNMENT.match(word)
+        if m is None:
+            continue
+        references: Set[str] = set()
+        depth, j = 0, i + 1
+        while j < len(tokens) and (depth > 0 or (tokens[j][2] == tokens[j - 1][3] and tokens[j][0] != 'nl')):
+            if tokens[j][0] == 'subst':
+                depth += tokens[j][1].count('(') or 1
+            elif tokens[j][0] == 'op' and tokens[j][1] == ')':
+                depth -= 1
+            elif tokens[j][0] == 'op' and tokens[j][1] == '(':
+                depth += 1
+            elif depth == 0 and tokens[j][0] == 'op':
+                break
+            references.update(_sh_references(tokens[j]))
+            j += 1
+        assignments.append((m.group(1), references))
+
+    tainted: Dict[str, str] = {}
+    commands = _sh_commands(tokens)
+    for words in commands:
+        name = ''.join(tokens[t][1] for t in words[0])
+        arguments = [''.join(tokens[t][1] for t in word) for word in words[1:]]
+        if name in ('json_get_var', 'json_get_vars'):
+            # rpcd exec plugins read their call arguments from JSON on stdin
+            targets = arguments[:1] if name == 'json_get_var' else arguments
+            for target in targets:
+                tainted[target.split(':', 1)[0]] = 'rpcd call arguments'
+        elif name == 'read' and any('CONTENT_LENGTH' in argument for argument in arguments):
+            for target in arguments:
+                if SH_ASSIGNMENT.fullmatch(target + '='):
+                    tainted[target] = 'request body'
+
+    def source_of(variable: str) -> Optional[str]:
+        if variable in tainted:
+            return tainted[variable]
+        return variable if _is_cgi_source(variable) else None
+
+    changed = True
+    while changed:
+        changed = False
+        for target, references in assignments:
+            if target in tainted:
+                continue
+            labels = [source_of(v) for v in references if source_of(v)]
+            if labels:
+                tainted[target] = labels[0]
+                changed = True
+
+    newlines = [m.start() for m in re.finditer('\n', text)]
+    findings = []
+    for words in commands:
+        names = [''.join(tokens[t][1] for t in word) for word in words]
+        # skip leading assignments and builtins that run the next word
+        first = 0
+        while first < len(words) and (names[first] in ('local', 'export', 'command', 'exec')
+                                      or (tokens[words[first][0]][0] == 'word'
+                                          and SH_ASSIGNMENT.match(tokens[words[first][0]][1]))):
+            first += 1
+        if first == len(words):
+            continue
+        name = names[first]
+        arguments = words[first + 1:]
+        if name in SHELLS:
+            flags = names[first + 1:]
+            if '-c' not in flags:
+                continue
+            arguments = arguments[flags.index('-c') + 1:]
+            sink = f"{name} -c"
+        elif name == 'eval':
+            sink = 'eval'
+        else:
+            continue
+        indices = [t for word in arguments for t in word]
+        references = {v for t in indices for v in _sh_references(tokens[t])}
+        labels = sorted({source_of(v) for v in references if source_of(v)})
+        offset = tokens[words[0][0]][2]
+        if labels:
+            findings.append(_finding(text, newlines, offset, kind='injection', sink=sink, sources=labels,
+                                     confidence='high'))
+        elif references or any(tokens[t][0] == 'subst' or '$(' in tokens[t][1] or '`' in tokens[t][1]
+                               for t in indices if tokens[t][0] != 'sq'):
+            findings.append(_finding(text, newlines, offset, kind='dynamic', sink=sink, confidence='medium'))
+    return findings
+
+
+def analyze_script(text: str, language: str, template: bool = False) -> List[Dict[str, Any]]:
+    """
+    Finds command execution sinks in a script and traces request data to them.
+
+    Args:
+        text: Script source
+        language: 'sh', 'lua' or 'ucode'
+        template: The file is a ucode or LuCI Lua template
+
+    Returns:
+        Findings with 'kind' ('injection' for request data reaching a sink,
+        'dynamic' for a sink run with other non-literal data, 'endpoint' for
+        a LuCI node without authentication), 'sink', 'line', 'context',
+        'confidence' and, for injections, the 'sources' involved
+    """
+    if not any(hint in text for hint in SINK_HINTS[language]):
+        return []
+    tokens = tokenize(text, language, template)
+    if language == SH:
+        return _analyze_sh(text, tokens)
+    return _analyze_code(text, tokens, language)
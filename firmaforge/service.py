@@ -0,0 +1,467 @@
+"""
+service.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A resident analysis service module that keeps a pool of pre-warmed
+worker processes and exposes a local HTTP job API, over TCP or a Unix
+socket, for submitting, tracking, cancelling and fetching analyses.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socketserver
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Deque, Dict, Any, List, Optional
+
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_KEEP_FINISHED = 1000
+RETRY_AFTER_S = 30
+
+# analyze_firmware options clients may set; paths and output locations stay with the service
+ALLOWED_OPTIONS = {
+    'encoder', 'stream_findings', 'profile', 'archive_extracts',
+    'reuse_similar', 'baseline', 'extract_first', 'sbom',
+}
+
+
+class AdmissionError(Exception):
+    """Raised when a job is rejected; carries the HTTP status to return."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _warm_worker() -> None:
+    """
+    Imports the analysis stack once per worker so libmagic databases
+    are loaded and module-level regexes are compiled before any job runs.
+    """
+    import magic
+    from . import summarize_results, static_analyzer, detector  # noqa: F401
+    try:
+        magic.from_file(__file__)
+    except Exception:
+        pass
+
+
+def _run_job(firmware_path: str, results_dir: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs one analysis inside a worker process."""
+    from .summarize_results import analyze_firmware
+    return analyze_firmware(firmware_path, results_dir=results_dir, **options)
+
+
+class AnalysisService:
+    """
+    Module containing functions for queueing analyses onto a pool of
+    warm worker processes.
+    """
+
+    def __init__(self, results_dir: str = 'results', workers: int = DEFAULT_WORKERS,
+                 max_queue: int = DEFAULT_MAX_QUEUE, max_image_bytes: Optional[int] = None,
+                 allowed_dirs: Optional[List[str]] = None, results_db: Optional[str] = None,
+                 max_jobs_per_worker: Optional[int] = None):
+        """
+        Starts the worker pool.
+
+        Args:
+            results_dir: Directory analyses write their results to
+            workers: Number of worker processes
+            max_queue: Jobs allowed to wait beyond the running ones before submissions are refused
+            max_image_bytes: Optional size limit for submitted images
+            allowed_dirs: Optional directories submitted images must live under
+            results_db: Optional corpus SQLite database every report is stored in
+            max_jobs_per_worker: Optional number of jobs after which a worker is replaced
+        """
+        self.results_dir = str(results_dir)
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_image_bytes = max_image_bytes
+        self.allowed_dirs = [Path(d).resolve() for d in allowed_dirs] if allowed_dirs else None
+        self.results_db = results_db
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._queue: Deque[str] = deque()
+        self._running = 0
+        self._lock = threading.RLock()
+
+        self._pool_kwargs = {'max_workers': workers, 'mp_context': multiprocessing.get_context('spawn'),
+                             'initializer': _warm_worker}
+        if max_jobs_per_worker:
+            self._pool_kwargs['max_tasks_per_child'] = max_jobs_per_worker
+        self.pool_restarts = 0
+        self._start_pool()
+
+        # start every worker now rather than on the first submission
+        for future in self._warmups:
+            future.result()
+
+    def _start_pool(self) -> None:
+        """
+        Creates the worker pool and queues one warm-up task per worker,
+        which runs before any job submitted after it.
+        """
+        self.pool = ProcessPoolExecutor(**self._pool_kwargs)
+        self._warmups = [self.pool.submit(time.sleep, 0) for _ in range(self.workers)]
+
+    def _restart_pool(self, broken: ProcessPoolExecutor) -> None:
+        """
+        Replaces a pool broken by a worker that died (OOM kill, segfault);
+        its remaining jobs fail on their own through their futures.
+        """
+        with self._lock:
+            if self.pool is not broken:
+                return
+            print("WARNING: A worker process died; restarting the worker pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.pool_restarts += 1
+            self._start_pool()
+
+    def _allowed(self, path: Path, extra: Optional[List[Path]] = None) -> bool:
+        """Checks whether a resolved path lies under an allowed directory."""
+        if self.allowed_dirs is None:
+            return True
+        return any(d == path or d in path.parents for d in self.allowed_dirs + (extra or []))
+
+    def _admit(self, firmware_path: str, options: Dict[str, Any]) -> Path:
+        """
+        Validates a submission and returns the resolved image path.
+        """
+        unknown = set(options) - ALLOWED_OPTIONS
+        if unknown:
+            raise AdmissionError(400, f"Unsupported options: {', '.join(sorted(unknown))}")
+
+        path = Path(firmware_path).resolve()
+        if not self._allowed(path):
+            raise AdmissionError(403, f"{firmware_path} is outside the allowed directories")
+        if not path.is_file():
+            raise AdmissionError(404, f"{firmware_path} does not exist")
+        if "openwrt" not in path.stem.lower():
+            raise AdmissionError(422, f"{path.name} is not OpenWrt firmware")
+        if self.max_image_bytes is not None and path.stat().st_size > self.max_image_bytes:
+            raise AdmissionError(413, f"{path.name} exceeds the {self.max_image_bytes} byte limit")
+        if options.get('baseline') is not None:
+            # delta runs restore extracts into the baseline directory, so it is confined like the image
+            baseline = Path(str(options['baseline'])).resolve()
+            if not self._allowed(baseline, [Path(self.results_dir).resolve()]):
+                raise AdmissionError(403, f"{options['baseline']} is outside the allowed directories")
+            if not baseline.is_dir():
+                raise AdmissionError(404, f"{options['baseline']} does not exist")
+            options['baseline'] = str(baseline)
+        if len(self._queue) >= self.max_queue:
+            raise AdmissionError(503, "Queue is full")
+        return path
+
+    def submit(self, firmware_path: str, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Queues an analysis.
+
+        Args:
+            firmware_path: Path to the firmware image
+            options: Optional analyze_firmware keyword arguments from ALLOWED_OPTIONS
+
+        Returns:
+            Status of the new job
+
+        Raises:
+            AdmissionError: If the job is rejected
+        """
+        options = dict(options or {})
+        with self._lock:
+            path = self._admit(firmware_path, options)
+            if self.results_db:
+                options['results_db'] = self.results_db
+
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {
+                'id': job_id,
+                'firmware_path': str(path),
+                'options': options,
+                'state': 'queued',
+                'submitted_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'error': None,
+            }
+            self._queue.append(job_id)
+            self._evict_finished()
+            self._dispatch()
+            return self.status(job_id)
+
+    def _dispatch(self) -> None:
+        """Hands queued jobs to idle workers."""
+        while self._queue and self._running < self.workers:
+            job = self.jobs[self._queue.popleft()]
+            job['state'] = 'running'
+            job['started_at'] = time.time()
+            self._running += 1
+            pool = self.pool
+            try:
+                future = pool.submit(_run_job, job['firmware_path'], self.results_dir, job['options'])
+            except BrokenProcessPool:
+                # the pool broke before its failed futures were reported; replace it and retry once
+                self._restart_pool(pool)
+                pool = self.pool
+                future = pool.submit(_run_job, job['firmware_path'], self.results_dir, job['options'])
+            future.add_done_callback(lambda f, job_id=job['id'], pool=pool: self._finish(job_id, f, pool))
+
+    def _finish(self, job_id: str, future: Any, pool: Optional[ProcessPoolExecutor] = None) -> None:
+        """Records the outcome of a finished job and starts the next one."""
+        with self._lock:
+            self._running -= 1
+            job = self.jobs.get(job_id)
+            broken = False
+            if job is not None:
+                job['finished_at'] = time.time()
+                try:
+                    job['result'] = future.result()
+                    job['state'] = 'done'
+                except CancelledError:
+                    job['state'] = 'cancelled'
+                except BrokenProcessPool as e:
+                    job['state'] = 'failed'
+                    job['error'] = f"worker process died: {e}"
+                    broken = True
+                except Exception as e:
+                    job['state'] = 'failed'
+                    job['error'] = f"{type(e).__name__}: {e}"
+            if broken and pool is not None:
+                self._restart_pool(pool)
+            self._dispatch()
+
+    def _evict_finished(self) -> None:
+        """Drops the oldest finished jobs beyond the retention limit."""
+        finished = [j for j in self.jobs.values() if j['state'] in ('done', 'failed', 'cancelled')]
+        for job in sorted(finished, key=lambda j: j['finished_at'])[:max(0, len(finished) - DEFAULT_KEEP_FINISHED)]:
+            self.jobs.pop(job['id'], None)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns a job's status without its result, or None if unknown.
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            status = {k: v for k, v in job.items() if k != 'result'}
+            if job['state'] == 'queued':
+                status['queue_position'] = self._queue.index(job_id)
+            return status
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """
+        Returns the status of every tracked job, oldest first.
+        """
+        with self._lock:
+            ids = sorted(self.jobs, key=lambda i: self.jobs[i]['submitted_at'])
+            return [self.status(i) for i in ids]
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns a finished job's report, or None if it is not done.
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return job.get('result') if job and job['state'] == 'done' else None
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a job that is still queued.
+
+        Returns:
+            True if the job was cancelled
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job['state'] != 'queued':
+                return False
+            self._queue.remove(job_id)
+            job['state'] = 'cancelled'
+            job['finished_at'] = time.time()
+            return True
+
+    def health(self) -> Dict[str, Any]:
+        """
+        Returns worker and queue counters.
+        """
+        with self._lock:
+            states = [job['state'] for job in self.jobs.values()]
+        return {
+            'workers': self.workers,
+            'pool_restarts': self.pool_restarts,
+            'max_queue': self.max_queue,
+            'queued': states.count('queued'),
+            'running': states.count('running'),
+            'done': states.count('done'),
+            'failed': states.count('failed'),
+            'cancelled': states.count('cancelled'),
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Cancels queued jobs and stops the worker pool.
+        """
+        with self._lock:
+            for job_id in list(self._queue):
+                self.cancel(job_id)
+        self.pool.shutdown(wait=wait, cancel_futures=True)
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    Module containing functions for serving the job API.
+
+    POST /jobs, GET /jobs, GET /jobs/<id>, GET /jobs/<id>/result,
+    DELETE /jobs/<id> and GET /health.
+    """
+
+    service: AnalysisService = None
+
+    def _send(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        """Writes a JSON response."""
+        payload = json.dumps(body, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _parts(self) -> List[str]:
+        """Returns the request path split into segments."""
+        return [p for p in self.path.split('?', 1)[0].split('/') if p]
+
+    def do_GET(self) -> None:
+        parts = self._parts()
+        if parts == ['health']:
+            self._send(200, self.service.health())
+        elif parts == ['jobs']:
+            self._send(200, self.service.list_jobs())
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            status = self.service.status(parts[1])
+            self._send(200, status) if status else self._send(404, {'error': 'unknown job'})
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'result':
+            status = self.service.status(parts[1])
+            if status is None:
+                self._send(404, {'error': 'unknown job'})
+            elif status['state'] != 'done':
+                self._send(409, {'error': f"job is {status['state']}", 'state': status['state']})
+            else:
+                self._send(200, self.service.result(parts[1]))
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self) -> None:
+        if self._parts() != ['jobs']:
+            self._send(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            job = self.service.submit(body['firmware_path'], body.get('options'))
+        except AdmissionError as e:
+            headers = {'Retry-After': str(RETRY_AFTER_S)} if e.status == 503 else None
+            self._send(e.status, {'error': str(e)}, headers)
+            return
+        except (KeyError, ValueError, TypeError) as e:
+            self._send(400, {'error': f"invalid request: {e}"})
+            return
+        self._send(202, job, {'Location': f"/jobs/{job['id']}"})
+
+    def do_DELETE(self) -> None:
+        parts = self._parts()
+        if len(parts) != 2 or parts[0] != 'jobs':
+            self._send(404, {'error': 'not found'})
+            return
+        status = self.service.status(parts[1])
+        if status is None:
+            self._send(404, {'error': 'unknown job'})
+        elif self.service.cancel(parts[1]):
+            self._send(200, self.service.status(parts[1]))
+        else:
+            self._send(409, {'error': f"job is {status['state']} and cannot be cancelled", 'state': status['state']})
+
+    def address_string(self) -> str:
+        # Unix socket peers have no address tuple
+        return self.client_address[0] if isinstance(self.client_address, tuple) and self.client_address else 'unix'
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server listening on a Unix domain socket."""
+
+    daemon_threads = True
+
+    def server_bind(self) -> None:
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def serve(service: AnalysisService, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+          unix_socket: Optional[str] = None) -> None:
+    """
+    Serves the job API until interrupted.
+
+    Args:
+        service: Running AnalysisService
+        host: TCP address to listen on
+        port: TCP port to listen on
+        unix_socket: Optional Unix socket path; overrides host and port
+    """
+    handler = type('BoundServiceRequestHandler', (ServiceRequestHandler,), {'service': service})
+    if unix_socket:
+        server = ThreadingUnixHTTPServer(unix_socket, handler)
+        print(f"FirmaForge service listening on unix:{unix_socket}")
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        print(f"FirmaForge service listening on http://{host}:{port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown(wait=False)
+        if unix_socket and os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m firmaforge.service."""
+    parser = argparse.ArgumentParser(description="Run the FirmaForge analysis service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', default=None, help="listen on a Unix socket instead of TCP")
+    parser.add_argument('--results-dir', default='results')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE)
+    parser.add_argument('--max-image-bytes', type=int, default=None)
+    parser.add_argument('--allowed-dir', action='append', default=None, help="only accept images under this directory")
+    parser.add_argument('--results-db', default=None)
+    parser.add_argument('--max-jobs-per-worker', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    service = AnalysisService(args.results_dir, args.workers, args.max_queue, args.max_image_bytes,
+                              args.allowed_dir, args.results_db, args.max_jobs_per_worker)
+    serve(service, args.host, args.port, args.socket)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,246 @@
+"""
+similarity.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A near-duplicate detection module that fingerprints each rootfs with
+MinHash over its file hashes, finds the nearest analyzed image through
+an LSH index, and reuses that image's per-file analysis results.
+"""
+
+import json
+import posixpath
+import random
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from .report import write_atomic
+from .rootfs_index import RootfsIndex
+
+NUM_PERM = 128
+LSH_BANDS = 32
+MIN_SIMILARITY = 0.5
+SEED = 1
+MAX_SYMLINK_HOPS = 8
+
+# bump when a per-file analyzer changes its output
+FILE_RESULTS_VERSION = 2
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(SEED)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+
+def minhash_signature(index: RootfsIndex) -> List[int]:
+    """
+    Computes a MinHash signature over the content hashes of a rootfs.
+
+    Args:
+        index: RootfsIndex built with file hashing enabled
+
+    Returns:
+        List of NUM_PERM minimum hash values
+    """
+    values = {int(entry['sha256'][:15], 16) for entry in index.files() if 'sha256' in entry}
+    if not values:
+        return [_MERSENNE_PRIME] * NUM_PERM
+    return [min((a * v + b) % _MERSENNE_PRIME for v in values) for a, b in _PERMUTATIONS]
+
+
+def estimate_similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Estimates the Jaccard similarity of two signatures."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / float(NUM_PERM)
+
+
+def _band_keys(signature: List[int]) -> List[str]:
+    """Splits a signature into LSH band bucket keys."""
+    rows = NUM_PERM // LSH_BANDS
+    return [','.join(str(v) for v in signature[band * rows:(band + 1) * rows]) for band in range(LSH_BANDS)]
+
+
+class SimilarityIndex:
+    """
+    Module containing functions for storing image fingerprints and
+    looking up the nearest analyzed neighbor.
+    """
+
+    def __init__(self, index_dir: str):
+        """
+        Opens (and if needed creates) the similarity index.
+
+        Args:
+            index_dir: Directory holding the index database and per-image file results
+        """
+        self.index_dir = Path(index_dir)
+        self.results_dir = self.index_dir / "file_results"
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.index_dir / "similarity.db"), timeout=60)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                name TEXT PRIMARY KEY,
+                signature TEXT NOT NULL,
+                files INTEGER,
+                added_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                bucket TEXT NOT NULL,
+                name TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_buckets ON buckets(band, bucket);
+        """)
+
+    def close(self) -> None:
+        """
+        Closes the index database.
+        """
+        self.conn.close()
+
+    def add(self, name: str, signature: List[int], files: int = 0) -> None:
+        """
+        Adds or replaces an image's signature.
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM buckets WHERE name = ?", (name,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO signatures VALUES (?, ?, ?, ?)",
+                (name, json.dumps(signature), files, time.strftime('%Y-%m-%dT%H:%M:%S'))
+            )
+            self.conn.executemany(
+                "INSERT INTO buckets VALUES (?, ?, ?)",
+                [(band, key, name) for band, key in enumerate(_band_keys(signature))]
+            )
+
+    def nearest(self, signature: List[int], exclude: Optional[str] = None,
+                min_similarity: float = MIN_SIMILARITY) -> Optional[Dict[str, Any]]:
+        """
+        Finds the most similar indexed image among the LSH candidates.
+
+        Args:
+            signature: Signature of the new image
+            exclude: Optional image name to ignore (e.g. the image itself)
+            min_similarity: Minimum estimated similarity to accept
+
+        Returns:
+            Dictionary with the neighbor's name and score, or None
+        """
+        candidates = set()
+        for band, key in enumerate(_band_keys(signature)):
+            for (name,) in self.conn.execute("SELECT name FROM buckets WHERE band = ? AND bucket = ?", (band, key)):
+                candidates.add(name)
+        candidates.discard(exclude)
+
+        best = None
+        for name in sorted(candidates):
+            row = self.conn.execute("SELECT signature FROM signatures WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                continue
+            score = estimate_similarity(signature, json.loads(row[0]))
+            if score >= min_similarity and (best is None or score > best['score']):
+                best = {'name': name, 'score': round(score, 4)}
+        return best
+
+    def save_file_results(self, name: str, results: Dict[str, Any]) -> None:
+        """
+        Stores an image's per-file analysis results for later reuse.
+        """
+        payload = {'version': FILE_RESULTS_VERSION, 'results': results}
+        write_atomic(str(self.results_dir / f"{name}.json"), json.dumps(payload, default=str).encode('utf-8'))
+
+    def load_file_results(self, name: str) -> Dict[str, Any]:
+        """
+        Loads an image's per-file analysis results, or an empty mapping
+        if they are missing or were produced by older analyzers.
+        """
+        path = self.results_dir / f"{name}.json"
+        if not path.exists():
+            return {}
+        try:
+            with open(path, 'r') as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if payload.get('version') != FILE_RESULTS_VERSION:
+            return {}
+        return payload.get('results', {})
+
+
+class FileResultCache:
+    """
+    Module containing functions for reusing per-file analyzer results
+    keyed by file content hash.
+    """
+
+    # analyzers only cap how many files they examine when the cache does not select them itself
+    selects_files = False
+
+    def __init__(self, index: RootfsIndex, reference: Optional[Dict[str, Any]] = None):
+        """
+        Initializes the cache for one image.
+
+        Args:
+            index: RootfsIndex of the image being analyzed
+            reference: Optional per-file results of the nearest neighbor
+        """
+        self.index = index
+        self.reference = reference or {}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        # each pass looks a file up once, so files are counted by path
+        self.hit_paths = set()
+        self.miss_paths = set()
+
+    def _digest(self, rel_path: str) -> Optional[str]:
+        """Returns the content hash of a rootfs file, following relative symlinks.
+
+        Absolute symlinks are left unresolved because the analyzers open
+        them on the host, where they may point at different content.
+        """
+        entry = self.index.get(rel_path)
+        for _ in range(MAX_SYMLINK_HOPS):
+            if entry is None or entry['type'] != 'symlink' or entry['target'].startswith('/'):
+                break
+            rel_path = posixpath.normpath(posixpath.join(posixpath.dirname(rel_path), entry['target']))
+            entry = self.index.get(rel_path)
+        return entry.get('sha256') if entry else None
+
+    def lookup(self, analyzer: str, rel_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns cached records and summary counts for a file whose
+        content matches a file analyzed in the reference image.
+
+        Returns:
+            Dictionary with 'records' and 'counts', or None on a miss
+        """
+        digest = self._digest(rel_path)
+        cached = self.reference.get(analyzer, {}).get(digest) if digest else None
+        if cached is None:
+            self.miss_paths.add(rel_path)
+            return None
+
+        self.hit_paths.add(rel_path)
+        self.results.setdefault(analyzer, {})[digest] = cached
+        records = [dict(record, file=rel_path) for record in cached['records']]
+        return {'records': records, 'counts': cached.get('counts', {})}
+
+    def store(self, analyzer: str, rel_path: str, records: List[Dict[str, Any]],
+              counts: Optional[Dict[str, int]] = None) -> None:
+        """
+        Records a file's analyzer output for reuse by later images.
+        """
+        digest = self._digest(rel_path)
+        if digest is None:
+            return
+        self.results.setdefault(analyzer, {})[digest] = {
+            'records': [{k: v for k, v in record.items() if k != 'file'} for record in records],
+            'counts': {k: v for k, v in (counts or {}).items() if v},
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of reused and freshly analyzed files; a file
+        analyzed by any pass counts as analyzed.
+        """
+        return {'reused_files': len(self.hit_paths - self.miss_paths), 'analyzed_files': len(self.miss_paths)}
@@ -2,49 +2,106 @@
 static_analyzer.py
 
 Author: @natelgrw
-Last Edited: 12/09/2025
+Last Edited: 10/18/2026
 
 A module that performs static analysis on extracted firmware files,
 specifically targeting user account information from /etc/passwd and /etc/shadow.
 """
 
 import os
-import json
+import posixpath
 import re
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional
+from .report import FindingStream, ResultBuilder, load_result
+from .instrumentation import get_profiler
+from .similarity import FileResultCache
+from .journal import StageCheckpoint
+from .governor import CpuBudgetExceeded, get_governor
+from .packages import read_package_inventory
+from .exposure import analyze_exposure
+from .rootfs_index import RootfsIndex
+from .rootfs_resolver import RootfsResolver
+from .scan_engine import ScanBudget, ScanPattern
+from .script_tokenizer import analyze_script, detect_language, is_template
+from .web_graph import load_web_graph
+from .uci import UciConfig, UciSection, load_uci
+
+# patterns are compiled once at import so warm workers never recompile them
+DANGEROUS_FUNCTIONS = ["strcpy", "sprintf", "system", "popen", "gets", "strcat", "scanf"]
+LIBRARY_PATTERN = re.compile(r"lib[a-zA-Z0-9._-]+\.so\.[0-9.]*")
+
+SECRET_PATTERNS = {
+    "Private Key": ScanPattern(r"-----BEGIN [A-Z ]*PRIVATE KEY-----"),
+    "Public Certificate": ScanPattern(r"-----BEGIN CERTIFICATE-----"),
+    "Public Key": ScanPattern(r"-----BEGIN PUBLIC KEY-----"),
+    "AWS API Key": ScanPattern(r"AKIA[0-9A-Z]{16}"),
+    "Hardcoded Password": ScanPattern(r"(password|secret|apikey|token|auth_token)\s*[:=]\s*['\"]([^'\"\s]{8,})['\"]", re.IGNORECASE)
+}
+SECRET_FALSE_POSITIVE_WORDS = ["randomid", "checkpassword", "validate", "generate", "override_token", "rollback_token", "csrf"]
+
+# finding type, pattern name and summary counter of each script analysis result
+SCRIPT_FINDING_KINDS = {
+    "injection": ("Command Injection Sink", None, "command_injections"),
+    "dynamic": ("Insecure Web Pattern", "Dynamic Command Execution", "unsafe_scripts"),
+    "endpoint": ("Insecure Web Pattern", "Unauthenticated Endpoint", "insecure_endpoints"),
+}
+
+# bytes read per ELF for string analysis, and per text file for secret and
+# web scans; the sampled sizes apply once the governor runs low on memory
+ELF_READ_BYTES = 5 * 1024 * 1024
+ELF_SAMPLED_READ_BYTES = 512 * 1024
+TEXT_SCAN_MAX_BYTES = 512 * 1024
+TEXT_SCAN_SAMPLED_MAX_BYTES = 64 * 1024
+
+# wall-clock seconds the secret and web scans may spend per file and per image;
+# files over budget are abandoned and listed in the pass's scan_budget report
+SCAN_FILE_BUDGET_S = 5.0
+SCAN_IMAGE_BUDGET_S = 300.0
+
+# output of each pass when it has to be skipped under resource limits
+_PASS_DEFAULTS = {
+    "users": lambda: {"total_users": 0, "login_capable_users": [], "users_list": []},
+    "default_credentials": list,
+    "startup_services": list,
+    "firewall": dict,
+    "init_scripts": list,
+    "packages": list,
+    "exposure": lambda: {"listeners": [], "port_forwards": [], "wan_exposed": []},
+    "elf_analysis": list,
+    "secrets_analysis": dict,
+    "web_security": dict,
+}
+
+# UCI packages holding service logins, and the options kept per firewall section
+CREDENTIAL_PACKAGES = ["dropbear", "uhttpd", "system", "lucid"]
+PASSWORD_PLACEHOLDER = "plaintext_or_md5_or_$p$user_for_system_user"
+FIREWALL_RULE_OPTIONS = ("name", "proto", "src", "src_ip", "dest", "dest_ip", "target", "dest_port", "family")
+FIREWALL_REDIRECT_OPTIONS = ("name", "proto", "src", "src_dport", "dest", "dest_ip", "dest_port", "target")
+
+# regex patterns for deep passwd/shadow scan
+PASSWD_PATTERN = re.compile(r'^([a-zA-Z0-9._-]+):([^:]*):(\d+):(\d+):([^:]*):([^:]*):([^:]*)$')
+SHADOW_PATTERN = re.compile(r'^([a-zA-Z0-9._-]+):([^:]+):(\d*):(\d*):(\d*):(\d*):(\d*):(\d*):(\d*)$')
 
 def extract_default_credentials(rootfs_dir: Path) -> List[Dict[str, str]]:
     """Extracts default credentials from configuration files."""
     creds = []
-    config_dir = rootfs_dir / "etc" / "config"
-    if not config_dir.exists():
-        return creds
+    config = load_uci(rootfs_dir)
 
     # check common config files
-    for config_file in ["dropbear", "uhttpd", "system", "lucid"]:
-        path = config_dir / config_file
-        if path.exists():
-            try:
-                with open(path, 'r') as f:
-                    content = f.read()
-                    # simple extraction for 'option password' or 'option username'
-                    usernames = re.findall(r"option\s+username\s+['\"]?([^'\"\s]+)['\"]?", content)
-                    passwords = re.findall(r"option\s+password\s+['\"]?([^'\"\s]+)['\"]?", content)
-                    
-                    for i in range(max(len(usernames), len(passwords))):
-                        entry = {"source": config_file}
-                        if i < len(usernames): entry["username"] = usernames[i]
-                        if i < len(passwords):
-                            pwd = passwords[i]
-                            # omit placeholder password but keep entry
-                            if pwd != "plaintext_or_md5_or_$p$user_for_system_user":
-                                entry["password"] = pwd
-                        
-                        if len(entry) > 1: # more than just 'source'
-                            creds.append(entry)
-            except Exception:
-                continue
+    for package in CREDENTIAL_PACKAGES:
+        for section in config.sections(package):
+            entry = {"source": package}
+            username = section.get("username")
+            password = section.get("password")
+            if username:
+                entry["username"] = username
+            # omit placeholder password but keep entry
+            if password and password != PASSWORD_PLACEHOLDER:
+                entry["password"] = password
+
+            if username or password: # a section with either option is reported
+                creds.append(entry)
     return creds
 
 def extract_startup_services(rootfs_dir: Path) -> List[Dict[str, Any]]:
@@ -54,6 +111,7 @@ def extract_startup_services(rootfs_dir: Path) -> List[Dict[str, Any]]:
     if not init_d.exists():
         return services
 
+    config = load_uci(rootfs_dir)
     for service_file in init_d.iterdir():
         if service_file.is_file() and not service_file.is_symlink():
             try:
@@ -61,70 +119,64 @@ def extract_startup_services(rootfs_dir: Path) -> List[Dict[str, Any]]:
                     content = f.read()
                     start = re.search(r"START=(\d+)", content)
                     stop = re.search(r"STOP=(\d+)", content)
-                    services.append({
+                    service = {
                         "name": service_file.name,
                         "start": int(start.group(1)) if start else None,
                         "stop": int(stop.group(1)) if stop else None
-                    })
+                    }
+                    enabled = _uci_service_enabled(config, service_file.name)
+                    if enabled is not None:
+                        service["enabled"] = enabled
+                    services.append(service)
             except Exception:
                 continue
     return sorted(services, key=lambda x: x['start'] if x['start'] is not None else 999)
 
+def _uci_service_enabled(config: UciConfig, name: str) -> Optional[bool]:
+    """Returns False if every section of a service's UCI package is switched off, True if any is on."""
+    states = []
+    for section in config.sections(name):
+        if "enabled" in section:
+            states.append(section.get_bool("enabled", True))
+        elif "disabled" in section:
+            states.append(not section.get_bool("disabled", False))
+    return any(states) if states else None
+
+def _uci_fields(section: UciSection, options: tuple) -> Dict[str, str]:
+    """Returns the options of a section that are set, with list values joined by spaces."""
+    fields = {}
+    for option in options:
+        value = section.get(option)
+        if value:
+            fields[option] = value
+    return fields
+
 def extract_firewall_rules(rootfs_dir: Path) -> Dict[str, Any]:
     """Extracts detailed firewall rules and redirects from /etc/config/firewall."""
     summary = {"rules": [], "redirects": [], "zones": []}
-    firewall_config = rootfs_dir / "etc" / "config" / "firewall"
-    if not firewall_config.exists():
-        return summary
+    config = load_uci(rootfs_dir)
+
+    # parse zones
+    for zone in config.sections("firewall", "zone"):
+        name = zone.get("name")
+        if name: summary["zones"].append(name)
+
+    # parse rules
+    for rule in config.sections("firewall", "rule"):
+        rule_info = _uci_fields(rule, FIREWALL_RULE_OPTIONS)
+        if rule_info:
+            if not rule.get_bool("enabled", True):
+                rule_info["enabled"] = False
+            summary["rules"].append(rule_info)
+
+    # parse redirects
+    for redirect in config.sections("firewall", "redirect"):
+        rd_info = _uci_fields(redirect, FIREWALL_REDIRECT_OPTIONS)
+        if rd_info:
+            if not redirect.get_bool("enabled", True):
+                rd_info["enabled"] = False
+            summary["redirects"].append(rd_info)
 
-    try:
-        with open(firewall_config, 'r') as f:
-            content = f.read()
-            
-            # parse zones
-            zones = re.findall(r"config\s+zone\s+(.*?)(?=config|$)", content, re.DOTALL)
-            for z in zones:
-                name = re.search(r"option\s+name\s+['\"]?([^'\"\s]+)['\"]?", z)
-                if name: summary["zones"].append(name.group(1))
-            
-            # parse rules
-            rules = re.findall(r"config\s+rule\s+(.*?)(?=config|$)", content, re.DOTALL)
-            for r in rules:
-                rule_info = {}
-                name = re.search(r"option\s+name\s+['\"]?([^'\"\s]+)['\"]?", r)
-                proto = re.search(r"option\s+proto\s+['\"]?([^'\"\s]+)['\"]?", r)
-                src = re.search(r"option\s+src\s+['\"]?([^'\"\s]+)['\"]?", r)
-                dest = re.search(r"option\s+dest\s+['\"]?([^'\"\s]+)['\"]?", r)
-                target = re.search(r"option\s+target\s+['\"]?([^'\"\s]+)['\"]?", r)
-                dest_port = re.search(r"option\s+dest_port\s+['\"]?([^'\"\s]+)['\"]?", r)
-                
-                if name: rule_info["name"] = name.group(1)
-                if proto: rule_info["proto"] = proto.group(1)
-                if src: rule_info["src"] = src.group(1)
-                if dest: rule_info["dest"] = dest.group(1)
-                if target: rule_info["target"] = target.group(1)
-                if dest_port: rule_info["dest_port"] = dest_port.group(1)
-                
-                if rule_info: summary["rules"].append(rule_info)
-                
-            # parse redirects
-            redirects = re.findall(r"config\s+redirect\s+(.*?)(?=config|$)", content, re.DOTALL)
-            for rd in redirects:
-                rd_info = {}
-                name = re.search(r"option\s+name\s+['\"]?([^'\"\s]+)['\"]?", rd)
-                src_dport = re.search(r"option\s+src_dport\s+['\"]?([^'\"\s]+)['\"]?", rd)
-                dest_ip = re.search(r"option\s+dest_ip\s+['\"]?([^'\"\s]+)['\"]?", rd)
-                dest_port = re.search(r"option\s+dest_port\s+['\"]?([^'\"\s]+)['\"]?", rd)
-                
-                if name: rd_info["name"] = name.group(1)
-                if src_dport: rd_info["src_dport"] = src_dport.group(1)
-                if dest_ip: rd_info["dest_ip"] = dest_ip.group(1)
-                if dest_port: rd_info["dest_port"] = dest_port.group(1)
-                
-                if rd_info: summary["redirects"].append(rd_info)
-
-    except Exception:
-        pass
     return summary
 
 def extract_init_scripts_data(rootfs_dir: Path) -> List[str]:
@@ -134,10 +186,28 @@ def extract_init_scripts_data(rootfs_dir: Path) -> List[str]:
         return []
     return sorted([f.name for f in rc_d.iterdir() if f.is_file() or f.is_symlink()])
 
-def analyze_elves(rootfs_dir: Path) -> List[Dict[str, Any]]:
-    """Analyzes ELF binaries in the rootfs for arch, bitness, libs, and dangerous functions."""
+def analyze_elves(rootfs_dir: Path, sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+                  file_cache: Optional[FileResultCache] = None,
+                  resolver: Optional[RootfsResolver] = None) -> List[Dict[str, Any]]:
+    """Analyzes ELF binaries in the rootfs for arch, bitness, libs, and dangerous functions.
+
+    Each real binary is analyzed once; its record lists every symlink
+    resolving to it (e.g. BusyBox applets) under 'aliases'.
+
+    If a sink is given, each record is passed to it instead of being collected.
+    If a file cache is given, binaries already analyzed in a similar image are reused.
+    """
     elf_results = []
-    dangerous_functions = ["strcpy", "sprintf", "system", "popen", "gets", "strcat", "scanf"]
+    collect = sink if sink is not None else elf_results.append
+    sampled = get_governor().should_sample("elf_analysis")
+    read_bytes = ELF_SAMPLED_READ_BYTES if sampled else ELF_READ_BYTES
+    if resolver is None:
+        resolver = RootfsResolver.build(rootfs_dir, file_cache.index if file_cache is not None else None)
+    aliases = resolver.aliases()
+
+    # link names depend on the image, not the binary, so they are added after the per-file cache
+    def emit(record):
+        collect(dict(record, aliases=aliases.get(record["file"], [])))
     
     # helper to check if a file is an ELF
     def is_elf(file_path):
@@ -149,18 +219,26 @@ def analyze_elves(rootfs_dir: Path) -> List[Dict[str, Any]]:
 
     elf_files = []
     if rootfs_dir.exists():
-        for root, dirs, files in os.walk(rootfs_dir):
-            for file in files:
-                full_path = Path(root) / file
-                if not full_path.is_symlink() and is_elf(full_path):
-                    elf_files.append(full_path)
+        for rel_path in resolver.files():
+            full_path = rootfs_dir / rel_path
+            if is_elf(full_path):
+                elf_files.append(full_path)
     
     # limit to most relevant binaries to keep summary concise
     # prioritizes those in bin/ sbin/
     priority_elves = [e for e in elf_files if any(p in str(e) for p in ["/bin/", "/sbin/"])]
-    target_list = (priority_elves + elf_files)[:50] # analyze up to 50 elves
+    target_list = list(dict.fromkeys(priority_elves + elf_files)) # each once
+    if file_cache is None or not file_cache.selects_files:
+        target_list = target_list[:50] # analyze up to 50 elves
     
     for elf_path in target_list:
+        rel_path = str(elf_path.relative_to(rootfs_dir))
+        cached = file_cache.lookup("elf_analysis", rel_path) if file_cache is not None else None
+        if cached is not None:
+            for record in cached["records"]:
+                emit(record)
+            continue
+
         try:
             with open(elf_path, "rb") as f:
                 header = f.read(64)
@@ -173,24 +251,24 @@ def analyze_elves(rootfs_dir: Path) -> List[Dict[str, Any]]:
                 # machine = int.from_bytes(header[18:20], byteorder='little') # need to handle endianness
                 # For simplicity and robustness, we use strings for more detailed info
                 
-                content = header + f.read(5 * 1024 * 1024) # read up to 5MB for string analysis
+                content = header + f.read(read_bytes) # read up to 5MB (512KB sampled) for string analysis
                 content_str = content.decode(errors="ignore")
                 
                 # Linking
                 linking = "dynamic" if "/lib/ld-" in content_str or "lib" in content_str else "static"
                 
                 # Libraries
-                libs = sorted(list(set(re.findall(r"lib[a-zA-Z0-9._-]+\.so\.[0-9.]*", content_str))))
+                libs = sorted(list(set(LIBRARY_PATTERN.findall(content_str))))
                 
                 # Dangerous functions
-                found_dangerous = [func for func in dangerous_functions if func in content_str]
+                found_dangerous = [func for func in DANGEROUS_FUNCTIONS if func in content_str]
                 
                 # Security indicators
                 rpath = "detected" if "RPATH" in content_str or "RUNPATH" in content_str else "none"
                 rwx = "possibly detected" if "RWX" in content_str else "none" # very rough heuristic
 
-                elf_results.append({
-                    "file": str(elf_path.relative_to(rootfs_dir)),
+                record = {
+                    "file": rel_path,
                     "bitness": bitness,
                     "linking": linking,
                     "libraries": libs[:10], # top 10 libs
@@ -199,14 +277,26 @@ def analyze_elves(rootfs_dir: Path) -> List[Dict[str, Any]]:
                         "rpath": rpath,
                         "rwx_segments": rwx
                     }
-                })
+                }
+                emit(record)
+                if file_cache is not None and not sampled:
+                    file_cache.store("elf_analysis", rel_path, [record])
+        except MemoryError:
+            raise
         except Exception:
             continue
             
     return elf_results
 
-def extract_secrets(rootfs_dir: Path) -> Dict[str, Any]:
-    """Scans for secrets, keys, and certificates in the rootfs with professional categorization."""
+def extract_secrets(rootfs_dir: Path, sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+                    file_cache: Optional[FileResultCache] = None) -> Dict[str, Any]:
+    """Scans for secrets, keys, and certificates in the rootfs with professional categorization.
+
+    Returns the summary counters, the scan budget report under 'scan_budget',
+    and the individual findings under 'findings'. If a sink is given,
+    findings are passed to it instead of being collected.
+    If a file cache is given, files already scanned in a similar image are reused.
+    """
     results = {
         "summary": {
             "hardcoded_passwords": 0,
@@ -217,21 +307,58 @@ def extract_secrets(rootfs_dir: Path) -> Dict[str, Any]:
         "findings": []
     }
     
-    # Exclude logic/handling patterns
-    false_positive_words = ["randomid", "checkpassword", "validate", "generate", "override_token", "rollback_token", "csrf"]
-    
-    patterns = {
-        "Private Key": re.compile(r"-----BEGIN [A-Z ]*PRIVATE KEY-----"),
-        "Public Certificate": re.compile(r"-----BEGIN CERTIFICATE-----"),
-        "Public Key": re.compile(r"-----BEGIN PUBLIC KEY-----"),
-        "AWS API Key": re.compile(r"AKIA[0-9A-Z]{16}"),
-        "Hardcoded Password": re.compile(r"(password|secret|apikey|token|auth_token)\s*[:=]\s*['\"]([^'\"\s]{8,})['\"]", re.IGNORECASE)
-    }
-    
     sensitive_extensions = {".pem", ".key", ".crt", ".p12", ".pfx"}
-
-    if not rootfs_dir.exists():
-        return results
+    max_bytes = TEXT_SCAN_SAMPLED_MAX_BYTES if get_governor().should_sample("secrets_analysis") else TEXT_SCAN_MAX_BYTES
+    budget = ScanBudget("secrets_analysis", SCAN_FILE_BUDGET_S, SCAN_IMAGE_BUDGET_S)
+
+    collect = sink if sink is not None else results["findings"].append
+
+    def scan_content(rel_path, content):
+        """Matches the secret patterns in one file's text, returning its findings and summary counts."""
+        counts = dict.fromkeys(results["summary"], 0)
+        file_findings = []
+        found_in_file = False
+        for s_type, pattern in SECRET_PATTERNS.items():
+            for match in budget.finditer(pattern, content):
+                snippet = content[max(0, match.start()-20) : min(len(content), match.end()+20)].strip().replace("\n", " ")
+
+                finding = {
+                    "type": s_type,
+                    "file": str(rel_path),
+                    "context": f"... {snippet} ..."
+                }
+
+                # Apply professional logic
+                lower_snippet = snippet.lower()
+                if any(fp in lower_snippet for fp in SECRET_FALSE_POSITIVE_WORDS):
+                    continue
+                elif s_type == "Private Key":
+                    finding["confidence"] = "high"
+                    finding["impact"] = "Direct access to encrypted material or secure communications"
+                    counts["private_keys"] += 1
+                elif s_type in ["Public Certificate", "Public Key"]:
+                    finding["confidence"] = "informational"
+                    finding["note"] = "Expected public cryptographic asset"
+                    counts["public_certificates"] += 1
+                elif s_type == "Hardcoded Password":
+                    # distinguish between real passwords and config/scripts
+                    if any(x in lower_snippet for x in ["password='password'", "password: 'password'"]):
+                        finding["confidence"] = "high"
+                        finding["impact"] = "Default credentials enable trivial unauthorized access"
+                        counts["hardcoded_passwords"] += 1
+                    else:
+                        continue
+                elif s_type == "AWS API Key":
+                    finding["confidence"] = "high"
+                    finding["impact"] = "Direct access to cloud infrastructure"
+                    counts["api_tokens"] += 1
+
+                file_findings.append(finding)
+                found_in_file = True
+                if results["summary"]["hardcoded_passwords"] + results["summary"]["private_keys"] \
+                        + counts["hardcoded_passwords"] + counts["private_keys"] > 100: break # safety break
+            if found_in_file: break
+        return file_findings, counts
 
     for root, dirs, files in os.walk(rootfs_dir):
         for file in files:
@@ -242,87 +369,102 @@ def extract_secrets(rootfs_dir: Path) -> Dict[str, Any]:
             if any(p in str(rel_path) for p in ["/lib/", "/usr/lib/"]) or full_path.suffix in [".so", ".bin"]:
                 continue
 
+            cached = file_cache.lookup("secrets_analysis", str(rel_path)) if file_cache is not None else None
+            if cached is not None:
+                for finding in cached["records"]:
+                    collect(finding)
+                for key, count in cached["counts"].items():
+                    results["summary"][key] += count
+                continue
+
+            if budget.exhausted():
+                budget.skipped += 1
+                continue
+
             # scan content
             try:
-                if full_path.stat().st_size > 512 * 1024: continue
+                if full_path.stat().st_size > max_bytes: continue
                 with open(full_path, "r", errors="ignore") as f:
                     content = f.read()
-                    
-                    found_in_file = False
-                    for s_type, pattern in patterns.items():
-                        matches = pattern.finditer(content)
-                        for match in matches:
-                            snippet = content[max(0, match.start()-20) : min(len(content), match.end()+20)].strip().replace("\n", " ")
-                            
-                            finding = {
-                                "type": s_type,
-                                "file": str(rel_path),
-                                "context": f"... {snippet} ..."
-                            }
-
-                            # Apply professional logic
-                            lower_snippet = snippet.lower()
-                            if any(fp in lower_snippet for fp in false_positive_words):
-                                continue
-                            elif s_type == "Private Key":
-                                finding["confidence"] = "high"
-                                finding["impact"] = "Direct access to encrypted material or secure communications"
-                                results["summary"]["private_keys"] += 1
-                            elif s_type in ["Public Certificate", "Public Key"]:
-                                finding["confidence"] = "informational"
-                                finding["note"] = "Expected public cryptographic asset"
-                                results["summary"]["public_certificates"] += 1
-                            elif s_type == "Hardcoded Password":
-                                # distinguish between real passwords and config/scripts
-                                if any(x in lower_snippet for x in ["password='password'", "password: 'password'"]):
-                                    finding["confidence"] = "high"
-                                    finding["impact"] = "Default credentials enable trivial unauthorized access"
-                                    results["summary"]["hardcoded_passwords"] += 1
-                                else:
-                                    continue
-                            elif s_type == "AWS API Key":
-                                finding["confidence"] = "high"
-                                finding["impact"] = "Direct access to cloud infrastructure"
-                                results["summary"]["api_tokens"] += 1
-                            
-                            results["findings"].append(finding)
-                            found_in_file = True
-                            if results["summary"]["hardcoded_passwords"] + results["summary"]["private_keys"] > 100: break # safety break
-                        if found_in_file: break
 
+                finished, scanned = budget.run(str(rel_path), scan_content, str(rel_path), content, size=len(content))
+
+                # a file that ran out of time contributes nothing, not a partial result
+                if not finished:
+                    continue
+
+                file_findings, counts = scanned
+                for finding in file_findings:
+                    collect(finding)
+                for key, count in counts.items():
+                    results["summary"][key] += count
+                if file_cache is not None:
+                    file_cache.store("secrets_analysis", str(rel_path), file_findings, counts)
+
+            except MemoryError:
+                raise
             except Exception:
                 continue
 
-    return results["summary"]
+    summary = dict(results["summary"])
+    if sink is None:
+        summary["findings"] = results["findings"]
+    summary["scan_budget"] = budget.report()
+    return summary
 
-def analyze_web_security(rootfs_dir: Path) -> Dict[str, Any]:
-    """Scans for command injections and insecure web endpoints."""
+def analyze_web_security(rootfs_dir: Path, sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+                         file_cache: Optional[FileResultCache] = None,
+                         index: Optional[RootfsIndex] = None) -> Dict[str, Any]:
+    """Scans shell, Lua and ucode scripts for command execution sinks,
+    request data reaching them, and unauthenticated endpoints.
+
+    Each finding records whether a request can reach its file through the
+    image's web handler graph, and the entry point it is reached from.
+    Scripts that exceed the scan budget are listed under 'scan_budget'.
+
+    If a sink is given, findings are passed to it instead of being collected.
+    If a file cache is given, scripts already scanned in a similar image are reused.
+    The web handler graph is built from the file cache's index, else from
+    index, else from a freshly built one, and reading its scripts counts
+    against the pass's scan budget.
+    """
     web_results = {
         "summary": {
             "command_injections": 0,
             "insecure_endpoints": 0,
-            "unsafe_scripts": 0
+            "unsafe_scripts": 0,
+            "reachable_injections": 0
         },
         "findings": []
     }
     
     target_dirs = ["www", "cgi-bin", "usr/lib/lua", "usr/www", "usr/share/ucode", "usr/share/rpcd", "usr/libexec"]
+    max_bytes = TEXT_SCAN_SAMPLED_MAX_BYTES if get_governor().should_sample("web_security") else TEXT_SCAN_MAX_BYTES
+    budget = ScanBudget("web_security", SCAN_FILE_BUDGET_S, SCAN_IMAGE_BUDGET_S)
     
-    # regex for command injection sinks
-    # LUA/ucode/Shell injection patterns
-    injection_patterns = {
-        "Script Command Injection": re.compile(r"(os\.execute|io\.popen|sys\.exec|sys\.call|system|popen|exec)\s*\(.*[a-zA-Z_0-9]+.*\)"),
-        "Shell Backtick/Subshell": re.compile(r"(`|\$\()(.*\$[a-zA-Z_0-9]+.*)(\)|`)"),
-    }
-    
-    endpoint_patterns = {
-        "Insecure Endpoint Definition": re.compile(r"(entry|action)\s*\(\s*\{.*\},\s*.*,\s*nil\s*[,\)]"),
-        "Unvalidated Parameter Access": re.compile(r"(request\.params|request\.form|request\.query|ctx\.params|params)\[['\"].*['\"]\]"),
-    }
-
     if not rootfs_dir.exists():
         return web_results
 
+    collect = sink if sink is not None else web_results["findings"].append
+    counters = [counter for _, _, counter in SCRIPT_FINDING_KINDS.values()]
+
+    # reachability depends on the whole image, so it is added after the per-file cache
+    if file_cache is not None:
+        index = file_cache.index
+    elif index is None:
+        index = RootfsIndex.build(rootfs_dir)
+    graph = load_web_graph(rootfs_dir, index, budget)
+    web_results["graph"] = graph.summary()
+
+    def emit(finding):
+        path = graph.path_to(finding["file"])
+        finding = dict(finding, reachable=bool(path))
+        if path:
+            finding["entry_point"] = path[0]
+            if finding["type"] == "Command Injection Sink":
+                web_results["summary"]["reachable_injections"] += 1
+        collect(finding)
+
     def is_binary(file_path):
         try:
             with open(file_path, "rb") as f:
@@ -349,108 +491,221 @@ def analyze_web_security(rootfs_dir: Path) -> Dict[str, Any]:
                 if full_path.suffix.lower() in [".so", ".bin", ".png", ".jpg", ".jpeg", ".css", ".js", ".gif"]:
                     continue
 
+                cached = file_cache.lookup("web_security", str(rel_path)) if file_cache is not None else None
+                if cached is not None:
+                    for finding in cached["records"]:
+                        emit(finding)
+                    for key, count in cached["counts"].items():
+                        web_results["summary"][key] += count
+                    continue
+
                 if is_binary(full_path):
                     continue
 
+                if budget.exhausted():
+                    budget.skipped += 1
+                    continue
+
                 try:
-                    if full_path.stat().st_size > 512 * 1024: continue
+                    if full_path.stat().st_size > max_bytes: continue
                     with open(full_path, "r", errors="ignore") as f:
                         content = f.read()
-                        
-                        # filter: only scan if it looks like a script or logic
-                        lower_content = content.lower()
-                        is_likely_script = full_path.suffix.lower() in [".lua", ".sh", ".cgi", ".php", ".py", ".pl", ".uc"] or \
-                                          content.startswith("#!") or \
-                                          any(x in lower_content for x in ["function", "module", "require", "import", "local"])
-                        
-                        if not is_likely_script:
-                            continue
 
-                        # Check injections
-                        found_vulnerabilities = False
-                        for name, pattern in injection_patterns.items():
-                            matches = pattern.finditer(content)
-                            for match in matches:
-                                snippet = content[max(0, match.start()-30) : min(len(content), match.end()+30)].strip().replace("\n", " ")
-                                web_results["findings"].append({
-                                    "type": "Command Injection Sink",
-                                    "file": str(rel_path),
-                                    "context": f"... {snippet} ...",
-                                    "confidence": "high"
-                                })
-                                web_results["summary"]["command_injections"] += 1
-                                found_vulnerabilities = True
-                        
-                        # Check endpoints
-                        for name, pattern in endpoint_patterns.items():
-                            matches = pattern.finditer(content)
-                            for match in matches:
-                                snippet = content[max(0, match.start()-30) : min(len(content), match.end()+30)].strip().replace("\n", " ")
-                                web_results["findings"].append({
-                                    "type": "Insecure Web Pattern",
-                                    "file": str(rel_path),
-                                    "context": f"... {snippet} ...",
-                                    "confidence": "medium"
-                                })
-                                if "Endpoint" in name:
-                                    web_results["summary"]["insecure_endpoints"] += 1
-                                else:
-                                    web_results["summary"]["unsafe_scripts"] += 1
-                                found_vulnerabilities = True
+                    # filter: only shell, Lua and ucode scripts are tokenized
+                    language = detect_language(str(rel_path), content[:256])
+                    if language is None:
+                        if file_cache is not None:
+                            file_cache.store("web_security", str(rel_path), [])
+                        continue
 
+                    # sinks, request data reaching them, and unauthenticated endpoints
+                    finished, script_results = budget.run(str(rel_path), analyze_script, content, language,
+                                                          is_template(str(rel_path), content, language),
+                                                          size=len(content))
+                    if not finished:
+                        continue
+
+                    counts = dict.fromkeys(counters, 0)
+                    file_findings = []
+                    for result in script_results:
+                        finding_type, pattern_name, counter = SCRIPT_FINDING_KINDS[result["kind"]]
+                        finding = {
+                            "type": finding_type,
+                            "file": str(rel_path),
+                            "line": result["line"],
+                            "context": result["context"],
+                            "confidence": result["confidence"],
+                            "language": language,
+                            "sink": result["sink"]
+                        }
+                        if pattern_name:
+                            finding["pattern"] = pattern_name
+                        if result.get("sources"):
+                            finding["sources"] = result["sources"]
+                        emit(finding)
+                        file_findings.append(finding)
+                        counts[counter] += 1
+
+                    for key, count in counts.items():
+                        web_results["summary"][key] += count
+                    if file_cache is not None:
+                        file_cache.store("web_security", str(rel_path), file_findings, counts)
+
+                except MemoryError:
+                    raise
                 except Exception:
                     continue
 
+    web_results["scan_budget"] = budget.report()
     return web_results
 
-def analyze_static(firmware_result_dir: str, output_path: str) -> Dict[str, Any]:
+def analyze_static(firmware_result_dir: str, output_path: Optional[str], builder: Optional[ResultBuilder] = None,
+                   stream: Optional[FindingStream] = None, file_cache: Optional[FileResultCache] = None,
+                   checkpoint: Optional[StageCheckpoint] = None, index: Optional[RootfsIndex] = None) -> Dict[str, Any]:
     """
     Analyzes extracted firmware for various static details.
+    
+    When a builder is given the 'static_analysis' section is added to it
+    and nothing is written; otherwise the section is merged into the
+    JSON at output_path with a single atomic write. When a stream is
+    given, ELF records and secret and web findings go to the NDJSON
+    stream instead of the report. When a file cache is given, per-file
+    results of a similar image are reused for unchanged files. When a
+    checkpoint is given, passes completed by an earlier run are loaded
+    from it instead of being re-run (streamed passes always re-run,
+    since their records are not kept in the checkpoint). index is the
+    hashed rootfs-relative index the passes share; it is taken from the
+    file cache or built once when not given.
     """
     firmware_dir = Path(firmware_result_dir)
     rootfs_dir = firmware_dir / "raw_extracts" / "rootfs"
+    has_rootfs = rootfs_dir.exists()
     
     results = {}
+    errors: Dict[str, str] = {}
+    stream_checkpoint = checkpoint if stream is None else None
+
+    if file_cache is not None:
+        index = file_cache.index
+    elif index is None and has_rootfs:
+        with get_profiler().span("static.index"):
+            index = RootfsIndex.build(rootfs_dir)
+
+    # one link table serves every pass that resolves paths inside the rootfs
+    try:
+        with get_profiler().span("static.resolver"):
+            resolver = RootfsResolver.build(rootfs_dir, index)
+    except Exception as e:
+        print(f"ERROR: Failed to build rootfs link table: {e}")
+        errors["resolver"] = f"{type(e).__name__}: {e}"
+        resolver = None
     
     # 1. User analysis (merged from old analyze_users)
-    user_results = _analyze_users_internal(firmware_dir, rootfs_dir)
+    user_results = _run_pass("users", _analyze_users_internal, firmware_dir, rootfs_dir, resolver, checkpoint=checkpoint, errors=errors)
     results["users"] = user_results
     
     # 2. Advanced extractions
-    if rootfs_dir.exists():
-        results["default_credentials"] = extract_default_credentials(rootfs_dir)
-        results["startup_services"] = extract_startup_services(rootfs_dir)
-        results["firewall_summary"] = extract_firewall_rules(rootfs_dir)
-        results["init_scripts"] = extract_init_scripts_data(rootfs_dir)
-
-    if output_path:
+    if has_rootfs:
+        results["default_credentials"] = _run_pass("default_credentials", extract_default_credentials, rootfs_dir, checkpoint=checkpoint, errors=errors)
+        results["startup_services"] = _run_pass("startup_services", extract_startup_services, rootfs_dir, checkpoint=checkpoint, errors=errors)
+        results["firewall_summary"] = _run_pass("firewall", extract_firewall_rules, rootfs_dir, checkpoint=checkpoint, errors=errors)
+        results["init_scripts"] = _run_pass("init_scripts", extract_init_scripts_data, rootfs_dir, checkpoint=checkpoint, errors=errors)
+        results["packages"] = _run_pass("packages", read_package_inventory, rootfs_dir, checkpoint=checkpoint, errors=errors)
+        results["exposure"] = _run_pass("exposure", analyze_exposure, rootfs_dir, results["startup_services"], checkpoint=checkpoint, errors=errors)
+    
+    section = {
+        "login_capable_users": user_results["login_capable_users"],
+        "users": user_results["users_list"],
+        "default_credentials": results.get("default_credentials", []),
+        "startup_services": results.get("startup_services", []), 
+        "firewall": results.get("firewall_summary", {}),
+        "init_scripts": results.get("init_scripts", []),
+        "packages": results.get("packages", []),
+        "exposure": results.get("exposure", _PASS_DEFAULTS["exposure"]()),
+        "elf_analysis": _run_pass("elf_analysis", analyze_elves, rootfs_dir, _stream_sink(stream, "elf_analysis"), file_cache, resolver,
+                                  checkpoint=stream_checkpoint, sampled_retry=stream is None, errors=errors) if has_rootfs else [],
+        "secrets_analysis": _run_pass("secrets_analysis", extract_secrets, rootfs_dir, _stream_sink(stream, "secrets_analysis"), file_cache,
+                                      checkpoint=stream_checkpoint, sampled_retry=stream is None, errors=errors) if has_rootfs else {},
+        "web_security": _run_pass("web_security", analyze_web_security, rootfs_dir, _stream_sink(stream, "web_security"), file_cache, index,
+                                  checkpoint=stream_checkpoint, sampled_retry=stream is None, errors=errors) if has_rootfs else {}
+    }
+    
+    if stream is not None:
+        section["findings_stream"] = stream.summary()
+    if errors:
+        section["errors"] = errors
+    
+    if builder is not None:
+        builder.add('static_analysis', section)
+    elif output_path:
         try:
-            data = {}
-            if os.path.exists(output_path):
-                with open(output_path, 'r') as f:
-                    data = json.load(f)
-            
-            data['static_analysis'] = {
-                "login_capable_users": user_results["login_capable_users"],
-                "users": user_results["users_list"],
-                "default_credentials": results.get("default_credentials", []),
-                "startup_services": results.get("startup_services", []), 
-                "firewall": results.get("firewall_summary", {}),
-                "init_scripts": results.get("init_scripts", []),
-                "elf_analysis": analyze_elves(rootfs_dir) if rootfs_dir.exists() else [],
-                "secrets_analysis": extract_secrets(rootfs_dir) if rootfs_dir.exists() else {},
-                "web_security": analyze_web_security(rootfs_dir) if rootfs_dir.exists() else {}
-            }
-            
-            with open(output_path, 'w') as f:
-                json.dump(data, f, indent=2, default=str)
-                
+            data = load_result(output_path) if os.path.exists(output_path) else {}
+            result_builder = ResultBuilder(data)
+            result_builder.add('static_analysis', section)
+            result_builder.write(output_path)
         except Exception as e:
             print(f"Error updating JSON {output_path}: {e}")
             
     return results
 
-def _analyze_users_internal(firmware_dir: Path, rootfs_dir: Path) -> Dict[str, Any]:
+def _run_pass(name: str, func: Callable[..., Any], *args: Any, checkpoint: Optional[StageCheckpoint] = None,
+              sampled_retry: bool = False, errors: Optional[Dict[str, str]] = None) -> Any:
+    """Runs a single static pass inside a profiler span, reusing its checkpointed output if any.
+
+    Under an active resource governor, a pass that runs out of memory is
+    re-run once in sampled mode when sampled_retry is set, and otherwise
+    (or when the CPU budget runs out) replaced by its empty default; the
+    reason is recorded and degraded output is never checkpointed. Any
+    other failure also yields the empty default, with the error recorded
+    in errors under the pass name, so one bad file cannot cost the
+    whole report.
+    """
+    stage = f"static.{name}"
+    if checkpoint is not None:
+        done, output = checkpoint.load(stage)
+        if done:
+            return output
+    governor = get_governor()
+    try:
+        with get_profiler().span(stage):
+            output = func(*args)
+    except MemoryError as e:
+        if not governor.enabled:
+            return _failed_pass(name, e, errors)
+        if sampled_retry and not governor.sampled:
+            governor.sampled = True
+            governor.record(name, "sampled", "memory limit reached")
+            return _run_pass(name, func, *args, errors=errors)
+        governor.record(name, "skipped", "memory limit reached")
+        return _PASS_DEFAULTS[name]()
+    except CpuBudgetExceeded as e:
+        if not governor.enabled:
+            return _failed_pass(name, e, errors)
+        governor.grant_cpu_grace()
+        governor.sampled = True
+        governor.record(name, "skipped", "CPU time limit reached")
+        return _PASS_DEFAULTS[name]()
+    except Exception as e:
+        return _failed_pass(name, e, errors)
+    finally:
+        governor.observe()
+    if checkpoint is not None and not governor.sampled:
+        checkpoint.save(stage, output)
+    return output
+
+def _failed_pass(name: str, error: BaseException, errors: Optional[Dict[str, str]]) -> Any:
+    """Records a failed pass and returns its empty default."""
+    print(f"ERROR: Static pass {name} failed: {error}")
+    if errors is not None:
+        errors[name] = f"{type(error).__name__}: {error}"
+    return _PASS_DEFAULTS[name]()
+
+def _stream_sink(stream: Optional[FindingStream], analyzer: str) -> Optional[Callable[[Dict[str, Any]], None]]:
+    """Returns the stream sink for an analyzer, or None when not streaming."""
+    return stream.sink(analyzer) if stream is not None else None
+
+def _analyze_users_internal(firmware_dir: Path, rootfs_dir: Path,
+                            resolver: Optional[RootfsResolver] = None) -> Dict[str, Any]:
     """Internal helper for user analysis logic."""
     
     passwd_files = []
@@ -458,33 +713,28 @@ def _analyze_users_internal(firmware_dir: Path, rootfs_dir: Path) -> Dict[str, A
     warnings = []
     passwd_users = []
     shadow_users = []
-    
-    # regex patterns for deep scan
-    passwd_pattern = re.compile(r'^([a-zA-Z0-9._-]+):([^:]*):(\d+):(\d+):([^:]*):([^:]*):([^:]*)$')
-    shadow_pattern = re.compile(r'^([a-zA-Z0-9._-]+):([^:]+):(\d*):(\d*):(\d*):(\d*):(\d*):(\d*):(\d*)$')
+    if resolver is None:
+        resolver = RootfsResolver.build(rootfs_dir)
 
-    # find all passwd and shadow files
+    # find all passwd and shadow files in etc directories, following
+    # symlinks inside the rootfs and reporting the ones that leave it
     if rootfs_dir.exists():
-        passwd_files = list(rootfs_dir.rglob("etc/passwd"))
-        shadow_files = list(rootfs_dir.rglob("etc/shadow"))
-        
-        # explicit check in etc directories to catch broken symlinks
-        for etc_dir in rootfs_dir.rglob("etc"):
-            if etc_dir.is_dir():
-                p_file = etc_dir / "passwd"
-                s_file = etc_dir / "shadow"
-                
-                if (p_file.is_symlink() or p_file.exists()) and p_file not in passwd_files:
-                    passwd_files.append(p_file)
-                
-                if (s_file.is_symlink() or s_file.exists()) and s_file not in shadow_files:
-                    shadow_files.append(s_file)
+        for name, found in (("passwd", passwd_files), ("shadow", shadow_files)):
+            for rel_path in resolver.entries(name):
+                if posixpath.basename(posixpath.dirname(rel_path)) != "etc":
+                    continue
+                real_path = resolver.host_path(rel_path)
+                if real_path is not None:
+                    found.append((rootfs_dir / rel_path, real_path))
+                elif resolver.is_broken(rel_path):
+                    msg = f"{name} file {rel_path} is a symlink to {resolver.links.get(rel_path)}, which is not in the rootfs"
+                    warnings.append(msg)
     
     # parse passwd files
     parsed_users = {}
-    for passwd_file in passwd_files:
+    for passwd_file, real_path in passwd_files:
         try:
-            with open(passwd_file, 'r') as f:
+            with open(real_path, 'r') as f:
                 for line in f:
                     line = line.strip()
                     if not line or line.startswith('#'):
@@ -510,9 +760,9 @@ def _analyze_users_internal(firmware_dir: Path, rootfs_dir: Path) -> Dict[str, A
             warnings.append(msg)
 
     # parse shadow files and merge
-    for shadow_file in shadow_files:
+    for shadow_file, real_path in shadow_files:
         try:
-            with open(shadow_file, 'r') as f:
+            with open(real_path, 'r') as f:
                 for line in f:
                     line = line.strip()
                     if not line or line.startswith('#'):
@@ -557,10 +807,10 @@ def _analyze_users_internal(firmware_dir: Path, rootfs_dir: Path) -> Dict[str, A
 
     # deep scan for hidden credentials
     if rootfs_dir.exists():
-        for file_path in rootfs_dir.rglob("*"):
-            if not file_path.is_file() or file_path.is_symlink():
-                continue
-            if file_path in passwd_files or file_path in shadow_files:
+        parsed_files = {real_path for _, real_path in passwd_files + shadow_files}
+        for rel_path in resolver.files():
+            file_path = rootfs_dir / rel_path
+            if file_path in parsed_files:
                 continue
             
             if file_path.stat().st_size > 1024 * 1024:
@@ -575,7 +825,7 @@ def _analyze_users_internal(firmware_dir: Path, rootfs_dir: Path) -> Dict[str, A
                         if not line or line.startswith('#'):
                             continue
                         
-                        pmatch = passwd_pattern.match(line)
+                        pmatch = PASSWD_PATTERN.match(line)
                         if pmatch:
                             username = pmatch.group(1)
                             if username not in parsed_users:
@@ -591,7 +841,7 @@ def _analyze_users_internal(firmware_dir: Path, rootfs_dir: Path) -> Dict[str, A
                                     'source_passwd': str(file_path.relative_to(firmware_dir)) + " (deep_scan)"
                                 }
                         
-                        smatch = shadow_pattern.match(line)
+                        smatch = SHADOW_PATTERN.match(line)
                         if smatch:
                             username = smatch.group(1)
                             password_hash = smatch.group(2)
@@ -643,6 +893,7 @@ def _analyze_users_internal(firmware_dir: Path, rootfs_dir: Path) -> Dict[str, A
             "username": username,
             "uid": uid,
             "shell": shell,
+            "hash_type": user.get('hash_type'),
             "has_valid_password_hash": has_valid_password_hash
         })
 
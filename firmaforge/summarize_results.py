@@ -2,20 +2,41 @@
 summarize_results.py
 
 Author: @natelgrw
-Last Edited: 11/30/2025
+Last Edited: 10/18/2026
 
 A module that generates JSON output from firmware detection results.
 """
 
-import json
 from typing import Dict, Any, Optional
 from pathlib import Path
 from .detector import FirmwareDetector
 from .extractor import FirmwareExtractor
+from .workspace import ExtractionWorkspace
+from .blob_store import archive_extracts as archive_raw_extracts, restore_extracts
+from .report import FindingStream, ResultBuilder, load_result, report_filename
+from .instrumentation import Profiler, profiling
+from .results_db import ResultsDB
+from .rootfs_index import RootfsIndex, hash_file
+from .similarity import FileResultCache, SimilarityIndex, minhash_signature
+from .delta import analyze_delta
+from .journal import StageCheckpoint
+from .governor import ResourceGovernor, governing
+from .kernel_analyzer import analyze_kernels
+from .packages import match_report, open_feed
+from .sbom import build_sbom, write_sbom
 from . import static_analyzer
 
 
-def analyze_firmware(firmware_path: str, output_path: Optional[str] = None, extract_first: bool = True, results_dir: Optional[str] = None) -> Dict[str, Any]:
+def analyze_firmware(firmware_path: str, output_path: Optional[str] = None, extract_first: bool = True, results_dir: Optional[str] = None,
+                     workspace: Optional[ExtractionWorkspace] = None, archive_extracts: bool = False,
+                     blob_store_dir: Optional[str] = None, encoder: str = 'json',
+                     stream_findings: bool = False, profile: bool = True,
+                     trace_path: Optional[str] = None, results_db: Optional[str] = None,
+                     reuse_similar: bool = False, similarity_dir: Optional[str] = None,
+                     baseline: Optional[str] = None, checkpoint: Optional[StageCheckpoint] = None,
+                     governor: Optional[ResourceGovernor] = None,
+                     kernel_cache_dir: Optional[str] = None, vuln_feed: Optional[str] = None,
+                     sbom: bool = False) -> Dict[str, Any]:
     """
     Analyze firmware and return comprehensive results.
     
@@ -24,6 +45,26 @@ def analyze_firmware(firmware_path: str, output_path: Optional[str] = None, extr
         output_path: Optional path to save JSON output
         extract_first: If True, extract firmware first then analyze extracted files
         results_dir: Optional results directory
+        workspace: Optional scratch workspace with byte and inode budgets for extraction
+        archive_extracts: If True, move raw_extracts into the shared blob store after analysis
+        blob_store_dir: Optional blob store directory (defaults to <results_dir>/.blobstore)
+        encoder: Report encoder, one of 'json', 'orjson' or 'msgpack'
+        stream_findings: If True, write ELF records and findings to <firmware_name>_findings.ndjson
+            as they are produced and keep only summaries in the report
+        profile: If True, record per-stage timings in the report's 'performance' section
+        trace_path: Optional path for a Chrome trace / Perfetto JSON of the recorded spans
+        results_db: Optional path to a corpus-wide SQLite results database to store the report in
+        reuse_similar: If True, reuse per-file results from the nearest previously analyzed image
+        similarity_dir: Optional similarity index directory (defaults to <results_dir>/.similarity)
+        baseline: Optional result directory of a previously extracted baseline image; when set,
+            only files that differ from it are analyzed and a 'delta' section replaces 'static_analysis'
+        checkpoint: Optional journal checkpoint; stages it records as completed are not re-run
+        governor: Optional resource governor whose memory, CPU and file limits apply while the image
+            is analyzed; passes that exceed them are sampled or skipped and a 'resources' section is added
+        kernel_cache_dir: Optional per-hash kernel metadata cache (defaults to <results_dir>/.kernel_cache)
+        vuln_feed: Optional vulnerability feed index (see packages.build_feed); installed packages and the
+            kernel version are matched against it and a 'vulnerabilities' section is added
+        sbom: If True, write a CycloneDX SBOM to <firmware_name>_sbom.cdx.json next to the report
     
     Returns:
         Dictionary containing all analysis results
@@ -47,76 +88,227 @@ def analyze_firmware(firmware_path: str, output_path: Optional[str] = None, extr
     firmware_result_dir = results_dir / firmware_name
     firmware_result_dir.mkdir(parents=True, exist_ok=True)
     
-    extracted_dir = None
+    profiler = Profiler(enabled=profile)
+    active_governor = governor if governor is not None else ResourceGovernor(enabled=False)
     
-    # extract firmware if requested
-    if extract_first:
-        try:
-            extractor = FirmwareExtractor(firmware_path, str(firmware_result_dir))
-            extraction_results = extractor.extract_all()
-            extracted_dir = extraction_results['output_directory']
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-    else:
+    with profiling(profiler), governing(active_governor):
+        extracted_dir = None
+        workspace_usage = None
+        
+        # resume from a completed extraction if the journal has one
+        extraction_done, extraction_results = checkpoint.load('extracted') if checkpoint else (False, None)
+        if extract_first and extraction_done:
+            restore_extracts(str(firmware_result_dir), blob_store_dir)
+            if (firmware_result_dir / "raw_extracts").exists():
+                extracted_dir = extraction_results['output_directory']
+                workspace_usage = extraction_results.get('workspace')
+            else:
+                extraction_done = False
+        
+        # extract firmware if requested
+        if extract_first and not extraction_done:
+            try:
+                extractor = FirmwareExtractor(firmware_path, str(firmware_result_dir), workspace=workspace)
+                with profiler.span('extraction'):
+                    extraction_results = extractor.extract_all()
+                extracted_dir = extraction_results['output_directory']
+                workspace_usage = extraction_results.get('workspace')
+                if checkpoint:
+                    checkpoint.save('extracted', {'output_directory': extracted_dir, 'workspace': workspace_usage})
+            except Exception as e:
+                import traceback
+                traceback.print_exc()
+        elif not extract_first:
+            # re-materialize archived extracts on demand
+            restore_extracts(str(firmware_result_dir), blob_store_dir)
+            raw_extracts_dir = firmware_result_dir / "raw_extracts"
+            if raw_extracts_dir.exists() and (raw_extracts_dir / "kernel").exists() or (raw_extracts_dir / "rootfs").exists():
+                extracted_dir = str(firmware_result_dir)
+        
+        # analyze with extracted files if available
+        detection_done, results = checkpoint.load('detected') if checkpoint else (False, None)
+        if not detection_done:
+            detector = FirmwareDetector(firmware_path, extracted_dir)
+            with profiler.span('detection'):
+                results = detector.detect_all()
+            # detection without the extracts it needs must run again on retry
+            if checkpoint and (extracted_dir or not extract_first):
+                checkpoint.save('detected', results)
+        
+        # create concise summary structure
+        file_info = results.get('file_info', {})
+        arch_results = results.get('architecture', {})
+        
+        summary = {
+            'firmware_file': firmware_path_obj.name,
+            'extracted_directory': str(extracted_dir) if extracted_dir else None,
+            'file_info': {
+                'size': file_info.get('size', 0),
+                'file_type': file_info.get('file_type', 'unknown'),
+            },
+            'encryption_check': {
+                'possibly_encrypted': results.get('encryption_check', {}).get('possibly_encrypted', False),
+                'entropy': results.get('encryption_check', {}).get('entropy', 0),
+            },
+            'architecture': {
+                'detected': arch_results.get('detected', ['unknown']),
+                'confidence': arch_results.get('confidence', 'low'),
+                'method': arch_results.get('method', 'unknown'),
+            },
+            'endianness': {
+                'detected': results.get('endianness', {}).get('detected', ['unknown']),
+                'confidence': results.get('endianness', {}).get('confidence', 'low'),
+            },
+            'container_formats': results.get('container_formats', []),
+            'filesystem_types': results.get('filesystem_types', []),
+        }
+        
+        if workspace_usage:
+            summary['extraction_workspace'] = workspace_usage
+        
+        builder = ResultBuilder(summary)
+        
+        # kernel version, compiler and IKCONFIG from the decompressed kernel
+        if extracted_dir:
+            try:
+                with profiler.span('kernel_analysis'):
+                    kernels = analyze_kernels(str(firmware_result_dir),
+                                              kernel_cache_dir if kernel_cache_dir else str(results_dir / ".kernel_cache"))
+                if kernels:
+                    builder.add('kernel', kernels)
+            except Exception as e:
+                print(f"ERROR: Kernel analysis failed for {firmware_name}: {e}")
+        
+        # one hashed index of raw_extracts serves static analysis, similarity, the SBOM and the blob store
+        extract_index = None
+        rootfs_index = None
         raw_extracts_dir = firmware_result_dir / "raw_extracts"
-        if raw_extracts_dir.exists() and (raw_extracts_dir / "kernel").exists() or (raw_extracts_dir / "rootfs").exists():
-            extracted_dir = str(firmware_result_dir)
-    
-    # analyze with extracted files if available
-    detector = FirmwareDetector(firmware_path, extracted_dir)
-    results = detector.detect_all()
-    
-    # create concise summary structure
-    file_info = results.get('file_info', {})
-    arch_results = results.get('architecture', {})
-    
-    summary = {
-        'firmware_file': firmware_path_obj.name,
-        'extracted_directory': str(extracted_dir) if extracted_dir else None,
-        'file_info': {
-            'size': file_info.get('size', 0),
-            'file_type': file_info.get('file_type', 'unknown'),
-        },
-        'encryption_check': {
-            'possibly_encrypted': results.get('encryption_check', {}).get('possibly_encrypted', False),
-            'entropy': results.get('encryption_check', {}).get('entropy', 0),
-        },
-        'architecture': {
-            'detected': arch_results.get('detected', ['unknown']),
-            'confidence': arch_results.get('confidence', 'low'),
-            'method': arch_results.get('method', 'unknown'),
-        },
-        'endianness': {
-            'detected': results.get('endianness', {}).get('detected', ['unknown']),
-            'confidence': results.get('endianness', {}).get('confidence', 'low'),
-        },
-        'container_formats': results.get('container_formats', []),
-        'filesystem_types': results.get('filesystem_types', []),
-    }
+        if extracted_dir and raw_extracts_dir.exists() and (sbom or archive_extracts or not baseline):
+            with profiler.span('extract_index'):
+                extract_index = RootfsIndex.build(raw_extracts_dir)
+                rootfs_index = extract_index.subtree("rootfs")
+        
+        # fingerprint the rootfs and look up the nearest analyzed image
+        file_cache = None
+        similarity_index = None
+        rootfs_dir = raw_extracts_dir / "rootfs"
+        if reuse_similar and not baseline and extracted_dir and rootfs_dir.exists():
+            try:
+                with profiler.span('similarity'):
+                    similarity_index = SimilarityIndex(similarity_dir if similarity_dir else str(results_dir / ".similarity"))
+                    signature = minhash_signature(rootfs_index)
+                    neighbor = similarity_index.nearest(signature, exclude=firmware_name)
+                    reference = similarity_index.load_file_results(neighbor['name']) if neighbor else None
+                    file_cache = FileResultCache(rootfs_index, reference)
+                if neighbor:
+                    print(f"Nearest analyzed image: {neighbor['name']} (similarity {neighbor['score']})")
+            except Exception as e:
+                print(f"ERROR: Similarity lookup failed for {firmware_name}: {e}")
+                similarity_index = None
+        
+        # delta analysis against a baseline image
+        if baseline and extracted_dir:
+            print(f"Running delta analysis against {baseline}...")
+            try:
+                restore_extracts(baseline, blob_store_dir)
+                with profiler.span('delta_analysis'):
+                    builder.add('delta', analyze_delta(baseline, str(firmware_result_dir)))
+            except Exception as e:
+                print(f"ERROR: Delta analysis against {baseline} failed: {e}")
+        
+        # static analysis
+        elif extracted_dir:
+            print(f"Running static analysis on {extracted_dir}...")
+            try:
+                with profiler.span('static_analysis'):
+                    if stream_findings:
+                        with FindingStream(str(firmware_result_dir / f"{firmware_name}_findings.ndjson")) as stream:
+                            static_analyzer.analyze_static(str(firmware_result_dir), None, builder=builder, stream=stream,
+                                                           file_cache=file_cache, checkpoint=checkpoint, index=rootfs_index)
+                    else:
+                        static_analyzer.analyze_static(str(firmware_result_dir), None, builder=builder, file_cache=file_cache,
+                                                       checkpoint=checkpoint, index=rootfs_index)
+            except Exception as e:
+                print(f"ERROR: Static analysis failed for {firmware_name}: {e}")
+        
+        # match installed packages and the kernel against the offline feed
+        if vuln_feed and extracted_dir:
+            try:
+                with profiler.span('vulnerability_matching'):
+                    builder.add('vulnerabilities', match_report(open_feed(vuln_feed), builder.to_dict()))
+            except Exception as e:
+                print(f"ERROR: Vulnerability matching against {vuln_feed} failed: {e}")
+        
+        # record this image so later near-duplicates can reuse its results
+        if similarity_index is not None and file_cache is not None:
+            try:
+                similarity_index.add(firmware_name, signature, sum(1 for _ in rootfs_index.files()))
+                similarity_index.save_file_results(firmware_name, file_cache.results)
+                similarity = {'nearest': neighbor['name'] if neighbor else None,
+                              'score': neighbor['score'] if neighbor else 0.0}
+                similarity.update(file_cache.stats())
+                builder.add('similarity', similarity)
+            except Exception as e:
+                print(f"ERROR: Failed to update similarity index for {firmware_name}: {e}")
+            finally:
+                similarity_index.close()
+        
+        # software bill of materials next to the report
+        if sbom and extract_index is not None:
+            try:
+                with profiler.span('sbom'):
+                    document = build_sbom(firmware_name, extract_index,
+                                          builder.get('static_analysis', {}).get('packages'),
+                                          builder.get('kernel'), hash_file(firmware_path_obj))
+                    builder.add('sbom', write_sbom(document, str(firmware_result_dir / f"{firmware_name}_sbom.cdx.json")))
+            except Exception as e:
+                print(f"ERROR: SBOM generation failed for {firmware_name}: {e}")
+        
+        # deduplicate extracted trees into the blob store
+        if archive_extracts and extracted_dir:
+            store_dir = blob_store_dir if blob_store_dir else str(results_dir / ".blobstore")
+            try:
+                with profiler.span('archive'):
+                    archive_stats = archive_raw_extracts(str(firmware_result_dir), store_dir, index=extract_index)
+                if archive_stats:
+                    builder.add('extract_archive', archive_stats)
+                    print(f"Archived raw_extracts: {archive_stats['files']} files, {archive_stats['new_blobs']} new blobs")
+            except Exception as e:
+                print(f"ERROR: Failed to archive raw_extracts for {firmware_name}: {e}")
     
-    if output_path is None:
-        output_path = str(firmware_result_dir / f"{firmware_name}_analysis.json")
+    if governor is not None:
+        builder.add('resources', governor.report())
     
-    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    if profile:
+        builder.add('performance', profiler.report())
+        if trace_path:
+            try:
+                profiler.write_trace(trace_path)
+            except Exception as e:
+                print(f"ERROR: Failed to write trace to {trace_path}: {e}")
     
-    # save to JSON file
+    if output_path is None:
+        output_path = str(firmware_result_dir / report_filename(firmware_name, encoder))
+    
+    # save the report with a single atomic write
     try:
-        with open(output_path, 'w') as f:
-            json.dump(summary, f, indent=2, default=str)
+        builder.write(output_path, encoder)
+        if checkpoint:
+            checkpoint.save('report', output_path)
     except Exception as e:
         print(f"ERROR: Failed to save JSON to {output_path}: {e}")
         import traceback
         traceback.print_exc()
     
-    # static analysis
-    if extracted_dir:
-        print(f"Running static analysis on {extracted_dir}...")
-        static_analyzer.analyze_static(str(firmware_result_dir), output_path)
-        with open(output_path, 'r') as f:
-            summary = json.load(f)
+    # index the report in the corpus database
+    if results_db:
+        try:
+            with ResultsDB(results_db) as db:
+                db.store_report(firmware_name, builder.to_dict())
+        except Exception as e:
+            print(f"ERROR: Failed to store results in {results_db}: {e}")
     
-    return summary
+    return builder.to_dict()
 
 
 def load_analysis(json_path: str) -> Dict[str, Any]:
@@ -129,5 +321,4 @@ def load_analysis(json_path: str) -> Dict[str, Any]:
     Returns:
         Dictionary containing analysis results
     """
-    with open(json_path, 'r') as f:
-        return json.load(f)
+    return load_result(json_path)
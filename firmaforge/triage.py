@@ -0,0 +1,576 @@
+"""
+triage.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A fast triage module that classifies a firmware image from its headers
+and a fixed number of sampled blocks only: container type, architecture,
+endianness, rootfs type and an encryption verdict, each with a numeric
+confidence, within a strict byte and time budget.
+"""
+
+import argparse
+import json
+import math
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+TRIAGE_MAX_BYTES = 256 * 1024
+TRIAGE_TIME_BUDGET_S = 0.25
+TRIAGE_SAMPLE_BLOCKS = 16
+HEADER_BYTES = 4096
+BLOCK_BYTES = 4096
+MAX_TAR_MEMBERS = 32
+MAX_FDT_PROP_BYTES = 256
+
+# offsets vendor headers commonly pad the real payload to
+PROBE_OFFSETS = (0x40, 0x100, 0x200, 0x400, 0x800, 0x1000, 0x10000, 0x20000)
+
+UIMAGE_MAGIC = b'\x27\x05\x19\x56'
+FDT_MAGIC = b'\xd0\x0d\xfe\xed'
+TRX_MAGICS = (b'HDR0', b'HDR1', b'HDR2')
+NETGEAR_CHK_MAGIC = b'*#$^'
+
+# IH_ARCH_* codes from U-Boot's include/image.h
+UIMAGE_ARCHES = {
+    2: 'ARM', 3: 'x86', 5: 'MIPS', 6: 'MIPS', 7: 'PowerPC',
+    22: 'AArch64', 24: 'x86_64', 26: 'RISC-V',
+}
+UIMAGE_COMPRESSION = {0: 'none', 1: 'gzip', 2: 'bzip2', 3: 'lzma', 4: 'lzo', 5: 'lz4', 6: 'zstd'}
+UIMAGE_TYPES = {2: 'kernel', 3: 'ramdisk', 4: 'multi', 5: 'firmware', 6: 'script', 7: 'filesystem', 8: 'flat_dt'}
+
+# values of the 'arch' property of FIT image nodes
+FIT_ARCHES = {
+    'arm': 'ARM', 'arm64': 'AArch64', 'mips': 'MIPS', 'mips64': 'MIPS',
+    'powerpc': 'PowerPC', 'ppc': 'PowerPC', 'x86': 'x86', 'x86_64': 'x86_64', 'riscv': 'RISC-V',
+}
+
+ELF_MACHINES = {
+    0x03: 'x86', 0x3E: 'x86_64', 0x28: 'ARM', 0xB7: 'AArch64',
+    0x08: 'MIPS', 0x14: 'PowerPC', 0x15: 'PowerPC64', 0xF3: 'RISC-V',
+}
+
+# byte order implied by an architecture on embedded boards; MIPS ships both
+ARCH_ENDIANNESS = {
+    'ARM': 'little', 'AArch64': 'little', 'x86': 'little', 'x86_64': 'little',
+    'RISC-V': 'little', 'PowerPC': 'big',
+}
+
+# magic at the start of a rootfs partition
+ROOTFS_MAGICS = {
+    b'hsqs': 'SquashFS',
+    b'sqsh': 'SquashFS',
+    b'UBI#': 'UBI',
+    b'\x85\x19\x03\x20': 'JFFS2',
+    b'\x19\x85\x20\x03': 'JFFS2',
+    b'070701': 'cpio',
+}
+
+# magic at the start of a kernel payload
+KERNEL_MAGICS = {
+    b'\x5d\x00\x00': 'lzma',
+    b'\x1f\x8b': 'gzip',
+    b'\xfd7zXZ': 'xz',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+}
+
+# evidence weights, roughly the probability the source is right on its own
+WEIGHT_HEADER_FIELD = 0.95
+WEIGHT_DTB_CPU = 0.85
+WEIGHT_ELF = 0.6
+WEIGHT_ARCH_INFERENCE = 0.7
+WEIGHT_MAGIC = 0.9
+
+
+def shannon_entropy(data: bytes) -> float:
+    """Returns the Shannon entropy of data in bits per byte."""
+    if not data:
+        return 0.0
+    entropy = 0.0
+    for x in range(256):
+        p_x = data.count(x) / len(data)
+        if p_x > 0:
+            entropy -= p_x * math.log2(p_x)
+    return entropy
+
+
+def fuse_evidence(evidence: List[Tuple[str, float]]) -> Tuple[Optional[str], float]:
+    """
+    Fuses (value, weight) observations into the best value and a calibrated confidence.
+
+    Support for each value combines its observations as independent
+    (noisy-OR); the best value's support is discounted by the strongest
+    competing value, so conflicting signals lower the confidence.
+    """
+    support: Dict[str, float] = {}
+    for value, weight in evidence:
+        support[value] = 1 - (1 - support.get(value, 0.0)) * (1 - weight)
+    if not support:
+        return None, 0.0
+    ranked = sorted(support.items(), key=lambda item: item[1], reverse=True)
+    best, best_support = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    return best, round(best_support * (1 - runner_up), 3)
+
+
+class BudgetedReader:
+    """
+    Module containing functions for reading an image under a byte and
+    time budget.
+    """
+
+    def __init__(self, path: str, max_bytes: int, time_budget_s: float):
+        """
+        Opens the image.
+
+        Args:
+            path: Image path
+            max_bytes: Bytes that may be read in total
+            time_budget_s: Seconds after which reads return nothing
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.deadline = time.monotonic() + time_budget_s
+        self.size = Path(path).stat().st_size
+        self.bytes_read = 0
+        self.exhausted = False
+        self._file = open(path, 'rb')
+
+    def read(self, offset: int, length: int) -> bytes:
+        """
+        Reads up to length bytes at offset, or nothing once the budget is spent.
+        """
+        if offset < 0 or offset >= self.size:
+            return b''
+        length = min(length, self.max_bytes - self.bytes_read)
+        if length <= 0 or time.monotonic() > self.deadline:
+            self.exhausted = True
+            return b''
+        self._file.seek(offset)
+        data = self._file.read(length)
+        self.bytes_read += len(data)
+        return data
+
+    def close(self) -> None:
+        """Closes the image."""
+        self._file.close()
+
+    def __enter__(self) -> 'BudgetedReader':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def parse_trx(header: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Parses a Broadcom TRX header (v1 or v2) into its length and partition offsets.
+    """
+    if len(header) < 28 or header[:4] not in TRX_MAGICS:
+        return None
+    length, crc, flag_version = struct.unpack('<III', header[4:16])
+    version = flag_version >> 16
+    count = 4 if version >= 2 else 3
+    if len(header) < 12 + 4 * (count + 1):
+        return None
+    offsets = struct.unpack(f'<{count}I', header[16:16 + 4 * count])
+    return {
+        'version': version,
+        'total_length': length,
+        'partitions': [o for o in offsets if 0 < o < length],
+    }
+
+
+def parse_uimage(header: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Parses a legacy U-Boot image header.
+    """
+    if len(header) < 64 or header[:4] != UIMAGE_MAGIC:
+        return None
+    size, load, entry = struct.unpack('>III', header[12:24])
+    os_byte, arch_byte, type_byte, comp_byte = header[28:32]
+    return {
+        'size': size,
+        'load_address': load,
+        'entry_point': entry,
+        'arch': UIMAGE_ARCHES.get(arch_byte),
+        'arch_code': arch_byte,
+        'image_type': UIMAGE_TYPES.get(type_byte, type_byte),
+        'compression': UIMAGE_COMPRESSION.get(comp_byte, comp_byte),
+        'name': header[32:64].split(b'\x00', 1)[0].decode('ascii', errors='replace'),
+    }
+
+
+def parse_netgear_chk(header: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Parses a Netgear CHK header into the offset of its payload.
+    """
+    if len(header) < 58 or header[:4] != NETGEAR_CHK_MAGIC:
+        return None
+    header_len, = struct.unpack('>I', header[4:8])
+    board_id = header[58:header_len].split(b'\x00', 1)[0].decode('ascii', errors='replace') if header_len > 58 else ''
+    return {'header_length': header_len, 'board_id': board_id}
+
+
+def iter_fdt_properties(reader: BudgetedReader, base: int) -> Iterator[Tuple[str, str, bytes, int, int]]:
+    """
+    Yields (node path, property name, value, value offset, value length)
+    from a flattened device tree or FIT at base. Values larger than
+    MAX_FDT_PROP_BYTES, such as embedded kernel images, are skipped
+    without being read and yielded as b''.
+    """
+    header = reader.read(base, 40)
+    if len(header) < 40 or header[:4] != FDT_MAGIC:
+        return
+    off_struct, off_strings = struct.unpack('>II', header[8:16])
+    size_strings, size_struct = struct.unpack('>II', header[32:40])
+    strings = reader.read(base + off_strings, min(size_strings, 16 * 1024))
+
+    def prop_name(offset: int) -> str:
+        return strings[offset:strings.find(b'\x00', offset)].decode('ascii', errors='replace')
+
+    # the structure block is read through a window so walking it costs a
+    # few large reads instead of one per token
+    window = [0, b'']
+
+    def read(pos: int, length: int) -> bytes:
+        start, data = window
+        if pos < start or pos + length > start + len(data):
+            window[0], window[1] = pos, reader.read(pos, max(length, 4096))
+            start, data = window
+        return data[pos - start:pos - start + length]
+
+    path: List[str] = []
+    pos = base + off_struct
+    end = pos + size_struct
+    while pos < end:
+        token_data = read(pos, 4)
+        if len(token_data) < 4:
+            return
+        token, = struct.unpack('>I', token_data)
+        pos += 4
+        if token == 1:  # FDT_BEGIN_NODE
+            name = read(pos, 64)
+            name = name[:name.find(b'\x00')] if b'\x00' in name else name
+            path.append(name.decode('ascii', errors='replace'))
+            pos += (len(name) + 4) & ~3
+        elif token == 2:  # FDT_END_NODE
+            if path:
+                path.pop()
+        elif token == 3:  # FDT_PROP
+            prop_header = read(pos, 8)
+            if len(prop_header) < 8:
+                return
+            length, name_offset = struct.unpack('>II', prop_header)
+            value = read(pos + 8, length) if length <= MAX_FDT_PROP_BYTES else b''
+            yield '/'.join(path) or '/', prop_name(name_offset), value, pos + 8, length
+            pos += 8 + ((length + 3) & ~3)
+        elif token == 4:  # FDT_NOP
+            continue
+        else:  # FDT_END or corrupt
+            return
+
+
+def _fdt_string(value: bytes) -> str:
+    """Decodes the first string of an FDT property value."""
+    return value.split(b'\x00', 1)[0].decode('ascii', errors='replace')
+
+
+def _dtb_cpu_arch(path: str, name: str, value: bytes) -> Optional[str]:
+    """Maps the compatible or model property of a device tree cpu node to an architecture."""
+    if not path.startswith('/cpus/') or name not in ('compatible', 'model'):
+        return None
+    text = value.replace(b'\x00', b' ').decode('ascii', errors='replace').lower()
+    if 'powerpc' in text or 'ppc' in text:
+        return 'PowerPC'
+    if 'mips' in text:
+        return 'MIPS'
+    if 'riscv' in text:
+        return 'RISC-V'
+    if any(core in text for core in ('cortex-a53', 'cortex-a55', 'cortex-a57', 'cortex-a72', 'cortex-a73', 'armv8')):
+        return 'AArch64'
+    if 'arm,' in text:
+        return 'ARM'
+    return None
+
+
+class Triage:
+    """
+    Module containing functions for classifying a firmware image from
+    its headers and sampled blocks under a budget.
+    """
+
+    def __init__(self, firmware_path: str, max_bytes: int = TRIAGE_MAX_BYTES,
+                 time_budget_s: float = TRIAGE_TIME_BUDGET_S, sample_blocks: int = TRIAGE_SAMPLE_BLOCKS):
+        """
+        Initializes the triage of one image.
+
+        Args:
+            firmware_path: Path to the firmware image
+            max_bytes: Bytes that may be read in total
+            time_budget_s: Seconds after which no further reads are made
+            sample_blocks: Number of evenly spaced blocks sampled for entropy and ELF headers
+        """
+        self.firmware_path = str(firmware_path)
+        self.max_bytes = max_bytes
+        self.time_budget_s = time_budget_s
+        self.sample_blocks = sample_blocks
+        self.layers: List[Dict[str, Any]] = []
+        self.evidence: Dict[str, List[Tuple[str, float]]] = {'architecture': [], 'endianness': [], 'rootfs': []}
+        self.sources: List[str] = []
+
+    def _observe(self, field: str, value: Optional[str], weight: float, source: str) -> None:
+        """Records one piece of evidence for a field."""
+        if value:
+            self.evidence[field].append((value, weight))
+            self.sources.append(f"{field}={value}:{source}")
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Classifies the image.
+
+        Returns:
+            Dictionary with container, architecture, endianness, rootfs and
+            encryption verdicts, an overall confidence and budget usage
+        """
+        start = time.monotonic()
+        with BudgetedReader(self.firmware_path, self.max_bytes, self.time_budget_s) as reader:
+            header = reader.read(0, HEADER_BYTES)
+            structured = self._classify_payload(reader, 0, header, reader.size, depth=0)
+            entropies = self._sample_blocks(reader, header)
+            result = self._verdict(structured, header, entropies)
+            result.update({
+                'bytes_read': reader.bytes_read,
+                'elapsed_ms': round((time.monotonic() - start) * 1000, 2),
+                'budget_exhausted': reader.exhausted,
+            })
+        return result
+
+    def _classify_payload(self, reader: BudgetedReader, offset: int, data: bytes, size: int, depth: int) -> bool:
+        """
+        Classifies a payload of size bytes, probing the usual padding
+        offsets inside it when it starts with an unknown vendor header.
+        """
+        if self._classify(reader, offset, data, depth):
+            return True
+        found = False
+        for probe in PROBE_OFFSETS:
+            if probe + 64 <= size:
+                found |= self._classify(reader, offset + probe, reader.read(offset + probe, 64), depth + 1)
+        return found
+
+    def _classify(self, reader: BudgetedReader, offset: int, data: bytes, depth: int) -> bool:
+        """
+        Recognizes the structure starting at offset, recursing into
+        payloads. Returns True if anything was recognized.
+        """
+        if depth > 4 or len(data) < 4:
+            return False
+
+        trx = parse_trx(data)
+        if trx:
+            self.layers.append({'type': 'TRX', 'offset': offset, **trx})
+            bounds = trx['partitions'] + [trx['total_length']]
+            for partition, partition_end in zip(bounds, bounds[1:]):
+                self._classify_payload(reader, offset + partition, reader.read(offset + partition, 64),
+                                       partition_end - partition, depth + 1)
+            return True
+
+        chk = parse_netgear_chk(data if len(data) >= 256 else reader.read(offset, 256))
+        if chk:
+            self.layers.append({'type': 'CHK', 'offset': offset, **chk})
+            payload = offset + chk['header_length']
+            self._classify_payload(reader, payload, reader.read(payload, 64), reader.size - payload, depth + 1)
+            return True
+
+        uimage = parse_uimage(data if len(data) >= 64 else reader.read(offset, 64))
+        if uimage:
+            self.layers.append({'type': 'uImage', 'offset': offset, **uimage})
+            self._observe('architecture', uimage['arch'], WEIGHT_HEADER_FIELD, f"uImage@{offset}")
+            # OpenWrt appends the rootfs right after the kernel or on the next erase block
+            kernel_end = offset + 64 + uimage['size']
+            for candidate in (kernel_end, (kernel_end + 0xFFFF) & ~0xFFFF):
+                if self._classify_rootfs(reader, candidate, reader.read(candidate, 8)):
+                    break
+            return True
+
+        if data[:4] == FDT_MAGIC:
+            self._classify_fdt(reader, offset)
+            return True
+
+        tar_magic = data[257:262] if len(data) >= 262 else reader.read(offset + 257, 5)
+        if tar_magic == b'ustar':
+            self._classify_tar(reader, offset, depth)
+            return True
+
+        if data[:4] == b'\x7fELF':
+            self.layers.append({'type': 'ELF', 'offset': offset})
+            self._observe_elf(data, f"ELF@{offset}", WEIGHT_HEADER_FIELD)
+            return True
+
+        if self._classify_rootfs(reader, offset, data):
+            return True
+
+        for magic, compression in KERNEL_MAGICS.items():
+            if data.startswith(magic):
+                self.layers.append({'type': 'compressed', 'offset': offset, 'compression': compression})
+                return True
+        return False
+
+    def _classify_rootfs(self, reader: BudgetedReader, offset: int, data: bytes) -> bool:
+        """Recognizes a rootfs partition starting at offset."""
+        for magic, fs_type in ROOTFS_MAGICS.items():
+            if data.startswith(magic):
+                self.layers.append({'type': fs_type, 'offset': offset})
+                self._observe('rootfs', fs_type, WEIGHT_MAGIC, f"magic@{offset}")
+                return True
+        if reader.read(offset + 0x438, 2) == b'\x53\xef':
+            self.layers.append({'type': 'ext2/3/4', 'offset': offset})
+            self._observe('rootfs', 'ext2/3/4', WEIGHT_MAGIC, f"magic@{offset + 0x438}")
+            return True
+        return False
+
+    def _classify_fdt(self, reader: BudgetedReader, offset: int) -> None:
+        """Reads the architecture out of a FIT image or device tree at offset."""
+        is_fit = False
+        for path, name, value, _, _ in iter_fdt_properties(reader, offset):
+            if path.startswith('/images'):
+                is_fit = True
+                if name == 'arch':
+                    self._observe('architecture', FIT_ARCHES.get(_fdt_string(value).lower()),
+                                  WEIGHT_HEADER_FIELD, f"FIT@{offset}")
+                elif name == 'type' and _fdt_string(value) in ('filesystem', 'ramdisk'):
+                    self._observe('rootfs', 'initramfs', 0.5, f"FIT@{offset}")
+            else:
+                self._observe('architecture', _dtb_cpu_arch(path, name, value), WEIGHT_DTB_CPU, f"DTB@{offset}")
+        self.layers.append({'type': 'FIT' if is_fit else 'DTB', 'offset': offset})
+
+    def _classify_tar(self, reader: BudgetedReader, offset: int, depth: int) -> None:
+        """Walks tar member headers (OpenWrt sysupgrade images) and classifies each member's payload."""
+        members: List[str] = []
+        self.layers.append({'type': 'TAR', 'offset': offset, 'members': members})
+        pos = offset
+        for _ in range(MAX_TAR_MEMBERS):
+            member = reader.read(pos, 512)
+            if len(member) < 512 or member[257:262] != b'ustar':
+                break
+            name = member[:100].split(b'\x00', 1)[0].decode('utf-8', errors='replace')
+            try:
+                size = int(member[124:136].split(b'\x00', 1)[0].strip() or b'0', 8)
+            except ValueError:
+                break
+            data_offset = pos + 512
+            members.append(name)
+            if size > 0:
+                self._classify_payload(reader, data_offset, reader.read(data_offset, 64), size, depth + 1)
+            pos = data_offset + ((size + 511) & ~511)
+
+    def _observe_elf(self, data: bytes, source: str, weight: float) -> None:
+        """Records architecture and byte order from an ELF header."""
+        if len(data) < 20 or data[4] not in (1, 2) or data[5] not in (1, 2) or data[6] != 1:
+            return
+        byte_order = '<' if data[5] == 1 else '>'
+        machine, = struct.unpack(f'{byte_order}H', data[18:20])
+        self._observe('architecture', ELF_MACHINES.get(machine), weight, source)
+        self._observe('endianness', 'little' if data[5] == 1 else 'big', weight, source)
+
+    def _sample_blocks(self, reader: BudgetedReader, header: bytes) -> List[float]:
+        """
+        Reads evenly spaced blocks, returning their entropies and
+        recording any ELF headers they contain.
+        """
+        entropies = [shannon_entropy(header)] if header else []
+        if reader.size <= HEADER_BYTES or self.sample_blocks <= 0:
+            return entropies
+        stride = (reader.size - HEADER_BYTES) // self.sample_blocks
+        for i in range(self.sample_blocks):
+            offset = HEADER_BYTES + i * stride
+            block = reader.read(offset, BLOCK_BYTES)
+            if not block:
+                break
+            entropies.append(shannon_entropy(block))
+            elf = block.find(b'\x7fELF')
+            if elf != -1:
+                self._observe_elf(block[elf:elf + 20], f"sampled_ELF@{offset + elf}", WEIGHT_ELF)
+        return entropies
+
+    def _verdict(self, structured: bool, header: bytes, entropies: List[float]) -> Dict[str, Any]:
+        """Fuses the collected evidence into the triage result."""
+        arch, arch_confidence = fuse_evidence(self.evidence['architecture'])
+        if arch in ARCH_ENDIANNESS:
+            self._observe('endianness', ARCH_ENDIANNESS[arch], WEIGHT_ARCH_INFERENCE * arch_confidence, 'inferred_from_arch')
+        endianness, endian_confidence = fuse_evidence(self.evidence['endianness'])
+        rootfs, rootfs_confidence = fuse_evidence(self.evidence['rootfs'])
+
+        mean_entropy = sum(entropies) / len(entropies) if entropies else 0.0
+        min_entropy = min(entropies) if entropies else 0.0
+        if structured:
+            encryption = {'verdict': 'not_encrypted', 'confidence': 0.9 if rootfs else 0.7}
+        elif entropies and min_entropy > 7.9:
+            # headerless data this uniform is encrypted or one compressed stream
+            encryption = {'verdict': 'encrypted', 'confidence': 0.7}
+        elif entropies and mean_entropy < 6.0:
+            encryption = {'verdict': 'not_encrypted', 'confidence': 0.6}
+        else:
+            encryption = {'verdict': 'unknown', 'confidence': 0.0}
+        encryption.update({'mean_entropy': round(mean_entropy, 3), 'min_entropy': round(min_entropy, 3),
+                           'blocks': len(entropies)})
+
+        container = self.layers[0]['type'] if self.layers else None
+        confidences = [arch_confidence, endian_confidence, rootfs_confidence, encryption['confidence']]
+        return {
+            'path': self.firmware_path,
+            'size': Path(self.firmware_path).stat().st_size,
+            'container': container,
+            'layers': self.layers,
+            'architecture': {'value': arch or 'unknown', 'confidence': arch_confidence},
+            'endianness': {'value': endianness or 'unknown', 'confidence': endian_confidence},
+            'rootfs': {'value': rootfs or 'unknown', 'confidence': rootfs_confidence},
+            'encryption': encryption,
+            'confidence': round(sum(confidences) / len(confidences), 3),
+            'evidence': self.sources,
+        }
+
+
+def triage_firmware(firmware_path: str, max_bytes: int = TRIAGE_MAX_BYTES,
+                    time_budget_s: float = TRIAGE_TIME_BUDGET_S,
+                    sample_blocks: int = TRIAGE_SAMPLE_BLOCKS) -> Dict[str, Any]:
+    """
+    Triages one image; see Triage.
+    """
+    try:
+        return Triage(firmware_path, max_bytes, time_budget_s, sample_blocks).run()
+    except (OSError, struct.error) as e:
+        return {'path': str(firmware_path), 'error': str(e)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m firmaforge.triage."""
+    parser = argparse.ArgumentParser(description="Classify firmware images from headers and sampled blocks")
+    parser.add_argument('paths', nargs='+', help="images or directories of images")
+    parser.add_argument('--max-bytes', type=int, default=TRIAGE_MAX_BYTES)
+    parser.add_argument('--time-budget', type=float, default=TRIAGE_TIME_BUDGET_S)
+    parser.add_argument('--sample-blocks', type=int, default=TRIAGE_SAMPLE_BLOCKS)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    files = []
+    for path in args.paths:
+        p = Path(path)
+        files.extend(sorted(f for f in p.iterdir() if f.is_file()) if p.is_dir() else [p])
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = pool.map(triage_firmware, [str(f) for f in files], [args.max_bytes] * len(files),
+                           [args.time_budget] * len(files), [args.sample_blocks] * len(files), chunksize=16)
+        for result in results:
+            sys.stdout.write(json.dumps(result) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
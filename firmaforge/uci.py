@@ -0,0 +1,386 @@
+"""
+uci.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A UCI configuration module that tokenizes and parses every file under
+/etc/config of an extracted rootfs once, into packages of typed and
+anonymous sections with option and list values, and caches the parsed
+tree so all analyzers of an image read the same structure.
+"""
+
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+
+# parsed trees kept for the most recently analyzed rootfs directories
+UCI_CACHE_SIZE = 8
+
+UCI_TRUE = {'1', 'yes', 'on', 'true', 'enabled'}
+UCI_FALSE = {'0', 'no', 'off', 'false', 'disabled'}
+
+OptionValue = Union[str, List[str]]
+
+
+class UciSyntaxError(ValueError):
+    """Raised by tokenize_line for an unterminated quote or trailing backslash."""
+
+
+def tokenize_line(line: str, pending: Optional[Tuple[List[str], List[str], str]] = None
+                  ) -> Tuple[List[str], Optional[Tuple[List[str], List[str], str]]]:
+    """
+    Splits one line of a UCI file into words the way libuci does:
+    whitespace separates words, '#' starts a comment, single quotes are
+    literal, double quotes and bare words honour backslash escapes, and
+    quoted and unquoted parts next to each other form one word.
+
+    Args:
+        line: Line without its newline
+        pending: State returned for the previous line if it ended inside a quote
+
+    Returns:
+        (words, pending) where pending is not None if a quote is still open
+    """
+    words, current, quote = pending if pending is not None else ([], [], '')
+    started = pending is not None
+    i, n = 0, len(line)
+    while i < n:
+        c = line[i]
+        if quote:
+            if c == quote:
+                quote = ''
+            elif c == '\\' and quote == '"' and i + 1 < n:
+                i += 1
+                current.append(line[i])
+            else:
+                current.append(c)
+        elif c in ' \t\r':
+            if started:
+                words.append(''.join(current))
+                current, started = [], False
+        elif c == '#':
+            break
+        elif c in '\'"':
+            quote, started = c, True
+        elif c == '\\':
+            if i + 1 >= n:
+                raise UciSyntaxError("trailing backslash")
+            i += 1
+            current.append(line[i])
+            started = True
+        else:
+            current.append(c)
+            started = True
+        i += 1
+
+    if quote:
+        # quoted values may span lines; the newline is part of the value
+        current.append('\n')
+        return words, (words, current, quote)
+    if started:
+        words.append(''.join(current))
+    return words, None
+
+
+class UciSection:
+    """
+    Module containing functions for reading the options of one
+    config section.
+    """
+
+    def __init__(self, section_type: str, name: Optional[str], index: int):
+        """
+        Initializes an empty section.
+
+        Args:
+            section_type: Section type, e.g. 'rule'
+            name: Section name, or None for an anonymous section
+            index: Position among the package's sections of the same type
+        """
+        self.type = section_type
+        self.name = name
+        self.index = index
+        self.options: Dict[str, OptionValue] = {}
+
+    @property
+    def ref(self) -> str:
+        """Returns the section's name, or '@type[index]' if it is anonymous."""
+        return self.name if self.name is not None else f"@{self.type}[{self.index}]"
+
+    def get(self, option: str, default: Optional[str] = None) -> Optional[str]:
+        """
+        Returns an option's value; list values are joined with spaces.
+        """
+        value = self.options.get(option)
+        if value is None:
+            return default
+        return ' '.join(value) if isinstance(value, list) else value
+
+    def get_list(self, option: str) -> List[str]:
+        """
+        Returns a list option's values, or a plain option's space-separated words.
+        """
+        value = self.options.get(option)
+        if value is None:
+            return []
+        return list(value) if isinstance(value, list) else value.split()
+
+    def get_bool(self, option: str, default: bool = False) -> bool:
+        """
+        Returns a boolean option ('1', 'yes', 'on', 'true', 'enabled' and their opposites).
+        """
+        value = self.get(option)
+        if value is None:
+            return default
+        value = value.lower()
+        if value in UCI_TRUE:
+            return True
+        if value in UCI_FALSE:
+            return False
+        return default
+
+    def __contains__(self, option: str) -> bool:
+        return option in self.options
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the section as a JSON-serializable dictionary.
+        """
+        return {'type': self.type, 'name': self.name, 'ref': self.ref, 'options': dict(self.options)}
+
+
+class UciPackage:
+    """
+    Module containing functions for looking up the sections of one
+    config file.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initializes an empty package.
+        """
+        self.name = name
+        self.sections: List[UciSection] = []
+        self.errors: List[Dict[str, Any]] = []
+        self._named: Dict[str, UciSection] = {}
+        self._type_counts: Dict[str, int] = {}
+
+    def add_section(self, section_type: str, name: Optional[str]) -> UciSection:
+        """
+        Starts a section; a repeated named section continues the existing one.
+        """
+        if name is not None and name in self._named:
+            section = self._named[name]
+            section.type = section_type
+            return section
+        index = self._type_counts.get(section_type, 0)
+        self._type_counts[section_type] = index + 1
+        section = UciSection(section_type, name, index)
+        self.sections.append(section)
+        if name is not None:
+            self._named[name] = section
+        return section
+
+    def merge(self, other: 'UciPackage') -> None:
+        """
+        Appends another parse of the same package as if its file followed
+        this one: named sections continue existing ones, list options are
+        extended, and anonymous sections are numbered after the existing
+        sections of their type.
+        """
+        for source in other.sections:
+            section = self.add_section(source.type, source.name)
+            for option, value in source.options.items():
+                existing = section.options.get(option)
+                if isinstance(value, list) and isinstance(existing, list):
+                    existing.extend(value)
+                else:
+                    section.options[option] = list(value) if isinstance(value, list) else value
+        self.errors.extend(other.errors)
+
+    def section(self, name: str) -> Optional[UciSection]:
+        """
+        Returns a named section, or an anonymous one by '@type[index]'.
+        """
+        if name.startswith('@') and name.endswith(']') and '[' in name:
+            section_type, _, index = name[1:-1].partition('[')
+            matches = self.sections_of(section_type)
+            try:
+                return matches[int(index)]
+            except (ValueError, IndexError):
+                return None
+        return self._named.get(name)
+
+    def sections_of(self, section_type: str) -> List[UciSection]:
+        """
+        Returns every section of a type in file order.
+        """
+        return [s for s in self.sections if s.type == section_type]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the package as a JSON-serializable dictionary.
+        """
+        return {'name': self.name, 'sections': [s.to_dict() for s in self.sections], 'errors': list(self.errors)}
+
+
+def parse_uci(text: str, package_name: str) -> Dict[str, UciPackage]:
+    """
+    Parses the text of a UCI file.
+
+    Malformed lines are recorded in the package's errors and skipped,
+    as are options that appear before any 'config' line.
+
+    Args:
+        text: File contents
+        package_name: Package name (the file name) unless a 'package' line overrides it
+
+    Returns:
+        Mapping of package name to parsed package
+    """
+    packages = {package_name: UciPackage(package_name)}
+    package = packages[package_name]
+    section: Optional[UciSection] = None
+    pending = None
+    start_line = 0
+
+    for line_number, line in enumerate(text.splitlines(), 1):
+        if pending is None:
+            start_line = line_number
+        try:
+            words, pending = tokenize_line(line, pending)
+        except UciSyntaxError as e:
+            package.errors.append({'line': line_number, 'error': str(e)})
+            pending = None
+            continue
+        if pending is not None or not words:
+            continue
+
+        keyword, args = words[0], words[1:]
+        if keyword == 'package' and len(args) == 1:
+            package = packages.setdefault(args[0], UciPackage(args[0]))
+            section = None
+        elif keyword == 'config' and len(args) in (1, 2):
+            section = package.add_section(args[0], args[1] if len(args) == 2 and args[1] else None)
+        elif keyword in ('option', 'list') and len(args) in (1, 2):
+            if section is None:
+                package.errors.append({'line': start_line, 'error': f"'{keyword}' outside of a section"})
+                continue
+            value = args[1] if len(args) == 2 else ''
+            if keyword == 'list':
+                existing = section.options.get(args[0])
+                if isinstance(existing, list):
+                    existing.append(value)
+                else:
+                    section.options[args[0]] = [value]
+            else:
+                section.options[args[0]] = value
+        else:
+            package.errors.append({'line': start_line, 'error': f"unexpected '{keyword}' statement"})
+
+    if pending is not None:
+        package.errors.append({'line': start_line, 'error': "unterminated quote"})
+    return packages
+
+
+class UciConfig:
+    """
+    Module containing functions for querying the parsed /etc/config
+    tree of a rootfs.
+    """
+
+    def __init__(self, packages: Optional[Dict[str, UciPackage]] = None):
+        """
+        Initializes the configuration from parsed packages.
+        """
+        self.packages: Dict[str, UciPackage] = packages if packages is not None else {}
+
+    @classmethod
+    def load(cls, config_dir: Path) -> 'UciConfig':
+        """
+        Parses every regular file in a config directory.
+        """
+        config = cls()
+        config_dir = Path(config_dir)
+        if not config_dir.is_dir():
+            return config
+        for path in sorted(config_dir.iterdir()):
+            if path.name.startswith('.') or path.is_symlink() or not path.is_file():
+                continue
+            try:
+                text = path.read_text(errors='replace')
+            except OSError:
+                continue
+            for name, package in parse_uci(text, path.name).items():
+                if name in config.packages:
+                    config.packages[name].merge(package)
+                else:
+                    config.packages[name] = package
+        return config
+
+    def package(self, name: str) -> Optional[UciPackage]:
+        """
+        Returns a package by name.
+        """
+        return self.packages.get(name)
+
+    def sections(self, package: str, section_type: Optional[str] = None) -> List[UciSection]:
+        """
+        Returns a package's sections, optionally only those of one type.
+        """
+        parsed = self.packages.get(package)
+        if parsed is None:
+            return []
+        return parsed.sections_of(section_type) if section_type is not None else list(parsed.sections)
+
+    def iter_sections(self) -> Iterator[Tuple[str, UciSection]]:
+        """
+        Iterates over (package name, section) pairs of every package.
+        """
+        for name in sorted(self.packages):
+            for section in self.packages[name].sections:
+                yield name, section
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the whole configuration as a JSON-serializable dictionary.
+        """
+        return {name: self.packages[name].to_dict() for name in sorted(self.packages)}
+
+
+_uci_cache: 'OrderedDict[str, Tuple[tuple, UciConfig]]' = OrderedDict()
+
+
+def _config_signature(config_dir: Path) -> tuple:
+    """Returns the names, sizes and mtimes of a config directory's files."""
+    signature = []
+    try:
+        for entry in os.scandir(config_dir):
+            st = entry.stat(follow_symlinks=False)
+            signature.append((entry.name, st.st_size, st.st_mtime_ns))
+    except OSError:
+        return ()
+    return tuple(sorted(signature))
+
+
+def load_uci(rootfs_dir: Path) -> UciConfig:
+    """
+    Returns the parsed /etc/config of a rootfs, parsing it only when the
+    directory's files changed since the last call.
+    """
+    config_dir = Path(rootfs_dir) / "etc" / "config"
+    key = str(config_dir.resolve()) if config_dir.exists() else str(config_dir)
+    signature = _config_signature(config_dir)
+    cached = _uci_cache.get(key)
+    if cached is not None and cached[0] == signature:
+        _uci_cache.move_to_end(key)
+        return cached[1]
+
+    config = UciConfig.load(config_dir)
+    _uci_cache[key] = (signature, config)
+    _uci_cache.move_to_end(key)
+    while len(_uci_cache) > UCI_CACHE_SIZE:
+        _uci_cache.popitem(last=False)
+    return config
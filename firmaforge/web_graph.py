@@ -0,0 +1,445 @@
+"""
+web_graph.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A web handler graph module that links the Lua, ucode and shell scripts
+of a rootfs by their require, import, include, template and source
+edges, marks the files HTTP requests enter through (CGI programs,
+uhttpd handlers, rpcd plugins and LuCI dispatch targets), and answers
+which files a request can reach. Files are listed from the image's
+RootfsIndex, per-file edges are cached by content hash and whole graphs
+by the hashes of all their files, and reading scripts counts against
+the web pass's scan budget.
+"""
+
+import fnmatch
+import json
+import os
+import posixpath
+import re
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from .rootfs_index import RootfsIndex
+from .scan_engine import ScanBudget
+from .script_tokenizer import LUA, SH, UCODE, detect_language
+from .uci import load_uci
+
+GRAPH_DIRS = ('www', 'usr/www', 'cgi-bin', 'usr/lib/lua', 'usr/share/ucode', 'usr/share/rpcd', 'usr/libexec/rpcd')
+SKIP_SUFFIXES = {'.js', '.css', '.png', '.gif', '.jpg', '.jpeg', '.svg', '.ico', '.json', '.po', '.lmo', '.so',
+                 '.woff', '.woff2', '.ttf'}
+GRAPH_MAX_BYTES = 1024 * 1024
+MAX_SYMLINK_HOPS = 8
+
+# where requests enter
+CGI_DIRS = ('www/cgi-bin', 'usr/www/cgi-bin', 'cgi-bin')
+RPCD_PLUGIN_DIRS = ('usr/share/rpcd/ucode', 'usr/libexec/rpcd')
+UHTTPD_HANDLER_OPTIONS = ('lua_prefix', 'ucode_prefix')
+
+# LuCI dispatchers load every controller and the targets of every menu.d entry
+DISPATCHERS = ('usr/share/ucode/luci/dispatcher.uc', 'usr/lib/lua/luci/dispatcher.lua')
+CONTROLLER_DIRS = ('usr/lib/lua/luci/controller', 'usr/share/ucode/luci/controller')
+MENU_DIR = 'usr/share/luci/menu.d'
+
+LUA_ROOT = 'usr/lib/lua'
+UCODE_ROOT = 'usr/share/ucode'
+TEMPLATE_DIRS = (('usr/share/ucode/luci/template', '.ut'), ('usr/lib/lua/luci/view', '.htm'))
+CBI_DIR = 'usr/lib/lua/luci/model/cbi'
+
+# per-file references and whole graphs kept across images
+REFERENCE_CACHE_SIZE = 16384
+GRAPH_CACHE_SIZE = 8
+
+REFERENCE_PATTERNS = {
+    LUA: [
+        ('module', re.compile(r'''\brequire\s*\(?\s*["'](?P<name>[\w.\-]+)["']''')),
+        ('template', re.compile(r'''\b(?:template|render)\s*\(\s*["'](?P<name>[\w./\-]+)["']''')),
+        ('template', re.compile(r'<%\+\s*(?P<name>[\w./\-]+)\s*%>')),
+        ('cbi', re.compile(r'''\b(?:cbi|form)\s*\(\s*["'](?P<name>[\w./\-]+)["']''')),
+    ],
+    UCODE: [
+        ('module', re.compile(r'''\bimport\s[^;'"`]*?\bfrom\s*['"](?P<name>[^'"\n]+)['"]''')),
+        ('module', re.compile(r'''\bimport\s*['"](?P<name>[^'"\n]+)['"]''')),
+        ('module', re.compile(r'''\brequire\s*\(\s*['"](?P<name>[^'"\n]+)['"]''')),
+        ('template', re.compile(r'''\b(?:include|render)\s*\(\s*(?P<quote>['"`])(?P<name>[^'"`\n]+)(?P=quote)''')),
+    ],
+    SH: [
+        ('source', re.compile(r'''^[ \t]*(?:\.|source)[ \t]+["']?(?P<name>[^\s"';&|]+)''', re.M)),
+    ],
+}
+TEMPLATE_VAR = re.compile(r'\$\{[^}]*\}')
+SH_ROOT_VAR = re.compile(r'^\$\{?IPKG_INSTROOT\}?')
+
+Reference = Tuple[str, str]
+
+
+def extract_references(text: str, language: str) -> List[Reference]:
+    """
+    Finds the modules, templates and scripts a file loads.
+
+    Names built from template literals keep their static parts, with
+    each ${...} replaced by '*'.
+
+    Args:
+        text: File contents
+        language: 'sh', 'lua' or 'ucode'
+
+    Returns:
+        (kind, name) pairs in order of first appearance
+    """
+    references = []
+    seen = set()
+    for kind, pattern in REFERENCE_PATTERNS.get(language, ()):
+        for m in pattern.finditer(text):
+            reference = (kind, TEMPLATE_VAR.sub('*', m.group('name')))
+            if reference not in seen:
+                seen.add(reference)
+                references.append(reference)
+    return references
+
+
+class WebGraph:
+    """
+    Module containing functions for querying which scripts of a rootfs
+    HTTP requests reach.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty graph.
+        """
+        self.nodes: Dict[str, Optional[str]] = {}
+        self.edges: Dict[str, List[str]] = {}
+        self.entry_points: Dict[str, str] = {}
+        # False when the scan budget ran out before every script was read
+        self.complete = True
+        self._parents: Optional[Dict[str, Optional[str]]] = None
+
+    def add_node(self, rel_path: str, language: Optional[str] = None) -> None:
+        """
+        Adds a file, keeping a language recorded earlier.
+        """
+        if self.nodes.get(rel_path) is None:
+            self.nodes[rel_path] = language
+
+    def add_edge(self, source: str, target: str) -> None:
+        """
+        Adds an edge from a file to a file it loads.
+        """
+        self.add_node(source)
+        self.add_node(target)
+        targets = self.edges.setdefault(source, [])
+        if target != source and target not in targets:
+            targets.append(target)
+        self._parents = None
+
+    def add_entry_point(self, rel_path: str, kind: str) -> None:
+        """
+        Marks a file as receiving requests directly.
+        """
+        self.add_node(rel_path)
+        self.entry_points.setdefault(rel_path, kind)
+        self._parents = None
+
+    def reachable(self) -> Dict[str, Optional[str]]:
+        """
+        Returns every file reachable from an entry point, mapped to the
+        file it was first reached from (None for entry points).
+        """
+        if self._parents is None:
+            parents: Dict[str, Optional[str]] = {}
+            queue = deque()
+            for entry in sorted(self.entry_points):
+                parents[entry] = None
+                queue.append(entry)
+            while queue:
+                current = queue.popleft()
+                for target in self.edges.get(current, ()):
+                    if target not in parents:
+                        parents[target] = current
+                        queue.append(target)
+            self._parents = parents
+        return self._parents
+
+    def is_reachable(self, rel_path: str) -> bool:
+        """
+        Checks whether a request can reach a file.
+        """
+        return rel_path in self.reachable()
+
+    def path_to(self, rel_path: str) -> List[str]:
+        """
+        Returns the shortest chain of files from an entry point to a file,
+        or an empty list if it is unreachable.
+        """
+        parents = self.reachable()
+        if rel_path not in parents:
+            return []
+        path = [rel_path]
+        while parents[path[-1]] is not None:
+            path.append(parents[path[-1]])
+        return path[::-1]
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns the graph's size and entry points.
+        """
+        return {
+            'files': len(self.nodes),
+            'edges': sum(len(targets) for targets in self.edges.values()),
+            'entry_points': [{'file': path, 'kind': self.entry_points[path]} for path in sorted(self.entry_points)],
+            'reachable_files': len(self.reachable()),
+            'complete': self.complete,
+        }
+
+
+_reference_cache: 'OrderedDict[Tuple[str, str], Tuple[Optional[str], List[Reference]]]' = OrderedDict()
+_graph_cache: 'OrderedDict[str, Tuple[tuple, WebGraph]]' = OrderedDict()
+
+
+def _remember(cache: OrderedDict, key: Any, value: Any, size: int) -> None:
+    """Stores a value in an LRU cache, evicting the oldest entries."""
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > size:
+        cache.popitem(last=False)
+
+
+def _read_head(full_path: Path) -> Optional[bytes]:
+    """Reads up to GRAPH_MAX_BYTES of a file, or None if it cannot be read."""
+    try:
+        with open(full_path, 'rb') as f:
+            return f.read(GRAPH_MAX_BYTES)
+    except OSError:
+        return None
+
+
+def _file_references(rootfs_dir: Path, source: str, rel_path: str,
+                     digest: str) -> Tuple[Optional[str], List[Reference]]:
+    """Reads a file and returns its language and references, caching them by path and content hash."""
+    data = _read_head(rootfs_dir / source) or b''
+    language, references = None, []
+    if b'\x00' not in data[:1024]:
+        text = data.decode('utf-8', errors='ignore')
+        language = detect_language(rel_path, text[:256])
+        if language is not None:
+            references = extract_references(text, language)
+    _remember(_reference_cache, (rel_path, digest), (language, references), REFERENCE_CACHE_SIZE)
+    return language, references
+
+
+def _resolve_entry(index: RootfsIndex, rel_path: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Follows symlinks inside the indexed rootfs, returning the final path and its entry."""
+    entry = index.get(rel_path)
+    for _ in range(MAX_SYMLINK_HOPS):
+        if entry is None or entry['type'] != 'symlink':
+            break
+        target = entry['target']
+        rel_path = posixpath.normpath(target.lstrip('/') if target.startswith('/')
+                                      else posixpath.join(posixpath.dirname(rel_path), target))
+        entry = index.get(rel_path)
+    return rel_path, entry
+
+
+def _is_file(index: RootfsIndex, rel_path: str) -> bool:
+    """Checks whether a rootfs path is a regular file or a symlink to one."""
+    entry = _resolve_entry(index, rel_path)[1]
+    return entry is not None and entry['type'] == 'file'
+
+
+def _graph_files(index: RootfsIndex) -> Dict[str, Tuple[str, str, int]]:
+    """Maps the files under GRAPH_DIRS that may hold scripts to (path read, digest, size)."""
+    prefixes = tuple(d + '/' for d in GRAPH_DIRS)
+    found = {}
+    for rel_path in sorted(index.entries):
+        if not rel_path.startswith(prefixes) or os.path.splitext(rel_path)[1].lower() in SKIP_SUFFIXES:
+            continue
+        source, entry = _resolve_entry(index, rel_path)
+        if entry is not None and entry['type'] == 'file' and entry.get('sha256'):
+            found[rel_path] = (source, entry['sha256'], entry['size'])
+    return found
+
+
+def _uhttpd_handlers(rootfs_dir: Path) -> List[Tuple[str, str]]:
+    """Returns the (option, handler path) pairs uhttpd runs scripts through."""
+    handlers = []
+    for section in load_uci(rootfs_dir).sections('uhttpd', 'uhttpd'):
+        for option in UHTTPD_HANDLER_OPTIONS:
+            for value in section.get_list(option):
+                prefix, sep, handler = value.partition('=')
+                if not sep:
+                    # older configs name the handler in a separate option
+                    handler = section.get(option.replace('prefix', 'handler')) or ''
+                if handler:
+                    handlers.append((option, handler.lstrip('/')))
+    return handlers
+
+
+def _menu_files(index: RootfsIndex) -> tuple:
+    """Returns the (path, digest) pairs of LuCI's menu.d files."""
+    return tuple((entry['path'], entry['sha256']) for entry in sorted(index.files(), key=lambda e: e['path'])
+                 if posixpath.dirname(entry['path']) == MENU_DIR and entry['path'].endswith('.json') and entry.get('sha256'))
+
+
+def _menu_targets(rootfs_dir: Path, menu_files: tuple) -> List[Reference]:
+    """Returns the dispatch targets of LuCI's menu.d entries."""
+    targets = []
+    for rel_path, _ in menu_files:
+        data = _read_head(rootfs_dir / rel_path)
+        if data is None:
+            continue
+        try:
+            menu = json.loads(data.decode('utf-8', errors='ignore'))
+        except ValueError:
+            continue
+        for node in menu.values() if isinstance(menu, dict) else ():
+            action = node.get('action') if isinstance(node, dict) else None
+            if not isinstance(action, dict):
+                continue
+            kind = action.get('type')
+            if kind == 'function' and action.get('module'):
+                targets.append(('ucode_module', action['module']))
+            elif kind == 'call' and action.get('module'):
+                targets.append(('lua_module', action['module']))
+            elif kind == 'template' and action.get('path'):
+                targets.append(('template', action['path']))
+            elif kind in ('cbi', 'form') and action.get('path'):
+                targets.append(('cbi', action['path']))
+    return targets
+
+
+def _module_candidates(name: str, rel_path: str, language: Optional[str]) -> List[str]:
+    """Returns the files a require or import of a module may load."""
+    if name.startswith(('./', '../', '/')):
+        base = name.lstrip('/') if name.startswith('/') else posixpath.join(posixpath.dirname(rel_path), name)
+        base = posixpath.normpath(base)
+        return [base, base + ('.lua' if language == LUA else '.uc')]
+    path = name.replace('.', '/')
+    if language == LUA:
+        return [f"{LUA_ROOT}/{path}.lua", f"{LUA_ROOT}/{path}/init.lua"]
+    return [f"{UCODE_ROOT}/{path}.uc"]
+
+
+def _template_candidates(name: str, rel_path: str) -> List[str]:
+    """Returns the template files an include or render may load."""
+    if name.startswith(('./', '../', '/')):
+        base = posixpath.normpath(name.lstrip('/') if name.startswith('/')
+                                  else posixpath.join(posixpath.dirname(rel_path), name))
+        return [base] + [base + suffix for _, suffix in TEMPLATE_DIRS]
+    return [f"{directory}/{name}{suffix}" for directory, suffix in TEMPLATE_DIRS]
+
+
+def _resolve(index: RootfsIndex, files: Dict[str, str], kind: str, name: str, rel_path: str,
+             language: Optional[str]) -> List[str]:
+    """Maps one reference to the rootfs files it loads."""
+    if kind == 'source':
+        name = SH_ROOT_VAR.sub('', name)
+        if '$' in name:
+            return []
+        target = posixpath.normpath(name.lstrip('/') if name.startswith('/')
+                                    else posixpath.join(posixpath.dirname(rel_path), name))
+        return [target] if target in files or _is_file(index, target) else []
+    if kind == 'module':
+        candidates = _module_candidates(name, rel_path, language)
+    elif kind == 'ucode_module':
+        candidates = _module_candidates(name, rel_path, UCODE)
+    elif kind == 'lua_module':
+        candidates = _module_candidates(name, rel_path, LUA)
+    elif kind == 'cbi':
+        candidates = [f"{CBI_DIR}/{name}.lua"]
+    else:
+        candidates = _template_candidates(name, rel_path)
+
+    resolved = []
+    for candidate in candidates:
+        if '*' in candidate:
+            resolved.extend(sorted(path for path in files if fnmatch.fnmatchcase(path, candidate)))
+        elif candidate in files:
+            resolved.append(candidate)
+            if kind != 'template':
+                break
+    return resolved
+
+
+def load_web_graph(rootfs_dir: Path, index: RootfsIndex, budget: Optional[ScanBudget] = None) -> WebGraph:
+    """
+    Returns the web handler graph of a rootfs, building it only when a
+    script, menu entry or uhttpd handler changed since the last call.
+
+    Args:
+        rootfs_dir: Path to the extracted rootfs
+        index: Hashed rootfs-relative RootfsIndex the files are listed from
+        budget: Optional scan budget that reading uncached scripts counts against;
+            a graph missing scripts it ran out on is marked incomplete and not cached
+
+    Returns:
+        WebGraph of the rootfs
+    """
+    rootfs_dir = Path(rootfs_dir)
+    graph_files = _graph_files(index)
+    files: Dict[str, str] = {rel_path: digest for rel_path, (_, digest, _) in graph_files.items()}
+    handlers = _uhttpd_handlers(rootfs_dir)
+    menu_files = _menu_files(index)
+    key = str(rootfs_dir.resolve()) if rootfs_dir.exists() else str(rootfs_dir)
+    signature = (tuple(sorted(files.items())), tuple(handlers), menu_files)
+    cached = _graph_cache.get(key)
+    if cached is not None and cached[0] == signature:
+        _graph_cache.move_to_end(key)
+        return cached[1]
+
+    graph = WebGraph()
+    languages: Dict[str, Optional[str]] = {}
+    references: Dict[str, List[Reference]] = {}
+    for rel_path, (source, digest, size) in graph_files.items():
+        cached_refs = _reference_cache.get((rel_path, digest))
+        if cached_refs is not None:
+            _reference_cache.move_to_end((rel_path, digest))
+            languages[rel_path], references[rel_path] = cached_refs
+            continue
+        if budget is None:
+            finished, result = True, _file_references(rootfs_dir, source, rel_path, digest)
+        elif budget.exhausted():
+            budget.skipped += 1
+            finished, result = False, None
+        else:
+            finished, result = budget.run(rel_path, _file_references, rootfs_dir, source, rel_path, digest,
+                                          size=min(size, GRAPH_MAX_BYTES))
+        if not finished:
+            graph.complete = False
+            result = (None, [])
+        languages[rel_path], references[rel_path] = result
+
+    for rel_path in sorted(files):
+        if languages[rel_path] is not None:
+            graph.add_node(rel_path, languages[rel_path])
+            for kind, name in references[rel_path]:
+                for target in _resolve(index, files, kind, name, rel_path, languages[rel_path]):
+                    graph.add_edge(rel_path, target)
+
+    for rel_path in files:
+        parent = posixpath.dirname(rel_path)
+        if parent in CGI_DIRS:
+            graph.add_entry_point(rel_path, 'cgi')
+        elif parent in RPCD_PLUGIN_DIRS:
+            graph.add_entry_point(rel_path, 'rpcd')
+    for option, handler in handlers:
+        if handler in files or _is_file(index, handler):
+            graph.add_entry_point(handler, f"uhttpd {option}")
+
+    menu_targets = _menu_targets(rootfs_dir, menu_files)
+    for dispatcher in DISPATCHERS:
+        if dispatcher not in files:
+            continue
+        for rel_path in files:
+            if rel_path.startswith(tuple(d + '/' for d in CONTROLLER_DIRS)) and languages[rel_path] is not None:
+                graph.add_edge(dispatcher, rel_path)
+        for kind, name in menu_targets:
+            for target in _resolve(index, files, kind, name, dispatcher, None):
+                graph.add_edge(dispatcher, target)
+
+    if graph.complete:
+        _remember(_graph_cache, key, (signature, graph), GRAPH_CACHE_SIZE)
+    return graph
@@ -0,0 +1,289 @@
+"""
+workspace.py
+
+Author: @natelgrw
+Last Edited: 10/18/2026
+
+A scratch workspace module that places temporary extraction
+output on a dedicated (optionally RAM-backed) scratch directory and
+enforces byte and inode budgets on it and on the extracted output.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+class WorkspaceQuotaExceeded(Exception):
+    """
+    Raised when a workspace grows beyond its byte or inode budget.
+    """
+
+
+class ExtractionWorkspace:
+    """
+    Module containing functions for managing a budgeted scratch
+    directory used during firmware extraction.
+    """
+
+    # RAM-backed locations tried when no scratch directory is given
+    TMPFS_CANDIDATES = ['/dev/shm']
+
+    def __init__(self, scratch_dir: Optional[str] = None, max_bytes: Optional[int] = None,
+                 max_inodes: Optional[int] = None, use_tmpfs: bool = False,
+                 poll_interval: float = 0.5):
+        """
+        Initializes the workspace with an optional scratch location
+        and optional usage budgets.
+
+        Args:
+            scratch_dir: Optional parent directory for scratch data
+            max_bytes: Optional maximum number of bytes the workspace and watched output may hold
+            max_inodes: Optional maximum number of files and directories
+            use_tmpfs: If True and max_bytes is set, prefer a RAM-backed filesystem when
+                no scratch_dir is given; without a byte budget scratch data stays on disk
+            poll_interval: Seconds between usage checks while a tool runs
+        """
+        self.scratch_dir = Path(scratch_dir) if scratch_dir else None
+        self.max_bytes = max_bytes
+        self.max_inodes = max_inodes
+        self.use_tmpfs = use_tmpfs
+        self.poll_interval = poll_interval
+
+        self.path: Optional[Path] = None
+        self.watched: List[Path] = []
+        self.backend = 'disk'
+        self.peak_bytes = 0
+        self.peak_inodes = 0
+        self.aborted = False
+        self.abort_reason: Optional[str] = None
+
+    def create(self, prefix: str = "firmaforge_") -> Path:
+        """
+        Creates the scratch directory on the selected backend.
+
+        Args:
+            prefix: Prefix for the scratch directory name
+
+        Returns:
+            Path to the created scratch directory
+        """
+        parent = self._select_parent()
+        self.path = Path(tempfile.mkdtemp(prefix=prefix, dir=str(parent) if parent else None))
+        self.backend = 'tmpfs' if self._is_tmpfs(self.path) else 'disk'
+        self.watched = []
+        self.peak_bytes = 0
+        self.peak_inodes = 0
+        self.aborted = False
+        self.abort_reason = None
+        return self.path
+
+    def watch(self, path: Path) -> None:
+        """
+        Counts a directory outside the scratch area, such as the
+        extracted rootfs, against the same budgets.
+        """
+        path = Path(path)
+        if path not in self.watched:
+            self.watched.append(path)
+
+    def usage(self) -> Dict[str, int]:
+        """
+        Measures the current usage of the workspace and watched
+        directories, stopping early once a budget is already exceeded.
+
+        Returns:
+            Dictionary with 'bytes' and 'inodes' counts
+        """
+        total_bytes = 0
+        total_inodes = 0
+        roots = [p for p in [self.path] + self.watched if p is not None and p.exists()]
+        if not roots:
+            return {'bytes': 0, 'inodes': 0}
+
+        stack = [str(p) for p in roots]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        total_inodes += 1
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                            total_bytes += st.st_blocks * 512 if hasattr(st, 'st_blocks') else st.st_size
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+            if self._over_budget(total_bytes, total_inodes):
+                break
+
+        self.peak_bytes = max(self.peak_bytes, total_bytes)
+        self.peak_inodes = max(self.peak_inodes, total_inodes)
+        return {'bytes': total_bytes, 'inodes': total_inodes}
+
+    def check(self, pending_bytes: int = 0) -> None:
+        """
+        Verifies the workspace is within budget.
+
+        Args:
+            pending_bytes: Bytes about to be written, checked before writing them
+
+        Raises:
+            WorkspaceQuotaExceeded: If the byte or inode budget is exceeded
+        """
+        if self.max_bytes is None and self.max_inodes is None:
+            return
+
+        current = self.usage()
+        if self.max_bytes is not None and current['bytes'] + pending_bytes > self.max_bytes:
+            self._abort(f"byte budget exceeded ({current['bytes'] + pending_bytes} > {self.max_bytes})")
+        if self.max_inodes is not None and current['inodes'] > self.max_inodes:
+            self._abort(f"inode budget exceeded ({current['inodes']} > {self.max_inodes})")
+
+    def run(self, cmd: List[str], timeout: int) -> subprocess.CompletedProcess:
+        """
+        Runs a tool that writes into the workspace, killing it as soon
+        as the workspace exceeds its budget.
+
+        Args:
+            cmd: Command and arguments to run
+            timeout: Maximum runtime in seconds
+
+        Returns:
+            CompletedProcess with captured stdout and stderr
+
+        Raises:
+            WorkspaceQuotaExceeded: If the tool pushed the workspace over budget
+            subprocess.TimeoutExpired: If the tool ran longer than timeout
+        """
+        if self.max_bytes is None and self.max_inodes is None:
+            return subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+
+        start = time.monotonic()
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        while True:
+            try:
+                stdout, stderr = proc.communicate(timeout=self.poll_interval)
+                self.check()
+                return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+            except subprocess.TimeoutExpired:
+                pass
+
+            try:
+                self.check()
+            except WorkspaceQuotaExceeded:
+                proc.kill()
+                proc.communicate()
+                raise
+
+            if time.monotonic() - start > timeout:
+                proc.kill()
+                proc.communicate()
+                raise subprocess.TimeoutExpired(cmd, timeout)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Summarizes workspace usage for the analysis report.
+
+        Returns:
+            Dictionary containing backend, peak usage, budgets and abort status
+        """
+        return {
+            'scratch_dir': str(self.path) if self.path else None,
+            'backend': self.backend,
+            'peak_bytes': self.peak_bytes,
+            'peak_inodes': self.peak_inodes,
+            'max_bytes': self.max_bytes,
+            'max_inodes': self.max_inodes,
+            'aborted': self.aborted,
+            'abort_reason': self.abort_reason,
+        }
+
+    def cleanup(self) -> None:
+        """
+        Records final usage and removes the scratch directory.
+        """
+        if self.path and self.path.exists():
+            self.usage()
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def _select_parent(self) -> Optional[Path]:
+        """
+        Chooses the parent directory for the scratch workspace.
+        """
+        if self.scratch_dir:
+            self.scratch_dir.mkdir(parents=True, exist_ok=True)
+            return self.scratch_dir
+
+        # RAM is only used when the byte budget bounds how much of it extraction takes
+        if self.use_tmpfs and self.max_bytes is not None:
+            for candidate in self.TMPFS_CANDIDATES:
+                path = Path(candidate)
+                if path.is_dir() and os.access(path, os.W_OK) and self._has_room(path):
+                    return path
+
+        return None
+
+    def _has_room(self, path: Path) -> bool:
+        """
+        Checks that a filesystem can hold the configured byte and inode budgets.
+        """
+        try:
+            st = os.statvfs(path)
+        except OSError:
+            return False
+
+        free_bytes = st.f_bavail * st.f_frsize
+        if self.max_bytes is not None and free_bytes < self.max_bytes:
+            return False
+        if self.max_inodes is not None and st.f_favail and st.f_favail < self.max_inodes:
+            return False
+        return True
+
+    def _is_tmpfs(self, path: Path) -> bool:
+        """
+        Checks whether a path lives on a tmpfs mount.
+        """
+        try:
+            resolved = str(path.resolve())
+            best_match = ''
+            fs_type = None
+            with open('/proc/mounts', 'r') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) < 3:
+                        continue
+                    mount_point = parts[1]
+                    if (resolved == mount_point or resolved.startswith(mount_point.rstrip('/') + '/')) \
+                            and len(mount_point) > len(best_match):
+                        best_match = mount_point
+                        fs_type = parts[2]
+            return fs_type in ('tmpfs', 'ramfs')
+        except Exception:
+            return False
+
+    def _over_budget(self, total_bytes: int, total_inodes: int) -> bool:
+        """
+        Checks raw counts against the configured budgets.
+        """
+        if self.max_bytes is not None and total_bytes > self.max_bytes:
+            return True
+        if self.max_inodes is not None and total_inodes > self.max_inodes:
+            return True
+        return False
+
+    def _abort(self, reason: str) -> None:
+        """
+        Marks the workspace as aborted and raises.
+        """
+        self.aborted = True
+        self.abort_reason = reason
+        raise WorkspaceQuotaExceeded(reason)